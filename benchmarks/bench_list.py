@@ -0,0 +1,280 @@
+"""
+Benchmark der zeitkritischen Pfade der Einkaufsliste fuer verschiedene Listengroessen.
+
+Beispiel::
+
+    python benchmarks/bench_list.py --sizes 10 1000 100000 --output bench_list.json
+"""
+import argparse
+import json
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+from common import (
+    DEFAULT_SIZES,
+    make_entries,
+    measure,
+    run_frames,
+    start_app,
+    use_temp_workdir,
+    write_results,
+)
+
+
+def bench_screen(app, size: int, repeat: int) -> List[dict]:
+    """
+    Misst die Methoden des ``ShoppingEntryScreen``.
+    """
+    from data.model import EntryModel
+    from sync import check_operation
+
+    screen = app.root.get_screen("shopping")
+    recycle_view = screen.ids["shopping_list"]
+    entries = make_entries(size)
+    model = EntryModel(entries)
+    sorted_entries = model.sorted_dicts()
+    toggled_model = EntryModel(entries)
+    toggled_model.apply(
+        check_operation(sorted_entries[0]["id"], not sorted_entries[0]["is_checked"])
+    )
+    toggled = toggled_model.sorted_dicts()
+
+    def show(shown: List[dict]):
+        screen.entries = shown
+        screen.set_entries_widgets()
+        run_frames(1)
+
+    def clear_view():
+        screen.entries = []
+        screen.shown_entries = []
+        del recycle_view.data[:]
+        run_frames(1)
+
+    def render_full():
+        screen.entries = sorted_entries
+        screen.set_entries_widgets()
+        run_frames(1)
+
+    def render_toggle():
+        screen.entries = toggled
+        screen.set_entries_widgets()
+        run_frames(1)
+
+    toggle_id = entries[0]["id"]
+
+    def toggle_model():
+        entry = model.get(toggle_id)
+        model.apply(check_operation(toggle_id, not entry.is_checked))
+        model.sorted_dicts()
+
+    def save():
+        screen.save_entries(entries)
+        screen.persistence.flush()
+
+    results = [
+        measure("EntryModel.sorted_dicts", size, model.sorted_dicts, repeat),
+        measure("set_entries_widgets (full)", size, render_full, repeat, setup=clear_view),
+        measure(
+            "set_entries_widgets (toggle)", size, render_toggle, repeat,
+            setup=lambda: show(sorted_entries),
+        ),
+        measure("get_entries", size, screen.get_entries, repeat),
+        measure("EntryModel.apply (toggle)", size, toggle_model, repeat),
+        measure("save_entries + flush", size, save, repeat),
+    ]
+    clear_view()
+    return results
+
+
+def bench_dialogs(app, repeat: int) -> List[dict]:
+    """
+    Misst das Oeffnen und Schliessen des Eingabe-Dialogs mit neu aufgebautem und mit
+    wiederverwendetem Dialog (siehe ``WidgetPool``).
+    """
+    import main
+
+    screen = app.root.get_screen("shopping")
+
+    def open_new():
+        dialog = main.TextDialog()
+        dialog.reset("add_entry", screen.on_bestaetigen)
+        dialog.open()
+        run_frames(1)
+        dialog.dialog.dismiss(animation=False)
+        run_frames(1)
+
+    def open_pooled():
+        screen.open_add_popup()
+        run_frames(1)
+        screen.add_dialog.dialog.dismiss(animation=False)
+        run_frames(1)
+
+    app.dialog_pool.prebuild(1)
+    results = [
+        measure("open add dialog (new)", 1, open_new, repeat),
+        measure("open add dialog (pooled)", 1, open_pooled, repeat),
+    ]
+    print(f"dialog pool: {app.dialog_pool.get_stats()}, row pool: {app.row_pool.get_stats()}")
+    return results
+
+
+def bench_search(size: int, repeat: int) -> List[dict]:
+    """
+    Misst den Suchindex: Aufbau bei der ersten Suche, Suchen mit kurzen und langen Begriffen
+    samt sortierter Treffer sowie das Anpassen des Index beim Umbenennen.
+    """
+    from data.model import EntryModel
+    from sync import rename_operation
+
+    entries = make_entries(size)
+    model = EntryModel(entries)
+    rename_id = entries[0]["id"]
+    texts = iter(range(10 ** 9))
+
+    def search(query: str):
+        model.sorted_dicts(False, model.search(query))
+
+    results = [measure("EntryModel.search (build index)", size, lambda: search("abc"), 1)]
+    for query in ("a", "ab", "abc", "abcde"):
+        results.append(
+            measure(f"EntryModel.search ({query!r})", size, lambda: search(query), repeat)
+        )
+    results.append(measure(
+        "EntryModel.apply (rename, indexed)", size,
+        lambda: model.apply(rename_operation(rename_id, f"renamed {next(texts)}")), repeat,
+    ))
+    return results
+
+
+def bench_files(size: int, repeat: int) -> List[dict]:
+    """
+    Misst das Lesen und Schreiben der ``entries.json`` sowie der Speicher-Backends.
+    """
+    from data.files import read_entries_from_files, write_entries_to_files
+    from data.journal import EntriesJournal
+    from data.sqlite_store import SqliteEntriesStore
+    from sync import check_operation
+
+    entries_dict = {"entries": make_entries(size)}
+    entry_id = entries_dict["entries"][0]["id"]
+    results = [
+        measure(
+            "write_entries_to_files", size, lambda: write_entries_to_files(entries_dict), repeat
+        ),
+        measure("read_entries_from_files", size, read_entries_from_files, repeat),
+    ]
+
+    for name, create in (
+        ("journal", lambda: EntriesJournal(Path("bench-journal"))),
+        ("sqlite", lambda: SqliteEntriesStore(Path("bench-sqlite"))),
+    ):
+        shutil.rmtree(f"bench-{name}", ignore_errors=True)
+        store = create()
+        store.replace(entries_dict)
+        if isinstance(store, EntriesJournal):
+            store.compact(wait=True)
+
+        results += [
+            measure(
+                f"{name}.append (1 op)", size,
+                lambda: store.append([check_operation(entry_id, True)]), repeat,
+            ),
+            measure(f"{name}.load", size, store.load, repeat),
+        ]
+        store.close()
+
+    return results
+
+
+def bench_transfer(size: int, repeat: int) -> List[dict]:
+    """
+    Misst Export und Import in allen Formaten: nur das Lesen der Datei (der Speicherbedarf
+    haengt nicht von ihrer Laenge ab) sowie den kompletten Import mit einmaligem Speichern.
+    """
+    from data.journal import EntriesJournal
+    from data.model import EntryModel
+    from data.transfer import (
+        FORMATS, open_export_file, open_import_file, read_entries, write_entries,
+    )
+    from sync import HybridClock, add_operation, new_entry_id
+
+    entries = make_entries(size)
+    results = []
+    for file_format in FORMATS:
+        path = Path(f"bench-import.{file_format}")
+
+        def export():
+            with open_export_file(path) as file:
+                write_entries(entries, file, file_format)
+
+        def read():
+            with open_import_file(path) as file:
+                for _ in read_entries(file, file_format):
+                    pass
+
+        def import_entries():
+            model = EntryModel(clock=HybridClock("bench"))
+            with open_import_file(path) as file:
+                operations = model.apply_local_all(
+                    add_operation({"id": new_entry_id(), **entry})
+                    for entry in read_entries(file, file_format)
+                )
+            store = EntriesJournal(Path("bench-import"))
+            store.replace(model.get_state())
+            store.close()
+
+        results += [
+            measure(f"export ({file_format})", size, export, repeat),
+            measure(f"read_entries ({file_format})", size, read, repeat),
+            measure(f"import + save ({file_format})", size, import_entries, repeat),
+        ]
+
+    return results
+
+
+def bench_mqtt(size: int, repeat: int) -> List[dict]:
+    """
+    Misst das Verarbeiten einer empfangenen MQTT-Nachricht ohne Netzwerkverbindung.
+    """
+    from mqtt import MqttClient
+
+    client = MqttClient("127.0.0.1", 1883, "bench", subscribe_callback=lambda *_: None)
+    message = SimpleNamespace(
+        topic="bench",
+        payload=json.dumps({"entries": make_entries(size)}).encode(),
+    )
+    return [
+        measure(
+            "MqttClient.parse_callback", size,
+            lambda: client.parse_callback(message, None), repeat,
+        )
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Pfad fuer die Ergebnisse als JSON")
+    args = parser.parse_args()
+
+    output = str(Path(args.output).resolve()) if args.output else None
+    use_temp_workdir()
+    app = start_app()
+
+    results = bench_dialogs(app, args.repeat)
+    for size in args.sizes:
+        results += bench_screen(app, size, args.repeat)
+        results += bench_search(size, args.repeat)
+        results += bench_files(size, args.repeat)
+        results += bench_transfer(size, args.repeat)
+        results += bench_mqtt(size, args.repeat)
+
+    app.stop()
+    write_results(results, output, "list")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark der MQTT-Nachrichtenformate: Groesse der Nutzdaten, Zeit zum Kodieren und Dekodieren
+sowie die geschaetzte Uebertragungszeit bei einer gegebenen Bandbreite. Verglichen werden reines
+JSON (aeltere Versionen) und alle verfuegbaren Kombinationen des Envelope-Formats.
+
+Beispiel::
+
+    python benchmarks/bench_payload.py --sizes 10 1000 10000 --bandwidth-kbit 1000
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from common import DEFAULT_SIZES, environment, make_entries, measure
+
+
+def get_formats() -> List[Optional[object]]:
+    """
+    Liefert alle verfuegbaren Formate, ``None`` steht fuer reines JSON.
+    """
+    from envelope import COMPRESSIONS, ENCODINGS, PayloadFormat
+
+    return [None] + [
+        PayloadFormat(compression, encoding)
+        for compression in COMPRESSIONS
+        for encoding in ENCODINGS
+    ]
+
+
+def bench_format(payload_format, message: dict, size: int, repeat: int, bandwidth: float):
+    """
+    Misst ein Format fuer eine Nachricht.
+    """
+    from envelope import decode_payload, encode_payload
+
+    name = "plain json" if payload_format is None else "/".join(payload_format)
+    payload = encode_payload(message, payload_format)
+    encode = measure(f"{name} encode", size, lambda: encode_payload(message, payload_format), repeat)
+    decode = measure(f"{name} decode", size, lambda: decode_payload(payload), repeat)
+    return {
+        "format": name,
+        "size": size,
+        "payload_bytes": len(payload),
+        "encode_ms": encode["wall_median_s"] * 1000,
+        "decode_ms": decode["wall_median_s"] * 1000,
+        "transfer_ms": len(payload) * 8 / bandwidth,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--bandwidth-kbit", type=float, default=1000,
+        help="Bandbreite in kbit/s fuer die geschaetzte Uebertragungszeit",
+    )
+    parser.add_argument("--output", help="Pfad fuer die Ergebnisse als JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        message = {"entries": make_entries(size)}
+        for payload_format in get_formats():
+            results.append(
+                bench_format(payload_format, message, size, args.repeat, args.bandwidth_kbit)
+            )
+
+    print(f"{'format':<18}{'size':>8}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}"
+          f"{'transfer ms':>14}{'total ms':>12}")
+    for result in results:
+        total = result["encode_ms"] + result["decode_ms"] + result["transfer_ms"]
+        print(
+            f"{result['format']:<18}{result['size']:>8}{result['payload_bytes']:>12}"
+            f"{result['encode_ms']:>12.3f}{result['decode_ms']:>12.3f}"
+            f"{result['transfer_ms']:>14.1f}{total:>12.1f}"
+        )
+
+    if args.output:
+        document = {
+            "benchmark": "payload",
+            "environment": environment(),
+            "bandwidth_kbit": args.bandwidth_kbit,
+            "results": results,
+        }
+        Path(args.output).write_text(json.dumps(document, indent=4))
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
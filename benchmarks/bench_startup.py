@@ -0,0 +1,91 @@
+"""
+Benchmark des Kaltstarts der App. Jeder Start laeuft in einem eigenen Prozess, damit keine
+bereits importierten Module oder geladenen Dateien die Messung verfaelschen. Gemessen werden
+die Phasen aus ``main.startup`` bis zum ersten Frame und der danach nachgeholten Arbeit.
+
+Beispiel::
+
+    python benchmarks/bench_startup.py --runs 10 --output bench_startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from common import environment, run_frames, start_app, use_temp_workdir
+
+REPORT_PREFIX = "STARTUP_REPORT "
+
+
+def run_child():
+    """
+    Startet die App einmal headless und gibt die Dauer der Phasen als JSON aus.
+    """
+    use_temp_workdir()
+    app = start_app()
+    run_frames(2)
+
+    import main
+
+    report = main.startup.get_report()
+    app.stop()
+    print(REPORT_PREFIX + json.dumps(report))
+
+
+def measure_cold_start() -> Dict[str, float]:
+    """
+    Misst einen Kaltstart in einem neuen Prozess.
+
+    :return: Die Dauer der Phasen in Millisekunden als ``dict``.
+    """
+    output = subprocess.run(
+        [sys.executable, __file__, "--child"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    for line in output.splitlines():
+        if line.startswith(REPORT_PREFIX):
+            return json.loads(line[len(REPORT_PREFIX):])
+
+    raise RuntimeError("no startup report in output of the child process")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Pfad fuer die Ergebnisse als JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    reports: List[Dict[str, float]] = [measure_cold_start() for _ in range(args.runs)]
+    phases = list(reports[0].keys())
+    results = [
+        {
+            "phase": phase,
+            "runs": len(reports),
+            "min_ms": min(report[phase] for report in reports),
+            "median_ms": statistics.median(report[phase] for report in reports),
+        }
+        for phase in phases
+    ]
+
+    print(f"{'phase':<24}{'min ms':>12}{'median ms':>12}")
+    for result in results:
+        print(f"{result['phase']:<24}{result['min_ms']:>12.1f}{result['median_ms']:>12.1f}")
+
+    if args.output:
+        document = {"benchmark": "startup", "environment": environment(), "results": results}
+        Path(args.output).write_text(json.dumps(document, indent=4))
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
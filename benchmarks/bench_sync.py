@@ -0,0 +1,558 @@
+"""
+Lasttest der Synchronisation: N headless Clients bearbeiten gleichzeitig dieselbe
+Einkaufsliste. Jeder Client verwendet den ``MqttClient`` der App (mit ``Outbox`` und
+Envelope-Format) und wendet empfangene Nachrichten wie ``ShoppingEntryScreen`` auf ein
+``EntryModel`` an. Als Broker dient der In-Process-``FakeBroker`` oder ein lokaler Broker wie
+mosquitto (``--broker 127.0.0.1:1883``); es wird kein Internet benoetigt.
+
+Gemessen werden Durchsatz, Latenz bis zur Anwendung auf den anderen Clients, die Zeit bis alle
+Clients denselben Stand haben (Konvergenz), verlorene Aenderungen sowie die Zahl der
+empfangenen Nachrichten, die als Echo, Duplikat oder ohne Aenderung uebersprungen wurden.
+
+Beispiele::
+
+    python benchmarks/bench_sync.py --clients 5 50 --workload mixed --output bench_sync.json
+    python benchmarks/bench_sync.py --clients 500 --ops 5 --rate 0.5 --snapshot-delay 0
+    python benchmarks/bench_sync.py --clients 5 --record workload.jsonl
+    python benchmarks/bench_sync.py --clients 5 --script workload.jsonl
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from common import environment, use_temp_workdir
+
+WORKLOADS = ("append", "mixed", "contended")
+# Anzahl gemeinsamer Eintraege, die bei ``contended`` alle Clients bearbeiten
+CONTENDED_ENTRIES = 10
+CONNECT_TIMEOUT = 30.0
+POLL_INTERVAL = 0.02
+
+
+class ScheduledOperation(NamedTuple):
+    """
+    Eine Aenderung des Skripts: Zeitpunkt (Sekunden nach Start), Client und Operation.
+    """
+    time: float
+    client: int
+    operation: dict
+
+
+def generate_schedule(
+    workload: str, clients: int, ops: int, rate: float, seed: int
+) -> Tuple[List[dict], List[ScheduledOperation]]:
+    """
+    Erzeugt ein Skript von Aenderungen. Die Aenderungen werden auf einem gemeinsamen Modell
+    simuliert, damit sie sich auf existierende Eintraege beziehen; gleichzeitige Aenderungen
+    verschiedener Clients koennen trotzdem kollidieren.
+
+    :param workload: Art der Aenderungen als ``str`` (siehe ``WORKLOADS``).
+    :param clients: Anzahl der Clients als ``int``.
+    :param ops: Anzahl der Aenderungen je Client als ``int``.
+    :param rate: Aenderungen je Sekunde und Client als ``float``.
+    :param seed: Startwert des Zufallsgenerators als ``int``.
+    :return: Die Eintraege zu Beginn als ``list`` und die Aenderungen nach Zeit sortiert.
+    """
+    from data.model import EntryModel
+    from sync import (
+        add_operation, check_operation, delete_operation, new_entry_id, rename_operation,
+    )
+
+    rng = random.Random(seed)
+    initial = []
+    if workload == "contended":
+        initial = [
+            {"id": new_entry_id(), "text": f"shared-{index}", "is_checked": False}
+            for index in range(CONTENDED_ENTRIES)
+        ]
+
+    timed = [
+        (step / rate + rng.uniform(0, 1 / rate), client, step)
+        for client in range(clients)
+        for step in range(ops)
+    ]
+    timed.sort()
+
+    model = EntryModel()
+    model.reset(initial)
+    schedule = []
+    for at, client, step in timed:
+        entries = list(model)
+        kind = "add"
+        if workload == "mixed" and entries:
+            kind = rng.choices(("add", "check", "rename", "delete"), (50, 25, 15, 10))[0]
+        elif workload == "contended":
+            kind = rng.choice(("check", "rename"))
+
+        if kind == "add":
+            operation = add_operation(
+                {"id": new_entry_id(), "text": f"c{client}-{step}", "is_checked": False}
+            )
+        else:
+            entry = rng.choice(entries)
+            if kind == "check":
+                operation = check_operation(entry.id, not entry.is_checked)
+            elif kind == "rename":
+                operation = rename_operation(entry.id, f"c{client}-{step}")
+            else:
+                operation = delete_operation(entry.id)
+
+        model.apply(operation)
+        schedule.append(ScheduledOperation(round(at, 4), client, operation))
+
+    return initial, schedule
+
+
+def write_script(path: str, initial: List[dict], schedule: List[ScheduledOperation]):
+    """
+    Speichert ein Skript als JSONL: Die erste Zeile enthaelt die Eintraege zu Beginn, jede
+    weitere eine Aenderung.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(json.dumps({"initial": initial}) + "\n")
+        for scheduled in schedule:
+            file.write(json.dumps(scheduled._asdict()) + "\n")
+
+
+def read_script(path: str) -> Tuple[List[dict], List[ScheduledOperation]]:
+    """
+    Liest ein mit ``write_script`` gespeichertes Skript.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file if line.strip()]
+
+    schedule = [ScheduledOperation(**line) for line in lines[1:]]
+    return lines[0]["initial"], sorted(schedule)
+
+
+class SyncStats:
+    """
+    Sammelt die Messwerte aller Clients. Wird aus den MQTT-Threads aufgerufen.
+    """
+    def __init__(self, clients: int) -> None:
+        self.clients = clients
+        self.lock = threading.Lock()
+        # Nachricht -> (Sendezeitpunkt, Absender)
+        self.sent: Dict[str, Tuple[float, int]] = {}
+        # Nachricht -> Clients, die sie erhalten haben
+        self.received: Dict[str, set] = {}
+        self.latencies: List[float] = []
+        self.echoes = 0
+        self.snapshots_sent = 0
+        self.snapshots_received = 0
+        self.last_activity = 0.0
+
+    def on_sent(self, message_id: str, client: int):
+        now = time.perf_counter()
+        with self.lock:
+            self.sent[message_id] = (now, client)
+            self.received.setdefault(message_id, set())
+            self.last_activity = now
+
+    def on_received(self, message_id: str, client: int):
+        now = time.perf_counter()
+        with self.lock:
+            sent = self.sent.get(message_id)
+            if sent is None:
+                return
+            self.last_activity = now
+            sent_at, sender = sent
+            if sender == client:
+                self.echoes += 1
+                return
+            receivers = self.received[message_id]
+            if client not in receivers:
+                receivers.add(client)
+                self.latencies.append(now - sent_at)
+
+    def get_lost(self) -> int:
+        with self.lock:
+            return sum(
+                self.clients - 1 - len(receivers) for receivers in self.received.values()
+            )
+
+
+class SyncClient:
+    """
+    Headless Client, der wie die App synchronisiert, aber nichts anzeigt.
+    """
+    def __init__(
+        self,
+        index: int,
+        broker: str,
+        port: int,
+        topic: str,
+        workdir: Path,
+        stats: SyncStats,
+        snapshot_delay: float,
+    ) -> None:
+        from data.model import EntryModel
+        from mqtt import MqttClient
+        from outbox import Outbox
+        from sync import HybridClock, get_ops_topic
+
+        self.index = index
+        self.topic = topic
+        self.ops_topic = get_ops_topic(topic)
+        self.stats = stats
+        self.snapshot_delay = snapshot_delay
+        self.lock = threading.Lock()
+        self.clock = HybridClock(f"loadtest-{index}")
+        self.model = EntryModel(clock=self.clock)
+        self.last_local_change: Optional[float] = None
+        self.sequence = 0
+        self.outbox = Outbox(Path(workdir, f"outbox-{index}.json"))
+        self.mqtt = MqttClient(
+            broker=broker,
+            port=port,
+            topic=topic,
+            client_id=f"loadtest-{index}",
+            subscribe_callback=self.on_message,
+            outbox=self.outbox,
+        )
+        self.mqtt.subscribe()
+
+    def apply_local(self, operation: dict):
+        """
+        Wendet eine lokale Aenderung an und sendet sie, wie bei aktiver Delta-Synchronisation.
+        """
+        with self.lock:
+            operation = self.model.apply_local(operation) or self.clock.stamp(operation)
+            self.last_local_change = time.perf_counter()
+
+        self.sequence += 1
+        message_id = f"{self.index}-{self.sequence}"
+        self.stats.on_sent(message_id, self.index)
+        self.mqtt.publish(
+            {"ops": [operation], "loadtest": message_id}, topic=self.ops_topic, retain=False
+        )
+
+    def publish_snapshot_if_due(self, now: float) -> bool:
+        """
+        Veroeffentlicht den kompletten Stand (retained), wenn seit der letzten lokalen Aenderung
+        ``snapshot_delay`` vergangen ist, wie ``ShoppingEntryScreen.publish_snapshot``.
+
+        :return: ``True``, wenn noch ein Stand aussteht.
+        """
+        if self.last_local_change is None:
+            return False
+        if now - self.last_local_change < self.snapshot_delay:
+            return True
+
+        with self.lock:
+            self.last_local_change = None
+            state = self.model.get_state()
+        with self.stats.lock:
+            self.stats.snapshots_sent += 1
+        self.mqtt.publish(state, topic=self.topic)
+        return False
+
+    def on_message(self, msg_dict: dict, topic: str):
+        """
+        Wendet eine empfangene Nachricht an, wie ``ShoppingEntryScreen.update_from_mqtt_batch``.
+        Wird im MQTT-Thread aufgerufen.
+        """
+        from sync import parse_list_topic
+
+        parsed = parse_list_topic(self.topic, topic)
+        if parsed is None:
+            return
+
+        _, is_ops = parsed
+        with self.lock:
+            if is_ops:
+                applied = self.model.apply_all(msg_dict["ops"])
+            else:
+                result = self.model.merge(msg_dict)
+                applied = result.changed
+                if result.remote_behind and self.snapshot_delay > 0:
+                    # dem empfangenen Stand fehlen eigene Aenderungen, eigenen Stand nachreichen
+                    if self.last_local_change is None:
+                        self.last_local_change = time.perf_counter()
+            if not applied:
+                self.mqtt.echo_filter.note_unchanged()
+
+        if is_ops and "loadtest" in msg_dict:
+            self.stats.on_received(msg_dict["loadtest"], self.index)
+        elif not is_ops:
+            with self.stats.lock:
+                self.stats.snapshots_received += 1
+                self.stats.last_activity = time.perf_counter()
+
+    def get_state(self) -> List[dict]:
+        with self.lock:
+            return self.model.sorted_dicts()
+
+
+def wait_for(condition, timeout: float) -> bool:
+    """
+    Wartet, bis eine Bedingung erfuellt ist.
+
+    :return: ``True``, wenn sie vor Ablauf von ``timeout`` Sekunden erfuellt wurde.
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if condition():
+            return True
+        time.sleep(POLL_INTERVAL)
+
+    return condition()
+
+
+def get_majority_state(clients: List[SyncClient]) -> Tuple[List[dict], int]:
+    """
+    Ermittelt den haeufigsten Stand der Clients.
+
+    :return: Der Stand als ``list`` und die Anzahl der Clients, die davon abweichen.
+    """
+    states: Dict[str, int] = {}
+    for client in clients:
+        key = json.dumps(client.get_state())
+        states[key] = states.get(key, 0) + 1
+
+    key, count = max(states.items(), key=lambda item: item[1])
+    return json.loads(key), len(clients) - count
+
+
+def count_diverged(clients: List[SyncClient]) -> int:
+    """
+    Zaehlt die Clients, deren Stand vom haeufigsten Stand abweicht.
+    """
+    return get_majority_state(clients)[1]
+
+
+def count_mismatches(state: List[dict], expected: List[dict]) -> int:
+    """
+    Zaehlt die Eintraege, die fehlen, zu viel sind oder sich in Text oder Status unterscheiden.
+    """
+    actual = {entry["id"]: (entry["text"], entry["is_checked"]) for entry in state}
+    wanted = {entry["id"]: (entry["text"], entry["is_checked"]) for entry in expected}
+    return sum(1 for entry_id in actual.keys() | wanted.keys()
+               if actual.get(entry_id) != wanted.get(entry_id))
+
+
+def publish_due_snapshots(clients: List[SyncClient]) -> bool:
+    """
+    Laesst alle Clients ihren Stand veroeffentlichen, deren Verzoegerung abgelaufen ist.
+
+    :return: ``True``, wenn bei einem Client noch ein Stand aussteht.
+    """
+    now = time.perf_counter()
+    pending = False
+    for client in clients:
+        pending = client.publish_snapshot_if_due(now) or pending
+
+    return pending
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(
+    clients: int,
+    initial: List[dict],
+    schedule: List[ScheduledOperation],
+    broker: Optional[str],
+    snapshot_delay: float,
+    settle: float,
+) -> dict:
+    """
+    Fuehrt einen Lasttest mit der angegebenen Anzahl Clients aus.
+
+    :return: Das Ergebnis als ``dict``.
+    """
+    from data.model import EntryModel
+    from fake_broker import FakeBroker
+    from mqtt import STATE_CONNECTED
+
+    fake_broker = None
+    if broker is None:
+        fake_broker = FakeBroker()
+        host, port = "127.0.0.1", fake_broker.start()
+    else:
+        host, _, port_text = broker.partition(":")
+        port = int(port_text or 1883)
+
+    # eigene Topic je Lauf, damit retained Nachrichten frueherer Laeufe nicht stoeren
+    topic = f"loadtest/{uuid.uuid4().hex}"
+    workdir = use_temp_workdir()
+    stats = SyncStats(clients)
+    sync_clients = [
+        SyncClient(index, host, port, topic, workdir, stats, snapshot_delay)
+        for index in range(clients)
+    ]
+    for sync_client in sync_clients:
+        sync_client.mqtt.connect()
+
+    try:
+        if not wait_for(
+            lambda: all(c.mqtt.state == STATE_CONNECTED for c in sync_clients), CONNECT_TIMEOUT
+        ):
+            raise RuntimeError("not all clients connected to the broker")
+
+        # Ausgangsstand veroeffentlichen; sobald alle anderen ihn haben, sind alle abonniert
+        sync_clients[0].model.reset(initial)
+        sync_clients[0].mqtt.publish(sync_clients[0].model.get_state(), topic=topic)
+        if not wait_for(lambda: stats.snapshots_received >= clients - 1, CONNECT_TIMEOUT):
+            raise RuntimeError("not all clients received the initial list")
+        stats.snapshots_received = 0
+
+        # Skript abspielen
+        start = time.perf_counter()
+        max_lag = 0.0
+        pending_snapshots = False
+        for scheduled in schedule:
+            delay = start + scheduled.time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            sync_clients[scheduled.client].apply_local(scheduled.operation)
+            if snapshot_delay > 0:
+                pending_snapshots = publish_due_snapshots(sync_clients)
+        sent_end = time.perf_counter()
+
+        while pending_snapshots:
+            time.sleep(POLL_INTERVAL)
+            pending_snapshots = publish_due_snapshots(sync_clients)
+        quiet_from = time.perf_counter()
+
+        # warten, bis alle Aenderungen angekommen sind und alle denselben Stand haben
+        converged = wait_for(
+            lambda: not publish_due_snapshots(sync_clients)
+            and stats.get_lost() == 0 and count_diverged(sync_clients) == 0,
+            settle,
+        )
+        converged_at = time.perf_counter()
+        if not converged:
+            # noch eintreffende Nachrichten abwarten, bevor Verluste gezaehlt werden
+            wait_for(lambda: time.perf_counter() - stats.last_activity > 1.0, settle)
+
+        # Stand, wenn alle Aenderungen in der Reihenfolge des Skripts gewirkt haetten
+        expected = EntryModel()
+        expected.reset(initial)
+        expected.apply_all(scheduled.operation for scheduled in schedule)
+        state, diverged = get_majority_state(sync_clients)
+
+        deliveries = len(stats.latencies)
+        active = (stats.last_activity or sent_end) - start
+        result = {
+            "clients": clients,
+            "operations": len(schedule),
+            "duration_s": sent_end - start,
+            "max_driver_lag_ms": max_lag * 1000,
+            "deliveries": deliveries,
+            "throughput_ops_s": len(schedule) / (sent_end - start) if schedule else 0.0,
+            "throughput_deliveries_s": deliveries / active if active > 0 else 0.0,
+            "latency_p50_ms": (percentile(stats.latencies, 0.5) or 0) * 1000,
+            "latency_p95_ms": (percentile(stats.latencies, 0.95) or 0) * 1000,
+            "latency_p99_ms": (percentile(stats.latencies, 0.99) or 0) * 1000,
+            "latency_max_ms": max(stats.latencies, default=0) * 1000,
+            "converged": converged,
+            "convergence_ms": (converged_at - quiet_from) * 1000 if converged else None,
+            "lost_updates": stats.get_lost(),
+            "diverged_clients": diverged,
+            "mismatched_entries": count_mismatches(state, expected.sorted_dicts()),
+            "echoes": stats.echoes,
+            "skipped": {
+                key: sum(c.mqtt.echo_filter.get_stats()[key] for c in sync_clients)
+                for key in ("echoes", "duplicates", "unchanged")
+            },
+            "snapshots_sent": stats.snapshots_sent,
+            "snapshots_received": stats.snapshots_received,
+            "outbox_pending": sum(len(c.outbox) for c in sync_clients),
+        }
+        if fake_broker is not None:
+            result["broker"] = fake_broker.get_stats()
+        return result
+    finally:
+        for sync_client in sync_clients:
+            sync_client.mqtt.disconnect()
+        if fake_broker is not None:
+            fake_broker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--workload", choices=WORKLOADS, default="mixed")
+    parser.add_argument("--ops", type=int, default=20, help="Aenderungen je Client")
+    parser.add_argument("--rate", type=float, default=2.0, help="Aenderungen je Sekunde und Client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--broker", help="lokaler Broker als host[:port], ohne wird der FakeBroker verwendet"
+    )
+    parser.add_argument(
+        "--snapshot-delay", type=float, default=None,
+        help="Sekunden bis zum Senden des kompletten Stands, 0 deaktiviert "
+             "(Standard: sync.SNAPSHOT_DELAY wie in der App)",
+    )
+    parser.add_argument(
+        "--settle", type=float, default=30.0, help="maximale Wartezeit auf Konvergenz in Sekunden"
+    )
+    parser.add_argument("--script", help="Skript (JSONL) abspielen statt es zu erzeugen")
+    parser.add_argument("--record", help="erzeugtes Skript als JSONL speichern")
+    parser.add_argument("--output", help="Pfad fuer die Ergebnisse als JSON")
+    parser.add_argument("--log-level", default="WARNING", help="Log-Level der App")
+    args = parser.parse_args()
+
+    from sync import SNAPSHOT_DELAY
+    from tracing import set_log_level
+
+    set_log_level(args.log_level)
+    snapshot_delay = SNAPSHOT_DELAY if args.snapshot_delay is None else args.snapshot_delay
+    # die Laeufe wechseln in temporaere Arbeitsverzeichnisse
+    output = str(Path(args.output).resolve()) if args.output else None
+    record = str(Path(args.record).resolve()) if args.record else None
+
+    results = []
+    for clients in args.clients:
+        if args.script:
+            initial, schedule = read_script(args.script)
+            clients = max(clients, max((s.client for s in schedule), default=0) + 1)
+        else:
+            initial, schedule = generate_schedule(
+                args.workload, clients, args.ops, args.rate, args.seed
+            )
+            if record:
+                write_script(record, initial, schedule)
+        results.append(run(clients, initial, schedule, args.broker, snapshot_delay, args.settle))
+
+    print(f"{'clients':>8}{'ops':>7}{'ops/s':>9}{'deliv/s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'max ms':>9}{'converge ms':>13}{'lost':>7}{'diverged':>10}{'mismatch':>10}"
+          f"{'skipped':>9}")
+    for result in results:
+        convergence = result["convergence_ms"]
+        print(
+            f"{result['clients']:>8}{result['operations']:>7}"
+            f"{result['throughput_ops_s']:>9.1f}{result['throughput_deliveries_s']:>10.1f}"
+            f"{result['latency_p50_ms']:>9.1f}{result['latency_p95_ms']:>9.1f}"
+            f"{result['latency_max_ms']:>9.1f}"
+            f"{'-' if convergence is None else f'{convergence:.1f}':>13}"
+            f"{result['lost_updates']:>7}{result['diverged_clients']:>10}"
+            f"{result['mismatched_entries']:>10}{sum(result['skipped'].values()):>9}"
+        )
+
+    if output:
+        document = {
+            "benchmark": "sync",
+            "environment": environment(),
+            "workload": "script" if args.script else args.workload,
+            "snapshot_delay_s": snapshot_delay,
+            "results": results,
+        }
+        Path(output).write_text(json.dumps(document, indent=4))
+        print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Gemeinsame Hilfsfunktionen fuer die Benchmarks.
+
+Die Benchmarks laufen ohne sichtbares Fenster: Kivy verwendet SDL2 mit dem ``offscreen``-
+Videotreiber. Ueber die Umgebungsvariablen ``KIVY_WINDOW`` und ``SDL_VIDEODRIVER`` kann ein
+anderer Window-Provider gewaehlt werden.
+"""
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_FILELOG", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+
+from kivy.config import Config  # noqa: E402
+
+# ohne Begrenzung der Bildrate, damit ein Frame nicht auf den naechsten Takt wartet
+Config.set("graphics", "maxfps", "0")
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def make_entries(size: int, seed: int = 0, checked_ratio: float = 0.3) -> List[dict]:
+    """
+    Erzeugt eine synthetische Einkaufsliste.
+
+    :param size: Anzahl der Eintraege als ``int``.
+    :param seed: Startwert des Zufallsgenerators als ``int``.
+    :param checked_ratio: Anteil der abgehakten Eintraege als ``float``.
+    :return: Die Eintraege als ``list``.
+    """
+    from sync import new_entry_id
+
+    rng = random.Random(seed)
+    return [
+        {
+            "id": new_entry_id(),
+            "text": "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12))),
+            "is_checked": rng.random() < checked_ratio,
+        }
+        for _ in range(size)
+    ]
+
+
+def use_temp_workdir() -> Path:
+    """
+    Wechselt in ein temporaeres Arbeitsverzeichnis, damit die Benchmarks keine Dateien der
+    App ueberschreiben.
+
+    :return: Das Arbeitsverzeichnis als ``Path``.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="shoppinglist-bench-"))
+    os.chdir(workdir)
+    return workdir
+
+
+def start_app():
+    """
+    Startet die App headless, ohne die Hauptschleife zu betreten, und ohne einen
+    erreichbaren MQTT-Broker.
+
+    :return: Die App als ``ShoppingListApp``.
+    """
+    from data import AppSettings
+
+    settings = AppSettings.get_or_create()
+    settings.mqtt_server = "127.0.0.1"
+    settings.to_json_file()
+
+    with silenced():
+        import main
+        app = main.ShoppingListApp()
+        main.app = app
+        app._run_prepare()
+        run_frames()
+
+    return app
+
+
+def run_frames(count: int = 2):
+    """
+    Laesst die Kivy-Ereignisschleife einige Frames abarbeiten.
+
+    :param count: Anzahl der Frames als ``int``.
+    """
+    from kivy.base import EventLoop
+
+    for _ in range(count):
+        EventLoop.idle()
+
+
+@contextlib.contextmanager
+def silenced():
+    """
+    Leitet die Ausgaben der App waehrend einer Messung ins Leere um. Die Ausgaben werden dabei
+    weiterhin erzeugt und damit mitgemessen.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(
+    operation: str,
+    size: int,
+    function: Callable[[], None],
+    repeat: int = 5,
+    setup: Optional[Callable[[], None]] = None,
+) -> Dict[str, object]:
+    """
+    Misst eine Operation: Laufzeit ueber mehrere Wiederholungen sowie Allokationen und
+    Spitzen-Speicherverbrauch in einem zusaetzlichen Durchlauf mit ``tracemalloc``.
+
+    :param operation: Name der Operation als ``str``.
+    :param size: Groesse der Liste als ``int``.
+    :param function: Die zu messende Funktion.
+    :param repeat: Anzahl der Wiederholungen fuer die Laufzeit als ``int``.
+    :param setup: Wird vor jeder Wiederholung ausserhalb der Messung aufgerufen.
+    :return: Das Ergebnis als ``dict``.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            with silenced():
+                setup()
+        gc.collect()
+        with silenced():
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+
+    if setup:
+        with silenced():
+            setup()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_size, _ = tracemalloc.get_traced_memory()
+    with silenced():
+        function()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(
+        stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0
+    )
+
+    return {
+        "operation": operation,
+        "size": size,
+        "repeat": repeat,
+        "wall_min_s": min(timings),
+        "wall_median_s": statistics.median(timings),
+        "peak_bytes": peak - start_size,
+        "alloc_blocks": allocations,
+    }
+
+
+def environment() -> Dict[str, str]:
+    """
+    Beschreibt die Umgebung, in der gemessen wurde.
+
+    :return: Die Beschreibung als ``dict``.
+    """
+    import kivy
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "kivy": kivy.__version__,
+        "window": os.environ.get("KIVY_WINDOW", "") or "default",
+        "sdl_videodriver": os.environ.get("SDL_VIDEODRIVER", ""),
+    }
+
+
+def write_results(results: List[dict], output: Optional[str], name: str):
+    """
+    Gibt die Ergebnisse als Tabelle aus und schreibt sie optional als JSON-Datei.
+
+    :param results: Die Ergebnisse von ``measure`` als ``list``.
+    :param output: Pfad der JSON-Datei als ``str`` oder ``None``.
+    :param name: Name des Benchmarks als ``str``.
+    """
+    print(f"{'operation':<32}{'size':>8}{'min ms':>12}{'median ms':>12}{'peak KiB':>12}"
+          f"{'allocs':>10}")
+    for result in results:
+        print(
+            f"{result['operation']:<32}{result['size']:>8}"
+            f"{result['wall_min_s'] * 1000:>12.3f}{result['wall_median_s'] * 1000:>12.3f}"
+            f"{result['peak_bytes'] / 1024:>12.1f}{result['alloc_blocks']:>10}"
+        )
+
+    if output:
+        document = {"benchmark": name, "environment": environment(), "results": results}
+        buffer = io.StringIO()
+        json.dump(document, buffer, indent=4)
+        Path(output).write_text(buffer.getvalue())
+        print(f"results written to {output}")
@@ -0,0 +1,266 @@
+"""
+Minimaler MQTT-3.1.1-Broker fuer Lasttests auf einem Rechner ohne Internet. Er laeuft in einem
+eigenen Thread im selben Prozess und unterstuetzt genau das, was die App verwendet:
+CONNECT, SUBSCRIBE mit Wildcards (``+`` und ``#``), PUBLISH mit QoS 0 und 1, retained
+Nachrichten, PING und DISCONNECT. Zugestellt wird immer mit QoS 0.
+
+Beispiel::
+
+    broker = FakeBroker()
+    port = broker.start()
+    ...
+    broker.stop()
+"""
+import asyncio
+import struct
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    Prueft, ob eine Topic zu einem Filter mit Wildcards passt.
+
+    :param topic_filter: Der Filter als ``str``, z.B. ``"a/+/c"`` oder ``"a/#"``.
+    :param topic: Die Topic als ``str``.
+    :return: ``True``, wenn die Topic passt.
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+def _encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def _encode_packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    length = len(body)
+    encoded_length = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded_length.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+
+    return bytes((packet_type << 4 | flags,)) + bytes(encoded_length) + body
+
+
+def _encode_publish(topic: str, payload: bytes, retain: bool) -> bytes:
+    return _encode_packet(PUBLISH, 1 if retain else 0, _encode_string(topic) + payload)
+
+
+class _Session:
+    """
+    Verbindung eines Clients mit seinen Abonnements.
+    """
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.client_id = ""
+        self.subscriptions: Set[str] = set()
+
+    def matches(self, topic: str) -> bool:
+        return any(topic_matches(topic_filter, topic) for topic_filter in self.subscriptions)
+
+
+class FakeBroker:
+    """
+    In-Process-Ersatz fuer einen MQTT-Broker wie mosquitto.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Instantiiert den Broker, ohne ihn zu starten.
+
+        :param host: Adresse, auf der gelauscht wird, als ``str``.
+        :param port: Port als ``int``, ``0`` fuer einen freien Port.
+        """
+        self.host = host
+        self.port = port
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__server: Optional[asyncio.AbstractServer] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__sessions: Dict[str, _Session] = {}
+        self.__retained: Dict[str, bytes] = {}
+
+        self.received = 0
+        self.delivered = 0
+        self.connections = 0
+
+    def start(self) -> int:
+        """
+        Startet den Broker in einem eigenen Thread.
+
+        :return: Der Port, auf dem der Broker lauscht, als ``int``.
+        """
+        started = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, args=(started,), daemon=True)
+        self.__thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        """
+        Beendet den Broker und trennt alle Verbindungen.
+        """
+        if self.__loop is None:
+            return
+
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        if self.__thread is not None:
+            self.__thread.join()
+        self.__loop = None
+
+    def get_stats(self) -> dict:
+        """
+        Liefert Zaehler zu Verbindungen sowie empfangenen und zugestellten Nachrichten.
+
+        :return: Die Zaehler als ``dict``.
+        """
+        return {
+            "connections": self.connections,
+            "received": self.received,
+            "delivered": self.delivered,
+            "retained": len(self.__retained),
+        }
+
+    def __run(self, started: threading.Event):
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        self.__server = self.__loop.run_until_complete(
+            asyncio.start_server(self.__handle, self.host, self.port)
+        )
+        self.port = self.__server.sockets[0].getsockname()[1]
+        started.set()
+        try:
+            self.__loop.run_forever()
+        finally:
+            self.__server.close()
+            for session in list(self.__sessions.values()):
+                session.writer.close()
+            self.__loop.close()
+
+    async def __read_packet(self, reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+        header = await reader.readexactly(1)
+        length = 0
+        multiplier = 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+
+        body = await reader.readexactly(length) if length else b""
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = _Session(writer)
+        try:
+            while True:
+                packet_type, flags, body = await self.__read_packet(reader)
+                if packet_type == CONNECT:
+                    self.__connect(session, body)
+                elif packet_type == PUBLISH:
+                    self.__publish(session, flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self.__subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.__unsubscribe(session, body)
+                elif packet_type == PINGREQ:
+                    writer.write(_encode_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if self.__sessions.get(session.client_id) is session:
+                del self.__sessions[session.client_id]
+            writer.close()
+
+    def __connect(self, session: _Session, body: bytes):
+        # Protokollname, Level, Flags und Keep-Alive ueberspringen
+        name_length = struct.unpack_from("!H", body)[0]
+        offset = 2 + name_length + 4
+        id_length = struct.unpack_from("!H", body, offset)[0]
+        session.client_id = body[offset + 2:offset + 2 + id_length].decode("utf-8")
+
+        previous = self.__sessions.get(session.client_id)
+        if previous is not None:
+            previous.writer.close()
+        self.__sessions[session.client_id] = session
+        self.connections += 1
+        session.writer.write(_encode_packet(CONNACK, 0, b"\x00\x00"))
+
+    def __publish(self, session: _Session, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        retain = bool(flags & 0x01)
+        topic_length = struct.unpack_from("!H", body)[0]
+        topic = body[2:2 + topic_length].decode("utf-8")
+        offset = 2 + topic_length
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            session.writer.write(_encode_packet(PUBACK, 0, packet_id))
+        payload = body[offset:]
+        self.received += 1
+
+        if retain:
+            if payload:
+                self.__retained[topic] = payload
+            else:
+                self.__retained.pop(topic, None)
+
+        packet = _encode_publish(topic, payload, False)
+        for subscriber in list(self.__sessions.values()):
+            if subscriber.matches(topic):
+                subscriber.writer.write(packet)
+                self.delivered += 1
+
+    def __subscribe(self, session: _Session, body: bytes):
+        packet_id = body[:2]
+        offset = 2
+        filters: List[str] = []
+        while offset < len(body):
+            length = struct.unpack_from("!H", body, offset)[0]
+            filters.append(body[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length + 1
+
+        session.subscriptions.update(filters)
+        session.writer.write(_encode_packet(SUBACK, 0, packet_id + bytes(len(filters))))
+        for topic, payload in list(self.__retained.items()):
+            if any(topic_matches(topic_filter, topic) for topic_filter in filters):
+                session.writer.write(_encode_publish(topic, payload, True))
+                self.delivered += 1
+
+    def __unsubscribe(self, session: _Session, body: bytes):
+        packet_id = body[:2]
+        offset = 2
+        while offset < len(body):
+            length = struct.unpack_from("!H", body, offset)[0]
+            session.subscriptions.discard(body[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+
+        session.writer.write(_encode_packet(UNSUBACK, 0, packet_id))
@@ -0,0 +1,217 @@
+"""
+Zufallstest des CRDT-Modells der Einkaufsliste: mehrere Replikate bearbeiten gleichzeitig
+dieselbe Liste mit abweichenden Uhren. Ihre Aenderungen werden in zufaelliger Reihenfolge,
+teilweise doppelt, zugestellt und zwischendurch werden komplette Staende zusammengefuehrt.
+
+Geprueft wird, dass
+
+- alle Replikate nach Zustellung aller Nachrichten denselben Stand haben,
+- ``sync.apply_operations`` und beide Speicher (Journal, SQLite) die Aenderungen in beliebiger
+  Reihenfolge zum selben Stand wie das ``EntryModel`` zusammenfuehren,
+- ``sync.merge_states`` idempotent, kommutativ und assoziativ ist.
+
+Bei einem Fehler wird der Startwert ausgegeben, mit dem er sich reproduzieren laesst.
+
+Beispiel::
+
+    python benchmarks/fuzz_crdt.py --runs 200 --replicas 4 --ops 60
+    python benchmarks/fuzz_crdt.py --runs 1 --seed 1234
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from common import use_temp_workdir
+
+# Wahrscheinlichkeit, dass eine Nachricht doppelt zugestellt wird
+DUPLICATE_RATE = 0.1
+# Wahrscheinlichkeit, dass ein Replikat nach einer Aenderung seinen Stand an ein anderes sendet
+SNAPSHOT_RATE = 0.05
+# Maximale Abweichung der Uhren der Replikate in Sekunden
+MAX_CLOCK_SKEW = 5.0
+
+
+class Replica:
+    """
+    Ein Geraet mit eigenem ``EntryModel`` und eigener, abweichender Uhr.
+    """
+    def __init__(self, index: int, rng: random.Random, now: Callable[[], float]) -> None:
+        from data.model import EntryModel
+        from sync import HybridClock
+
+        skew = rng.uniform(-MAX_CLOCK_SKEW, MAX_CLOCK_SKEW)
+        self.name = f"r{index}"
+        self.model = EntryModel(clock=HybridClock(self.name, lambda: now() + skew))
+        # noch nicht zugestellte Nachrichten an dieses Replikat
+        self.inbox: List[Tuple[str, dict]] = []
+
+    def deliver(self, rng: random.Random):
+        """
+        Stellt eine zufaellig gewaehlte wartende Nachricht zu.
+        """
+        kind, message = self.inbox.pop(rng.randrange(len(self.inbox)))
+        if kind == "op":
+            self.model.apply(message)
+        else:
+            self.model.merge(message)
+
+
+def random_operation(replica: Replica, rng: random.Random, step: int) -> dict:
+    """
+    Erzeugt eine zufaellige Aenderung anhand des Stands, den das Replikat gerade kennt.
+    """
+    from sync import (
+        add_operation, check_operation, delete_operation, new_entry_id, rename_operation,
+    )
+
+    entries = list(replica.model)
+    kind = "add"
+    if entries:
+        kind = rng.choices(("add", "check", "rename", "delete"), (4, 3, 3, 1))[0]
+    if kind == "add":
+        return add_operation(
+            {"id": new_entry_id(), "text": f"{replica.name}-{step}", "is_checked": False}
+        )
+
+    entry = rng.choice(entries)
+    if kind == "check":
+        return check_operation(entry.id, not entry.is_checked)
+    if kind == "rename":
+        return rename_operation(entry.id, f"{replica.name}-{step}")
+    return delete_operation(entry.id)
+
+
+def normalize(state: dict) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Bringt einen Stand in eine vergleichbare Form, unabhaengig von der Reihenfolge.
+    """
+    entries = sorted(
+        (
+            entry["id"], entry["text"], bool(entry["is_checked"]),
+            entry.get("text_ts", ""), entry.get("checked_ts", ""),
+        )
+        for entry in state["entries"]
+    )
+    return entries, sorted(state.get("tombstones", {}).items())
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise AssertionError(message)
+
+
+def run_once(seed: int, replicas: int, ops: int, workdir: Path) -> Dict[str, int]:
+    """
+    Fuehrt einen Durchlauf aus und prueft alle Eigenschaften.
+
+    :return: Zaehler zum Durchlauf als ``dict``.
+    """
+    from data.journal import EntriesJournal
+    from data.sqlite_store import SqliteEntriesStore
+    from sync import apply_operations, merge_states
+
+    rng = random.Random(seed)
+    fake_time = [time.time()]
+    group = [Replica(index, rng, lambda: fake_time[0]) for index in range(replicas)]
+    sent: List[dict] = []
+    snapshots = 0
+
+    for step in range(ops):
+        fake_time[0] += rng.choice((0.0, 0.0005, 0.01, 0.5))
+        replica = rng.choice(group)
+        operation = replica.model.apply_local(random_operation(replica, rng, step))
+        if operation is not None:
+            sent.append(operation)
+            for other in group:
+                if other is not replica:
+                    other.inbox.append(("op", operation))
+                    if rng.random() < DUPLICATE_RATE:
+                        other.inbox.append(("op", operation))
+
+        if rng.random() < SNAPSHOT_RATE:
+            target = rng.choice(group)
+            target.inbox.append(("state", replica.model.get_state()))
+            snapshots += 1
+
+        # einen Teil der wartenden Nachrichten zustellen, den Rest spaeter
+        for other in group:
+            while other.inbox and rng.random() < 0.5:
+                other.deliver(rng)
+
+    for replica in group:
+        while replica.inbox:
+            replica.deliver(rng)
+
+    states = [normalize(replica.model.get_state()) for replica in group]
+    for index, state in enumerate(states[1:], 1):
+        check(state == states[0], f"replica {group[index].name} diverged from {group[0].name}")
+
+    # dieselben Aenderungen in beliebiger Reihenfolge auf Ebene der ``dict``s und in den Speichern
+    shuffled = sent + rng.sample(sent, len(sent) // 4)
+    rng.shuffle(shuffled)
+    tombstones: Dict[str, str] = {}
+    entries = apply_operations([], shuffled, tombstones)
+    check(
+        normalize({"entries": entries, "tombstones": tombstones}) == states[0],
+        "apply_operations differs from the model",
+    )
+
+    directory = Path(workdir, str(seed))
+    directory.mkdir()
+    for store in (EntriesJournal(directory), SqliteEntriesStore(directory)):
+        store.append(shuffled)
+        loaded = normalize(store.load())
+        store.close()
+        check(loaded == states[0], f"{type(store).__name__} differs from the model")
+
+    # Eigenschaften des Zusammenfuehrens kompletter Staende
+    a, b, c = (rng.choice(group).model.get_state() for _ in range(3))
+    check(normalize(merge_states(a, a)) == normalize(a), "merge_states is not idempotent")
+    check(
+        normalize(merge_states(a, b)) == normalize(merge_states(b, a)),
+        "merge_states is not commutative",
+    )
+    check(
+        normalize(merge_states(merge_states(a, b), c))
+        == normalize(merge_states(a, merge_states(b, c))),
+        "merge_states is not associative",
+    )
+
+    return {"operations": len(sent), "snapshots": snapshots, "entries": len(states[0][0])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=60, help="Aenderungen je Durchlauf")
+    parser.add_argument("--seed", type=int, help="Startwert des ersten Durchlaufs")
+    args = parser.parse_args()
+
+    first_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    workdir = use_temp_workdir()
+    totals = {"operations": 0, "snapshots": 0, "entries": 0}
+    for run in range(args.runs):
+        seed = first_seed + run
+        try:
+            counts = run_once(seed, args.replicas, args.ops, workdir)
+        except AssertionError as e:
+            print(f"FAILED (seed {seed}): {e}")
+            print(f"reproduce with: python benchmarks/fuzz_crdt.py --runs 1 --seed {seed} "
+                  f"--replicas {args.replicas} --ops {args.ops}")
+            sys.exit(1)
+        for key, value in counts.items():
+            totals[key] += value
+
+    print(
+        f"{args.runs} runs passed (seeds {first_seed}..{first_seed + args.runs - 1}): "
+        f"{totals['operations']} operations, {totals['snapshots']} snapshot merges, "
+        f"{totals['entries']} final entries"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Zufallstest der ``Outbox``: Aenderungen und komplette Staende mehrerer Einkaufslisten werden
+aufgenommen, gesendet (teilweise erfolglos), bestaetigt, bei Verbindungsabbruechen erneut
+gesendet und die Outbox wird zwischendurch neu aus ihrer Datei eingelesen.
+
+Geprueft wird, dass jede aufgenommene Aenderung am Ende bestaetigt gesendet wurde, entweder
+selbst oder als Teil eines danach gesendeten kompletten Stands, und dass die Outbox danach leer
+ist. Vorab wird der Fall geprueft, dass eine Aenderung mit einer noch nicht gesendeten
+zusammengefasst und nur der neue Eintrag bestaetigt wird.
+
+Bei einem Fehler wird der Startwert ausgegeben, mit dem er sich reproduzieren laesst.
+
+Beispiel::
+
+    python benchmarks/fuzz_outbox.py --runs 200 --steps 200
+    python benchmarks/fuzz_outbox.py --runs 1 --seed 1234
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from common import use_temp_workdir
+
+TOPIC = "fuzz"
+LISTS = ("", "second")
+# Wahrscheinlichkeit, dass paho eine Nachricht nicht annimmt (rc != 0)
+SEND_FAILURE_RATE = 0.2
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise AssertionError(message)
+
+
+def get_sent_ids(msg: dict) -> Set[str]:
+    """
+    Liefert die IDs der Eintraege, die eine gesendete Nachricht enthaelt.
+    """
+    if "entries" in msg:
+        return {entry["id"] for entry in msg["entries"]}
+    return {operation["id"] for operation in msg["ops"]}
+
+
+class Client:
+    """
+    Sendet wie der ``MqttClient`` ueber die ``Outbox`` an einen Broker, der Nachrichten
+    bestaetigt, ablehnt oder bei Verbindungsabbruechen verliert.
+    """
+    def __init__(self, path: Path, rng: random.Random) -> None:
+        from sync import get_list_topic
+
+        self.path = path
+        self.rng = rng
+        self.topics = [get_list_topic(TOPIC, list_name) for list_name in LISTS]
+        # Topic der Liste -> IDs aller bisher hinzugefuegten Eintraege
+        self.states: Dict[str, List[str]] = {topic: [] for topic in self.topics}
+        self.connected = False
+        self.next_mid = 0
+        # Message-ID -> gesendete Nachricht, bis zur Bestaetigung
+        self.in_flight: Dict[int, dict] = {}
+        self.confirmed: Set[str] = set()
+        self.outbox = self.open()
+
+    def open(self):
+        from outbox import Outbox
+
+        return Outbox(self.path, snapshot_source=self.get_state)
+
+    def get_state(self, topic: str) -> Optional[dict]:
+        ids = self.states.get(topic)
+        if ids is None:
+            return None
+        return {"entries": [{"id": entry_id} for entry_id in ids], "tombstones": {}}
+
+    def send(self, item: dict):
+        if self.rng.random() < SEND_FAILURE_RATE:
+            return
+        self.next_mid += 1
+        self.in_flight[self.next_mid] = item["msg"]
+        self.outbox.mark_sent(item["id"], self.next_mid)
+
+    def publish(self, topic: str, msg: dict, retain: bool):
+        item = self.outbox.add(topic, msg, retain)
+        if self.connected:
+            self.send(item)
+
+    def add_entry(self, step: int):
+        from sync import add_operation, get_ops_topic
+
+        topic = self.rng.choice(self.topics)
+        entry_id = f"e{step}"
+        self.states[topic].append(entry_id)
+        operation = add_operation({"id": entry_id, "text": entry_id, "is_checked": False})
+        self.publish(get_ops_topic(topic), {"ops": [operation]}, False)
+
+    def publish_snapshot(self):
+        topic = self.rng.choice(self.topics)
+        self.publish(topic, self.get_state(topic), True)  # type: ignore
+
+    def confirm(self):
+        mid = self.rng.choice(list(self.in_flight))
+        self.confirmed |= get_sent_ids(self.in_flight.pop(mid))
+        self.outbox.confirm(mid)
+
+    def disconnect(self):
+        self.connected = False
+        self.in_flight.clear()
+
+    def reconnect(self):
+        self.connected = True
+        for item in self.outbox.take_batch():
+            self.send(item)
+
+    def restart(self):
+        self.disconnect()
+        self.outbox = self.open()
+
+    def drain(self):
+        """
+        Sendet und bestaetigt alles, bis die Outbox leer ist.
+        """
+        self.rng = random.Random(0)
+        for _ in range(100):
+            if not len(self.outbox):
+                return
+            self.disconnect()
+            self.reconnect()
+            while self.in_flight:
+                self.confirm()
+        check(False, f"outbox not empty after draining: {len(self.outbox)} items")
+
+
+def check_collapsed_confirm(workdir: Path):
+    """
+    Zwei Aenderungen werden aufgenommen, bevor die erste gesendet wurde. Der zurueckgegebene
+    Eintrag muss beide enthalten, sonst geht die erste mit der Bestaetigung verloren.
+    """
+    from outbox import Outbox
+    from sync import add_operation, get_ops_topic
+
+    path = Path(workdir, "outbox-collapse.json")
+    path.unlink(missing_ok=True)
+    outbox = Outbox(path)
+    topic = get_ops_topic(TOPIC)
+    for entry_id in ("a", "b"):
+        operation = add_operation({"id": entry_id, "text": entry_id, "is_checked": False})
+        item = outbox.add(topic, {"ops": [operation]}, False)
+    check(get_sent_ids(item["msg"]) == {"a", "b"}, f"returned item lost ops: {item}")
+    outbox.mark_sent(item["id"], 1)
+    outbox.confirm(1)
+    check(len(outbox) == 0, "outbox not empty after confirming the collapsed item")
+    check(len(Outbox(path)) == 0, "confirmed items come back after reading the outbox file")
+
+
+def run_once(seed: int, steps: int, workdir: Path) -> Dict[str, int]:
+    """
+    Fuehrt einen Durchlauf aus und prueft, dass keine Aenderung verloren geht.
+
+    :return: Zaehler zum Durchlauf als ``dict``.
+    """
+    rng = random.Random(seed)
+    path = Path(workdir, "outbox-fuzz.json")
+    path.unlink(missing_ok=True)
+    client = Client(path, rng)
+    counts = {"operations": 0, "snapshots": 0, "restarts": 0}
+    for step in range(steps):
+        action = rng.choices(
+            ("add", "snapshot", "confirm", "reconnect", "disconnect", "restart"),
+            (10, 1, 6, 2, 1, 1),
+        )[0]
+        if action == "add":
+            client.add_entry(step)
+            counts["operations"] += 1
+        elif action == "snapshot":
+            client.publish_snapshot()
+            counts["snapshots"] += 1
+        elif action == "confirm" and client.in_flight:
+            client.confirm()
+        elif action == "reconnect":
+            client.reconnect()
+        elif action == "disconnect":
+            client.disconnect()
+        elif action == "restart":
+            client.restart()
+            counts["restarts"] += 1
+
+    client.drain()
+    expected = {entry_id for ids in client.states.values() for entry_id in ids}
+    lost = expected - client.confirmed
+    check(not lost, f"{len(lost)} operations were never confirmed: {sorted(lost)[:10]}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=200, help="Aktionen je Durchlauf")
+    parser.add_argument("--seed", type=int, help="Startwert des ersten Durchlaufs")
+    args = parser.parse_args()
+
+    first_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    workdir = use_temp_workdir()
+    try:
+        check_collapsed_confirm(workdir)
+    except AssertionError as e:
+        print(f"FAILED (collapsed confirm): {e}")
+        sys.exit(1)
+
+    totals = {"operations": 0, "snapshots": 0, "restarts": 0}
+    for run in range(args.runs):
+        seed = first_seed + run
+        try:
+            counts = run_once(seed, args.steps, workdir)
+        except AssertionError as e:
+            print(f"FAILED (seed {seed}): {e}")
+            print(f"reproduce with: python benchmarks/fuzz_outbox.py --runs 1 --seed {seed} "
+                  f"--steps {args.steps}")
+            sys.exit(1)
+        for key, value in counts.items():
+            totals[key] += value
+
+    print(
+        f"{args.runs} runs passed (seeds {first_seed}..{first_seed + args.runs - 1}): "
+        f"{totals['operations']} operations, {totals['snapshots']} snapshots, "
+        f"{totals['restarts']} restarts"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+
+# Ab diesem Anteil geaenderter Eintraege wird die Liste komplett ersetzt, da die einzelnen
+# Operationen dann teurer sind als ein Neuaufbau.
+RESET_THRESHOLD = 0.5
+
+
+def entry_keys(entries: Sequence[dict]) -> List[Hashable]:
+    """
+    Berechnet fuer jeden Eintrag einen stabilen Schluessel.
+    Eintraege mit ID werden ueber diese identifiziert, Eintraege ohne ID ueber ihren Text und,
+    bei gleichem Text, ueber ihr Vorkommen.
+
+    :param entries: Die Eintraege als ``list``.
+    :return: Die Schluessel in der Reihenfolge der Eintraege als ``list``.
+    """
+    occurrences: Dict[str, int] = {}
+    keys: List[Hashable] = []
+    for entry in entries:
+        entry_id = entry.get("id")
+        if entry_id:
+            keys.append(entry_id)
+            continue
+
+        text = entry["text"]
+        count = occurrences.get(text, 0)
+        occurrences[text] = count + 1
+        keys.append((text, count))
+
+    return keys
+
+
+def _longest_increasing_subsequence(values: List[int]) -> Set[int]:
+    """
+    Bestimmt die Indizes einer laengsten aufsteigenden Teilfolge.
+
+    :param values: Die Werte als ``list`` von ``int``.
+    :return: Die Indizes der Teilfolge als ``set``.
+    """
+    tails: List[int] = []
+    tail_indices: List[int] = []
+    predecessors = [-1] * len(values)
+    for index, value in enumerate(values):
+        position = bisect_left(tails, value)
+        if position > 0:
+            predecessors[index] = tail_indices[position - 1]
+        if position == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[position] = value
+            tail_indices[position] = index
+
+    result = set()
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        result.add(index)
+        index = predecessors[index]
+
+    return result
+
+
+def diff_entries(
+    old: Sequence[dict],
+    new: Sequence[dict],
+    key: Callable[[Sequence[dict]], List[Hashable]] = entry_keys,
+) -> List[Tuple]:
+    """
+    Vergleicht zwei Listen von Eintraegen anhand ihrer Schluessel und liefert die Operationen,
+    die ``old`` in ``new`` ueberfuehren. Die Operationen muessen in der gelieferten
+    Reihenfolge angewendet werden:
+
+    - ``("remove", index)``
+    - ``("insert", index, entry)``
+    - ``("move", from_index, to_index)``
+    - ``("update", index, entry)``
+    - ``("reset", entries)``, wenn sich zu viel geaendert hat
+
+    :param old: Die bisherigen Eintraege als ``list``.
+    :param new: Die neuen Eintraege als ``list``.
+    :param key: Funktion, die die Schluessel zu einer Liste von Eintraegen berechnet.
+    :return: Die Operationen als ``list`` von ``tuple``.
+    """
+    old_keys = key(old)
+    new_keys = key(new)
+    if old_keys == new_keys:
+        return [
+            ("update", index, entry)
+            for index, (old_entry, entry) in enumerate(zip(old, new))
+            if old_entry != entry
+        ]
+
+    new_positions = {entry_key: index for index, entry_key in enumerate(new_keys)}
+    old_entries = dict(zip(old_keys, old))
+
+    operations: List[Tuple] = []
+    working = []
+    for index in range(len(old_keys) - 1, -1, -1):
+        if old_keys[index] not in new_positions:
+            operations.append(("remove", index))
+    for entry_key in old_keys:
+        if entry_key in new_positions:
+            working.append(entry_key)
+
+    stable = _longest_increasing_subsequence([new_positions[k] for k in working])
+    stable_keys = {working[index] for index in stable}
+    changed = len(operations) + len(new_keys) - len(stable_keys)
+    if changed > max(len(old_keys), len(new_keys)) * RESET_THRESHOLD:
+        return [("reset", list(new))]
+
+    # von hinten nach vorne, damit alles hinter dem Anker bereits an der richtigen Stelle ist
+    anchor = None
+    for index in range(len(new_keys) - 1, -1, -1):
+        entry_key = new_keys[index]
+        if entry_key in stable_keys:
+            anchor = entry_key
+            continue
+
+        target = working.index(anchor) if anchor is not None else len(working)
+        if entry_key in old_entries:
+            source = working.index(entry_key)
+            working.pop(source)
+            if source < target:
+                target -= 1
+            operations.append(("move", source, target))
+        else:
+            operations.append(("insert", target, new[index]))
+        working.insert(target, entry_key)
+        anchor = entry_key
+
+    for index, entry_key in enumerate(new_keys):
+        old_entry = old_entries.get(entry_key)
+        if old_entry is not None and old_entry != new[index]:
+            operations.append(("update", index, new[index]))
+
+    return operations
+
+
+def changed_span(old: Sequence[dict], new: Sequence[dict]) -> Optional[Tuple[int, int]]:
+    """
+    Bestimmt bei gleich langen Listen den Bereich zwischen dem ersten und dem letzten
+    geaenderten Eintrag, der als Ganzes ersetzt werden kann (z.B. ein abgehakter Eintrag, der
+    dadurch weiter nach unten sortiert wird).
+
+    :param old: Die bisherigen Eintraege als ``list``.
+    :param new: Die neuen Eintraege als ``list``.
+    :return: ``(start, stop)`` als ``tuple`` oder ``None``, wenn die Listen unterschiedlich lang
+    oder gleich sind.
+    """
+    if len(old) != len(new):
+        return None
+
+    start = next(
+        (index for index, (old_entry, entry) in enumerate(zip(old, new)) if old_entry != entry),
+        None,
+    )
+    if start is None:
+        return None
+
+    stop = next(index for index in range(len(new) - 1, start - 1, -1) if old[index] != new[index])
+    return start, stop + 1
+
+
+def apply_diff(target: list, operations: List[Tuple], convert: Callable[[dict], dict] = dict):
+    """
+    Wendet die Operationen von ``diff_entries`` auf eine Liste an (z.B. die Daten einer
+    ``RecycleView``).
+
+    :param target: Die zu aendernde Liste.
+    :param operations: Die Operationen als ``list`` von ``tuple``.
+    :param convert: Wandelt einen Eintrag in das Element der Zielliste um.
+    """
+    for operation in operations:
+        kind = operation[0]
+        if kind == "remove":
+            del target[operation[1]]
+        elif kind == "insert":
+            target.insert(operation[1], convert(operation[2]))
+        elif kind == "move":
+            item = target.pop(operation[1])
+            target.insert(operation[2], item)
+        elif kind == "update":
+            target[operation[1]] = convert(operation[2])
+        elif kind == "reset":
+            del target[:]
+            target.extend(convert(entry) for entry in operation[1])
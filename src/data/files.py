@@ -1,8 +1,9 @@
 
-import json
 import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
+
+from data.serialization import dumps, loads
 
 FILES_PATH = Path("files")
 
@@ -11,6 +12,23 @@ entries_filename = "entries.json"
 
 # region write
 
+def write_atomic(path: Path, data: bytes):
+    """
+    Schreibt eine Datei so, dass sie bei einem Absturz nie halb geschrieben zurueckbleibt:
+    Die Daten werden in eine temporaere Datei geschrieben, auf den Datentraeger gebracht und
+    anschliessend ueber die alte Datei umbenannt.
+
+    :param path: Pfad der Datei als ``Path``.
+    :param data: Der Inhalt als ``bytes``.
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
 def write_json_to_files(dict_to_save, filename):
     """
     Hilfsmethode zum Schreiben einer JSON-Datei auf dem Geraet.
@@ -21,15 +39,7 @@ def write_json_to_files(dict_to_save, filename):
     if not FILES_PATH.is_dir():
         FILES_PATH.mkdir()
 
-    path = Path(FILES_PATH, filename)
-
-    if os.path.exists(path):
-        access_mode = "w"
-    else:
-        access_mode = "x"
-
-    with open(path, access_mode) as json_file:
-        json.dump(dict_to_save, json_file, indent=4)
+    write_atomic(Path(FILES_PATH, filename), dumps(dict_to_save))
 
 
 def write_settings_to_files(settings_dict):
@@ -65,8 +75,19 @@ def read_json_from_files(filename) -> dict:
     if not os.path.exists(path):
         raise FileNotFoundError(f"File {path} not found")
 
-    with open(path, "r") as json_file:
-        return json.load(json_file)
+    with open(path, "rb") as json_file:
+        return loads(json_file.read())
+
+def get_settings_mtime() -> Optional[float]:
+    """
+    Liefert den Zeitpunkt der letzten Aenderung der Einstellungs-Datei.
+
+    :return: Zeitpunkt als ``float`` oder ``None``, wenn die Datei nicht existiert.
+    """
+    try:
+        return os.stat(Path(FILES_PATH, settings_filename)).st_mtime
+    except OSError:
+        return None
 
 def read_settings_from_files() -> dict:
     """
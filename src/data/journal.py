@@ -0,0 +1,195 @@
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from data.files import FILES_PATH, entries_filename, write_atomic
+from data.serialization import dumps, loads
+from data.store import EntriesStore
+from sync import apply_operations
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+journal_filename = "entries.journal"
+
+# Ab dieser Groesse (in Bytes) wird das Journal in einen neuen Snapshot uebernommen
+COMPACTION_THRESHOLD = 256 * 1024
+
+
+class EntriesJournal(EntriesStore):
+    """
+    Speichert die Einkaufsliste als Snapshot (``entries.json``) und einem Journal, an das jede
+    Aenderung als einzelne Zeile angehaengt wird. Dadurch kostet das Speichern einer Aenderung
+    unabhaengig von der Groesse der Liste immer gleich viel.
+    Wird das Journal zu gross, wird es im Hintergrund in einen neuen Snapshot uebernommen.
+    Ein kompletter neuer Stand (``replace``) ersetzt Snapshot und Journal.
+    """
+    def __init__(
+        self,
+        directory: Path = FILES_PATH,
+        snapshot_filename: str = entries_filename,
+        journal_filename: str = journal_filename,
+        threshold: int = COMPACTION_THRESHOLD,
+    ) -> None:
+        """
+        Instantiiert das Journal.
+
+        :param directory: Ordner der Dateien als ``Path``.
+        :param snapshot_filename: Dateiname des Snapshots als ``str``.
+        :param journal_filename: Dateiname des Journals als ``str``.
+        :param threshold: Groesse des Journals in Bytes als ``int``, ab der verdichtet wird.
+        """
+        self.__directory = directory
+        self.__snapshot_path = Path(directory, snapshot_filename)
+        self.__journal_path = Path(directory, journal_filename)
+        # Journal, das gerade im Hintergrund in den Snapshot uebernommen wird
+        self.__compacting_path = Path(directory, journal_filename + ".compacting")
+        self.__threshold = threshold
+        self.__compaction: Optional[threading.Thread] = None
+
+    # region read
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Stellt die Einkaufsliste aus Snapshot und Journal wieder her.
+
+        :return: Die Eintraege und Loeschmarken als ``dict`` im Format der ``entries.json``.
+        """
+        self.wait_for_compaction()
+        entries, tombstones = self.__read_snapshot()
+        for path in (self.__compacting_path, self.__journal_path):
+            entries = apply_operations(entries, self.__read_journal(path), tombstones)
+
+        return {"entries": entries, "tombstones": tombstones}
+
+    def __read_snapshot(self) -> Tuple[List[dict], Dict[str, str]]:
+        if not os.path.exists(self.__snapshot_path):
+            return [], {}
+
+        with open(self.__snapshot_path, "rb") as json_file:
+            snapshot = loads(json_file.read())
+        return snapshot["entries"], snapshot.get("tombstones", {})
+
+    @staticmethod
+    def __read_journal(path: Path) -> List[dict]:
+        if not os.path.exists(path):
+            return []
+
+        operations = []
+        with open(path, "rb") as journal_file:
+            for line in journal_file:
+                try:
+                    operations.append(loads(line))
+                except ValueError:
+                    # unvollstaendige letzte Zeile nach einem Absturz
+                    log.warning("skipping broken journal record %r", line)
+
+        return operations
+
+    # endregion
+
+    # region write
+
+    def append(self, operations: List[dict]):
+        """
+        Haengt Aenderungen an das Journal an.
+
+        :param operations: Die Aenderungen als ``list`` (siehe ``sync``).
+        """
+        if not operations:
+            return
+
+        if not self.__directory.is_dir():
+            self.__directory.mkdir(parents=True)
+
+        lines = b"".join(dumps(operation) + b"\n" for operation in operations)
+        with open(self.__journal_path, "a+b") as journal_file:
+            size = journal_file.seek(0, os.SEEK_END)
+            if size > 0:
+                journal_file.seek(size - 1)
+                if journal_file.read(1) != b"\n":
+                    # unvollstaendige letzte Zeile nach einem Absturz abschliessen, damit sie
+                    # nicht mit der ersten neuen Aenderung zu einer Zeile verschmilzt
+                    lines = b"\n" + lines
+            journal_file.write(lines)
+            size = journal_file.tell()
+
+        if size >= self.__threshold:
+            self.compact()
+
+    def replace(self, entries_dict: Dict[str, list]):
+        """
+        Ersetzt alle Eintraege, z.B. wenn eine komplette Liste per MQTT empfangen wurde.
+        Der neue Stand wird als Snapshot geschrieben und das Journal geleert, damit es nur
+        einzelne Aenderungen enthaelt. Eine laufende Verdichtung wird vorher abgewartet.
+
+        :param entries_dict: Die Eintraege (und Loeschmarken) als ``dict`` im Format der
+        ``entries.json``.
+        """
+        self.wait_for_compaction()
+        if not self.__directory.is_dir():
+            self.__directory.mkdir(parents=True)
+
+        write_atomic(self.__snapshot_path, dumps({
+            "entries": entries_dict["entries"],
+            "tombstones": entries_dict.get("tombstones", {}),
+        }))
+        # bei einem Absturz dazwischen wiederholt das alte Journal nur enthaltene Aenderungen
+        for path in (self.__compacting_path, self.__journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        self.wait_for_compaction()
+
+    # endregion
+
+    # region compaction
+
+    def compact(self, wait: bool = False):
+        """
+        Uebernimmt das Journal im Hintergrund in einen neuen Snapshot.
+        Neue Aenderungen werden waehrenddessen in ein neues Journal geschrieben.
+
+        :param wait: Ob auf das Ende der Verdichtung gewartet werden soll, als ``bool``.
+        """
+        if self.__compaction is not None and self.__compaction.is_alive():
+            if wait:
+                self.wait_for_compaction()
+            return
+
+        if os.path.exists(self.__compacting_path):
+            # vorherige Verdichtung wurde abgebrochen, diese zuerst abschliessen
+            pass
+        elif os.path.exists(self.__journal_path):
+            os.replace(self.__journal_path, self.__compacting_path)
+        else:
+            return
+
+        self.__compaction = threading.Thread(target=self.__compact, daemon=True)
+        self.__compaction.start()
+        if wait:
+            self.wait_for_compaction()
+
+    def wait_for_compaction(self):
+        """
+        Wartet, bis eine laufende Verdichtung abgeschlossen ist.
+        """
+        if self.__compaction is not None:
+            self.__compaction.join()
+            self.__compaction = None
+
+    def __compact(self):
+        entries, tombstones = self.__read_snapshot()
+        entries = apply_operations(entries, self.__read_journal(self.__compacting_path), tombstones)
+
+        try:
+            write_atomic(
+                self.__snapshot_path, dumps({"entries": entries, "tombstones": tombstones})
+            )
+            os.remove(self.__compacting_path)
+        except OSError as e:
+            log.warning("compacting entries journal failed: %s", e)
+
+    # endregion
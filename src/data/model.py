@@ -0,0 +1,481 @@
+import time
+from bisect import bisect_left, insort
+from typing import AbstractSet, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from data.search import SearchIndex
+
+from sync import (
+    OPERATION_REGISTERS, HybridClock, apply_registers, creates_entry, ensure_entry_ids,
+    is_mergeable, merge_entry, new_entry, new_entry_id, prune_tombstones,
+)
+from tracing import get_logger, tracer
+
+log = get_logger(__name__)
+
+# Sind weniger als 1/n der Eintraege gefiltert, werden die Treffer direkt sortiert
+SORT_SUBSET_RATIO = 8
+
+
+class Entry:
+    """
+    Ein Eintrag der Einkaufsliste mit stabiler ID.
+    Eintraege werden nach dem Erstellen nicht mehr veraendert, bei einer Aenderung ersetzt das
+    ``EntryModel`` den Eintrag. Dadurch kann die ``dict``-Darstellung zwischengespeichert werden.
+    Zu Text und Status wird der Zeitstempel ihrer letzten Aenderung gespeichert (siehe
+    ``sync.HybridClock``), bei gleichzeitigen Aenderungen gewinnt die neuere.
+    """
+    __slots__ = ("id", "text", "is_checked", "text_ts", "checked_ts", "_as_dict")
+
+    def __init__(
+        self,
+        entry_id: str,
+        text: str,
+        is_checked: bool = False,
+        text_ts: str = "",
+        checked_ts: str = "",
+    ) -> None:
+        """
+        Instantiiert einen Eintrag.
+
+        :param entry_id: Die eindeutige ID als ``str``.
+        :param text: Der Text als ``str``.
+        :param is_checked: Ob der Eintrag abgehakt ist, als ``bool``.
+        :param text_ts: Zeitstempel der letzten Aenderung des Texts als ``str``.
+        :param checked_ts: Zeitstempel der letzten Aenderung des Status als ``str``.
+        """
+        self.id = entry_id
+        self.text = text
+        self.is_checked = is_checked
+        self.text_ts = text_ts
+        self.checked_ts = checked_ts
+        self._as_dict: Optional[dict] = None
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "Entry":
+        """
+        Erstellt einen Eintrag aus seiner ``dict``-Darstellung. Fehlt die ID (z.B. bei Listen
+        aus aelteren Versionen), wird eine neue vergeben.
+
+        :param entry: Der Eintrag als ``dict``.
+        :return: Der Eintrag als ``Entry``.
+        """
+        return cls(
+            entry.get("id") or new_entry_id(),
+            entry["text"],
+            entry.get("is_checked", False),
+            entry.get("text_ts", ""),
+            entry.get("checked_ts", ""),
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Liefert die ``dict``-Darstellung, wie sie gespeichert und per MQTT gesendet wird.
+        Das ``dict`` wird wiederverwendet und darf nicht veraendert werden.
+
+        :return: Der Eintrag als ``dict``.
+        """
+        if self._as_dict is None:
+            self._as_dict = {"id": self.id, "text": self.text, "is_checked": self.is_checked}
+            if self.text_ts:
+                self._as_dict["text_ts"] = self.text_ts
+            if self.checked_ts:
+                self._as_dict["checked_ts"] = self.checked_ts
+        return self._as_dict
+
+    def sort_key(self) -> Tuple[bool, str, str]:
+        """
+        Liefert den Schluessel, nach dem die Einkaufsliste sortiert wird: erst nach Status, dann
+        nach Text. Die ID sorgt bei gleichem Text fuer eine stabile Reihenfolge.
+
+        :return: Der Schluessel als ``tuple``.
+        """
+        return (self.is_checked, self.text, self.id)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return (
+            self.id == other.id
+            and self.text == other.text
+            and self.is_checked == other.is_checked
+        )
+
+    def __repr__(self) -> str:
+        return f"Entry(id={self.id!r}, text={self.text!r}, is_checked={self.is_checked!r})"
+
+
+class SortedIndex:
+    """
+    Haelt die IDs der Eintraege sortiert nach ``Entry.sort_key``. Einzelne Eintraege werden per
+    Binaersuche eingefuegt und entfernt, statt die ganze Liste neu zu sortieren.
+    """
+    def __init__(self, entries: Iterable[Entry] = ()) -> None:
+        """
+        Instantiiert den Index.
+
+        :param entries: Die initialen Eintraege als ``Iterable`` von ``Entry``.
+        """
+        self.__keys: List[Tuple[bool, str, str]] = sorted(entry.sort_key() for entry in entries)
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def add(self, entry: Entry):
+        """
+        Fuegt einen Eintrag an der passenden Stelle ein.
+
+        :param entry: Der Eintrag als ``Entry``.
+        """
+        insort(self.__keys, entry.sort_key())
+
+    def remove(self, entry: Entry):
+        """
+        Entfernt einen Eintrag.
+
+        :param entry: Der Eintrag als ``Entry`` mit dem Stand, mit dem er eingefuegt wurde.
+        """
+        del self.__keys[self.index(entry)]
+
+    def index(self, entry: Entry) -> int:
+        """
+        Liefert die Position eines Eintrags in aufsteigender Reihenfolge.
+
+        :param entry: Der Eintrag als ``Entry``.
+        :return: Die Position als ``int``.
+        """
+        key = entry.sort_key()
+        index = bisect_left(self.__keys, key)
+        if index == len(self.__keys) or self.__keys[index] != key:
+            raise ValueError(f"entry not in index: {entry!r}")
+        return index
+
+    def ids(self, reverse: bool = False) -> Iterator[str]:
+        """
+        Liefert die IDs in sortierter Reihenfolge, ohne die Liste zu kopieren.
+
+        :param reverse: Ob in umgekehrter Reihenfolge iteriert werden soll, als ``bool``.
+        :return: Die IDs als ``Iterator``.
+        """
+        keys = reversed(self.__keys) if reverse else iter(self.__keys)
+        return (key[2] for key in keys)
+
+
+class MergeResult(NamedTuple):
+    """
+    Ergebnis von ``EntryModel.merge``.
+    """
+    # Ob sich das Modell geaendert hat
+    changed: bool
+    # Ob der empfangene Stand Aenderungen fehlen, die nur dieses Geraet kennt
+    remote_behind: bool
+
+
+class EntryModel:
+    """
+    Haelt die Eintraege der Einkaufsliste unabhaengig von den Widgets.
+    Die Eintraege sind nach ID indiziert, sodass Zugriffe und Aenderungen konstanten Aufwand
+    haben. Zusaetzlich wird die sortierte Reihenfolge in einem ``SortedIndex`` mitgefuehrt.
+
+    Gleichzeitige Aenderungen mehrerer Geraete werden wie in ``sync.apply_operations``
+    zusammengefuehrt: Text und Status jedes Eintrags uebernehmen die Aenderung mit dem neuesten
+    Zeitstempel, geloeschte IDs werden als Loeschmarke behalten. Alle Geraete erhalten so
+    unabhaengig von der Reihenfolge der Nachrichten dieselbe Liste.
+    """
+    def __init__(self, entries: Iterable[dict] = (), clock: Optional[HybridClock] = None) -> None:
+        """
+        Instantiiert das Modell.
+
+        :param entries: Die initialen Eintraege als ``list`` von ``dict``.
+        :param clock: [optional] Die Uhr des Geraets als ``HybridClock``, wird nach empfangenen
+        Zeitstempeln gestellt.
+        """
+        self.__entries: Dict[str, Entry] = {}
+        self.__sorted = SortedIndex()
+        self.__tombstones: Dict[str, str] = {}
+        self.__clock = clock
+        # wird erst bei der ersten Suche aufgebaut und danach laufend angepasst
+        self.__search: Optional[SearchIndex] = None
+        self.reset(entries)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __iter__(self) -> Iterator[Entry]:
+        return iter(self.__entries.values())
+
+    def __contains__(self, entry_id) -> bool:
+        return entry_id in self.__entries
+
+    def get(self, entry_id: str) -> Optional[Entry]:
+        """
+        Liefert einen Eintrag anhand seiner ID.
+
+        :param entry_id: Die ID als ``str``.
+        :return: Der Eintrag als ``Entry`` oder ``None``, wenn es ihn nicht gibt.
+        """
+        return self.__entries.get(entry_id)
+
+    def reset(self, entries: Iterable[dict], tombstones: Optional[Dict[str, str]] = None):
+        """
+        Ersetzt alle Eintraege.
+
+        :param entries: Die neuen Eintraege als ``list`` von ``dict``.
+        :param tombstones: [optional] Die Loeschmarken (ID -> Zeitstempel) als ``dict``.
+        """
+        self.__entries = {}
+        self.__search = None
+        self.__tombstones = dict(tombstones or {})
+        for entry in entries:
+            record = Entry.from_dict(entry)
+            self.__entries[record.id] = record
+            self.__observe(record.text_ts)
+            self.__observe(record.checked_ts)
+        self.__sorted = SortedIndex(self.__entries.values())
+
+    def apply(self, operation: dict) -> bool:
+        """
+        Wendet eine Operation an (siehe ``sync.apply_operations``). Operationen auf geloeschte
+        IDs und aeltere Aenderungen als der aktuelle Stand werden ignoriert, damit Operationen
+        mehrfach und in beliebiger Reihenfolge angewendet werden koennen.
+
+        :param operation: Die Operation als ``dict``.
+        :return: ``True``, wenn sich das Modell geaendert hat.
+        """
+        kind = operation.get("op")
+        entry_id = operation.get("id")
+        timestamp = operation.get("ts")
+        entry = self.__entries.get(entry_id)  # type: ignore
+        self.__observe(timestamp)
+
+        if kind == "reset":
+            self.reset(operation["entries"], operation.get("tombstones"))
+            return True
+        if kind == "delete":
+            timestamp = max(self.__tombstones.get(entry_id, ""), timestamp or "")  # type: ignore
+            self.__tombstones[entry_id] = timestamp  # type: ignore
+            if entry is None:
+                return False
+            self.__remove(entry)
+            return True
+        if kind not in OPERATION_REGISTERS:
+            log.warning("ignoring unknown operation %s", operation)
+            return False
+        if entry_id in self.__tombstones:
+            return False
+        if entry is None:
+            if not creates_entry(operation):
+                log.debug("ignoring operation for unknown entry %s", operation)
+                return False
+            self.__put(Entry.from_dict(new_entry(operation)))
+            return True
+        if kind == "add" and timestamp is None:
+            # doppelte Hinzufuegung aelterer Versionen
+            return False
+
+        return self.__replace(entry, apply_registers(entry.to_dict(), operation))
+
+    def apply_local(self, operation: dict) -> Optional[dict]:
+        """
+        Versieht eine lokale Aenderung mit einem Zeitstempel der Uhr und wendet sie an.
+
+        :param operation: Die Operation als ``dict``.
+        :return: Die Operation mit Zeitstempel und dem neuen Stand des Eintrags, wie sie
+        gespeichert und gesendet wird, oder ``None``, wenn sich nichts geaendert hat.
+        """
+        if self.__clock is not None:
+            operation = self.__clock.stamp(operation)
+        if not self.apply(operation):
+            return None
+
+        entry = self.__entries.get(operation.get("id"))  # type: ignore
+        if entry is None:
+            return operation
+
+        return {**entry.to_dict(), **operation}
+
+    def apply_local_all(self, operations: Iterable[dict]) -> List[dict]:
+        """
+        Wendet mehrere lokale Aenderungen wie ``apply_local`` an, z.B. beim Import.
+
+        :param operations: Die Operationen als ``Iterable``, werden einzeln verarbeitet.
+        :return: Die angewendeten Operationen, wie sie gespeichert und gesendet werden, als
+        ``list``.
+        """
+        applied = []
+        for operation in operations:
+            operation = self.apply_local(operation)
+            if operation is not None:
+                applied.append(operation)
+
+        return applied
+
+    def merge(self, state: dict) -> MergeResult:
+        """
+        Fuehrt einen kompletten Stand (z.B. einen per MQTT empfangenen Snapshot) mit dem
+        Modell zusammen (siehe ``sync.merge_states``). Der Aufwand haengt nur von der Groesse
+        des Stands ab, sortiert werden nur geaenderte Eintraege. Staende aelterer Versionen
+        ohne Loeschmarken ersetzen alle Eintraege.
+
+        :param state: Der Stand als ``dict`` mit ``"entries"`` und ``"tombstones"``.
+        :return: Das Ergebnis als ``MergeResult``.
+        """
+        if not is_mergeable(state):
+            self.reset(state["entries"])
+            return MergeResult(True, False)
+
+        changed = False
+        remote_behind = False
+        remote_tombstones: Dict[str, str] = state["tombstones"]
+        for entry_id, timestamp in remote_tombstones.items():
+            self.__observe(timestamp)
+            if timestamp > self.__tombstones.get(entry_id, ""):
+                self.__tombstones[entry_id] = timestamp
+            entry = self.__entries.get(entry_id)
+            if entry is not None:
+                self.__remove(entry)
+                changed = True
+        if len(self.__tombstones) > len(remote_tombstones):
+            remote_behind = True
+
+        remote_entries = 0
+        for remote in ensure_entry_ids(state["entries"]):
+            if remote["id"] in self.__tombstones:
+                remote_behind = True
+                continue
+
+            remote_entries += 1
+            entry = self.__entries.get(remote["id"])
+            if entry is None:
+                record = Entry.from_dict(remote)
+                self.__observe(record.text_ts)
+                self.__observe(record.checked_ts)
+                self.__put(record)
+                changed = True
+                continue
+
+            current = entry.to_dict()
+            if merge_entry(remote, current) is not remote:
+                remote_behind = True
+            merged = merge_entry(current, remote)
+            self.__observe(merged.get("text_ts"))
+            self.__observe(merged.get("checked_ts"))
+            changed = self.__replace(entry, merged) or changed
+
+        if len(self.__entries) > remote_entries:
+            remote_behind = True
+
+        return MergeResult(changed, remote_behind)
+
+    def get_tombstones(self) -> Dict[str, str]:
+        """
+        Liefert die Loeschmarken. Loeschmarken aelter als ``sync.TOMBSTONE_TTL`` werden dabei
+        verworfen.
+
+        :return: Die Loeschmarken (ID -> Zeitstempel) als ``dict``.
+        """
+        self.__tombstones = prune_tombstones(self.__tombstones, time.time())
+        return dict(self.__tombstones)
+
+    def get_state(self) -> dict:
+        """
+        Liefert den kompletten Stand, wie er gespeichert und als Snapshot gesendet wird.
+
+        :return: Der Stand als ``dict`` mit ``"entries"`` (sortiert) und ``"tombstones"``.
+        """
+        return {"entries": self.sorted_dicts(), "tombstones": self.get_tombstones()}
+
+    def __observe(self, timestamp: Optional[str]):
+        if timestamp and self.__clock is not None:
+            self.__clock.observe(timestamp)
+
+    def __replace(self, entry: Entry, entry_dict: dict) -> bool:
+        if entry_dict is entry.to_dict():
+            return False
+        self.__sorted.remove(entry)
+        self.__put(Entry.from_dict(entry_dict))
+        return True
+
+    def __put(self, entry: Entry):
+        self.__entries[entry.id] = entry
+        self.__sorted.add(entry)
+        if self.__search is not None:
+            self.__search.add(entry.id, entry.text)
+
+    def __remove(self, entry: Entry):
+        del self.__entries[entry.id]
+        self.__sorted.remove(entry)
+        if self.__search is not None:
+            self.__search.remove(entry.id)
+
+    def search(self, query: str) -> AbstractSet[str]:
+        """
+        Sucht die Eintraege, deren Text zum Suchbegriff passt (siehe ``SearchIndex``). Der Index
+        wird bei der ersten Suche aufgebaut und danach bei jeder Aenderung angepasst.
+
+        :param query: Der Suchbegriff als ``str``.
+        :return: Die IDs der passenden Eintraege als ``set``.
+        """
+        if self.__search is None:
+            self.__search = SearchIndex(
+                (entry.id, entry.text) for entry in self.__entries.values()
+            )
+        return self.__search.search(query)
+
+    def apply_all(self, operations: Iterable[dict]) -> bool:
+        """
+        Wendet mehrere Operationen nacheinander an.
+
+        :param operations: Die Operationen als ``list``.
+        :return: ``True``, wenn sich das Modell geaendert hat.
+        """
+        changed = False
+        for operation in operations:
+            changed = self.apply(operation) or changed
+
+        return changed
+
+    def to_dicts(self) -> List[dict]:
+        """
+        Liefert alle Eintraege in ihrer ``dict``-Darstellung.
+
+        :return: Die Eintraege als ``list`` von ``dict``.
+        """
+        return [entry.to_dict() for entry in self.__entries.values()]
+
+    def index(self, entry_id: str, reverse: bool = False) -> int:
+        """
+        Liefert die Position eines Eintrags in der sortierten Einkaufsliste.
+
+        :param entry_id: Die ID als ``str``.
+        :param reverse: Ob die Liste umgekehrt sortiert ist, als ``bool``.
+        :return: Die Position als ``int``.
+        """
+        index = self.__sorted.index(self.__entries[entry_id])
+        return len(self.__sorted) - 1 - index if reverse else index
+
+    def sorted_dicts(
+        self, reverse: bool = False, ids: Optional[AbstractSet[str]] = None
+    ) -> List[dict]:
+        """
+        Liefert alle Eintraege sortiert nach Status und Text in ihrer ``dict``-Darstellung.
+        Es wird nicht neu sortiert, sondern die mitgefuehrte Reihenfolge verwendet.
+
+        :param reverse: Ob umgekehrt sortiert werden soll, als ``bool``.
+        :param ids: [optional] Nur die Eintraege mit diesen IDs (z.B. von ``search``) liefern.
+        :return: Die Eintraege als ``list`` von ``dict``.
+        """
+        entries = self.__entries
+        with tracer.span("sort", entries=len(entries)):
+            if ids is None:
+                return [entries[entry_id].to_dict() for entry_id in self.__sorted.ids(reverse)]
+            if len(ids) * SORT_SUBSET_RATIO < len(entries):
+                # wenige Treffer direkt sortieren statt die ganze Liste zu durchlaufen
+                matches = sorted(
+                    (entries[entry_id] for entry_id in ids if entry_id in entries),
+                    key=Entry.sort_key, reverse=reverse,
+                )
+                return [entry.to_dict() for entry in matches]
+            return [
+                entries[entry_id].to_dict()
+                for entry_id in self.__sorted.ids(reverse) if entry_id in ids
+            ]
@@ -0,0 +1,137 @@
+import unicodedata
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+# Laenge der N-Gramme; kuerzere Suchbegriffe werden ueber die Wortanfaenge gesucht
+NGRAM_LENGTH = 3
+# Ab dieser Anzahl an Kandidaten lohnt es sich, mit weiteren N-Grammen zu schneiden
+MIN_INTERSECT = 32
+
+
+def normalize_text(text: str) -> str:
+    """
+    Bringt einen Text in die Form, in der gesucht wird: ohne Gross-/Kleinschreibung, Akzente
+    und mehrfache Leerzeichen, sodass z.B. ``"Äpfel"`` auch mit ``"apf"`` gefunden wird.
+
+    :param text: Der Text als ``str``.
+    :return: Der normalisierte Text als ``str``.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[index:index + NGRAM_LENGTH] for index in range(len(text) - NGRAM_LENGTH + 1)}
+
+
+def _prefixes(text: str) -> Set[str]:
+    return {word[:length] for word in text.split() for length in range(1, NGRAM_LENGTH)}
+
+
+class SearchIndex:
+    """
+    Index ueber die Texte der Eintraege fuer die Filterung der Einkaufsliste. Er wird bei jeder
+    Aenderung eines Eintrags angepasst statt neu aufgebaut.
+
+    Suchbegriffe ab ``NGRAM_LENGTH`` Zeichen werden ueber einen N-Gramm-Index gesucht: Nur
+    Eintraege, die alle N-Gramme des Begriffs enthalten, werden noch auf den Begriff geprueft.
+    Kuerzere Begriffe passen auf Eintraege mit einem Wort, das so beginnt; die Wortanfaenge
+    bilden einen auf diese Tiefe begrenzten Praefixbaum und sind direkt nachschlagbar.
+    """
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()) -> None:
+        """
+        Instantiiert den Index.
+
+        :param entries: Die initialen Eintraege als ``(ID, Text)``.
+        """
+        # ID -> normalisierter Text
+        self.__texts: Dict[str, str] = {}
+        # N-Gramm bzw. Wortanfang -> IDs
+        self.__ngrams: Dict[str, Set[str]] = {}
+        self.__prefixes: Dict[str, Set[str]] = {}
+        for entry_id, text in entries:
+            self.add(entry_id, text)
+
+    def __len__(self) -> int:
+        return len(self.__texts)
+
+    def add(self, entry_id: str, text: str):
+        """
+        Nimmt einen Eintrag auf oder aktualisiert seinen Text. Ist der Text unveraendert, passiert
+        nichts.
+
+        :param entry_id: Die ID als ``str``.
+        :param text: Der Text als ``str``.
+        """
+        normalized = normalize_text(text)
+        previous = self.__texts.get(entry_id)
+        if previous == normalized:
+            return
+        if previous is not None:
+            self.remove(entry_id)
+
+        self.__texts[entry_id] = normalized
+        for key, index in self.__keys(normalized):
+            ids = index.get(key)
+            if ids is None:
+                ids = index[key] = set()
+            ids.add(entry_id)
+
+    def remove(self, entry_id: str):
+        """
+        Entfernt einen Eintrag.
+
+        :param entry_id: Die ID als ``str``.
+        """
+        normalized = self.__texts.pop(entry_id, None)
+        if normalized is None:
+            return
+
+        for key, index in self.__keys(normalized):
+            ids = index[key]
+            ids.discard(entry_id)
+            if not ids:
+                del index[key]
+
+    def search(self, query: str) -> Set[str]:
+        """
+        Sucht die Eintraege, die zum Suchbegriff passen.
+
+        :param query: Der Suchbegriff als ``str``.
+        :return: Die IDs der passenden Eintraege als ``set``, darf nicht veraendert werden.
+        Ist der Begriff leer, passen alle Eintraege.
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return set(self.__texts)
+
+        if len(normalized) < NGRAM_LENGTH:
+            if " " in normalized:
+                return {
+                    entry_id for entry_id, text in self.__texts.items() if normalized in text
+                }
+            return self.__prefixes.get(normalized, set())
+
+        postings = []
+        for ngram in _ngrams(normalized):
+            ids = self.__ngrams.get(ngram)
+            if ids is None:
+                return set()
+            postings.append(ids)
+
+        # mit der kleinsten Menge beginnen; wenige Kandidaten direkt pruefen statt zu schneiden
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            if len(candidates) < MIN_INTERSECT:
+                break
+            candidates = candidates & ids
+
+        texts = self.__texts
+        return {entry_id for entry_id in candidates if normalized in texts[entry_id]}
+
+    def __keys(self, normalized: str) -> Iterator[Tuple[str, Dict[str, Set[str]]]]:
+        for ngram in _ngrams(normalized):
+            yield ngram, self.__ngrams
+        for prefix in _prefixes(normalized):
+            yield prefix, self.__prefixes
@@ -0,0 +1,88 @@
+import json
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+
+class Serializer(NamedTuple):
+    """
+    Beschreibt ein Serialisierungsformat.
+    """
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+SERIALIZERS: Dict[str, Serializer] = {"json": Serializer("json", _json_dumps, _json_loads)}
+
+try:
+    import orjson
+
+    SERIALIZERS["orjson"] = Serializer("orjson", orjson.dumps, orjson.loads)
+except ImportError:
+    pass
+
+try:
+    import msgpack
+
+    SERIALIZERS["msgpack"] = Serializer(
+        "msgpack",
+        lambda obj: msgpack.packb(obj, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+except ImportError:
+    pass
+
+
+def get_serializer(name: Optional[str] = None) -> Serializer:
+    """
+    Liefert ein Serialisierungsformat. Ist kein Name angegeben, wird das schnellste verfuegbare
+    JSON-Format verwendet (``orjson``, sonst kompaktes JSON der Standardbibliothek).
+    Nicht installierte Formate fallen ebenfalls auf JSON zurueck.
+
+    :param name: ``"json"``, ``"orjson"`` oder ``"msgpack"`` als ``str``.
+    :return: Das Format als ``Serializer``.
+    """
+    if name is None:
+        name = "orjson" if "orjson" in SERIALIZERS else "json"
+
+    serializer = SERIALIZERS.get(name)
+    if serializer is None:
+        log.warning('serializer "%s" not available, using json', name)
+        return get_serializer()
+
+    return serializer
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Wandelt ein Objekt in kompaktes JSON um.
+
+    :param obj: Das Objekt.
+    :return: Das JSON als UTF-8 ``bytes``.
+    """
+    return JSON.dumps(obj)
+
+
+def loads(data: bytes) -> Any:
+    """
+    Liest ein Objekt aus JSON ein.
+
+    :param data: Das JSON als ``bytes`` oder ``str``.
+    :return: Das Objekt.
+    """
+    return JSON.loads(data)
+
+
+# Schnellstes verfuegbares JSON-Format, wird fuer Dateien und MQTT verwendet
+JSON = get_serializer()
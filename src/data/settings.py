@@ -1,9 +1,22 @@
-from dataclasses import dataclass, asdict
-import json
+from dataclasses import dataclass, asdict, field, fields
+from typing import Callable, List, Optional, Set
 
-from data.files import read_settings_from_files, write_settings_to_files
+from data.files import get_settings_mtime, read_settings_from_files, write_settings_to_files
+from sync import DEFAULT_LIST, new_entry_id
+from tracing import get_logger
 
-@dataclass
+log = get_logger(__name__)
+
+# Prozessweit geteilte Einstellungen, siehe ``AppSettings.current``
+_current: Optional["AppSettings"] = None
+_current_mtime: Optional[float] = None
+_saved_values: dict = {}
+_listeners: List[Callable[["AppSettings", Set[str]], None]] = []
+
+
+# eq=False, da Kivy-Properties gleiche Werte sonst nicht zuweisen und das geteilte Objekt
+# dadurch nicht uebernommen wuerde
+@dataclass(eq=False)
 class AppSettings:
     """
     Stellt Datenklasse zum Halten der aktuellen Einstellungen dar.
@@ -14,18 +27,42 @@ class AppSettings:
     mqtt_topic: str = "gsog/shopping"
     mqtt_username: str = ""
     mqtt_password: str = ""
+    delta_sync: bool = True
+    save_delay: float = 0.5
+    storage_backend: str = "journal"
+    lists: List[str] = field(default_factory=lambda: [DEFAULT_LIST])
+    active_list: str = DEFAULT_LIST
+    # Diagnose: Level der Log-Ausgaben, Trace-Datei und Debug-Anzeige der Messungen
+    log_level: str = "INFO"
+    tracing: bool = False
+    debug_overlay: bool = False
+    # Eindeutige ID dieses Geraets, z.B. fuer die MQTT-Client-ID
+    device_id: str = field(default_factory=new_entry_id)
 
     def to_json_file(self):
         """
         Wandelt das Objekt in eine Einstellung-JSON-Datei um und speichert diese auf dem Geraet.
+        Handelt es sich um die aktuellen Einstellungen, werden die Beobachter ueber die
+        geaenderten Werte informiert.
         """
+        global _current_mtime, _saved_values
+
         settings_dict = {"settings": asdict(self)}
         try:
             write_settings_to_files(settings_dict)
         except OSError as e:
-            print(e)
+            log.warning("writing settings failed: %s", e)
             return
 
+        if self is _current:
+            _current_mtime = get_settings_mtime()
+            changed = {
+                key for key, value in settings_dict["settings"].items()
+                if _saved_values.get(key) != value
+            }
+            _saved_values = settings_dict["settings"]
+            AppSettings.notify(changed)
+
     @staticmethod
     def from_json_file():
         """
@@ -37,7 +74,7 @@ class AppSettings:
         try:
             settings_dict = read_settings_from_files()
         except FileNotFoundError:
-            print("Settings file not found")
+            log.info("Settings file not found")
             return None
 
         settings_values = settings_dict["settings"]
@@ -49,7 +86,19 @@ class AppSettings:
             mqtt_topic=settings_values["mqtt_topic"],
             mqtt_username=settings_values["mqtt_username"],
             mqtt_password=settings_values["mqtt_password"],
+            delta_sync=settings_values.get("delta_sync", True),
+            save_delay=settings_values.get("save_delay", 0.5),
+            storage_backend=settings_values.get("storage_backend", "journal"),
+            lists=settings_values.get("lists", [DEFAULT_LIST]),
+            active_list=settings_values.get("active_list", DEFAULT_LIST),
+            log_level=settings_values.get("log_level", "INFO"),
+            tracing=settings_values.get("tracing", False),
+            debug_overlay=settings_values.get("debug_overlay", False),
+            device_id=settings_values.get("device_id") or new_entry_id(),
         )
+        if not settings_values.get("device_id"):
+            # die ID muss ueber Neustarts hinweg gleich bleiben
+            new_settings.to_json_file()
 
         return new_settings
 
@@ -58,11 +107,90 @@ class AppSettings:
         """
         Statische Methode, welche entweder initiale Einstellungen anlegt oder diese aus einer
         vorhandenen JSON-Datei liest.
+        Die Einstellungen werden nur einmal pro Prozess gelesen und erst erneut eingelesen,
+        wenn sich die Datei seitdem geaendert hat. Es wird immer dasselbe Objekt geliefert.
         """
+        global _current, _current_mtime, _saved_values
+
+        mtime = get_settings_mtime()
+        if _current is not None and mtime is not None and mtime == _current_mtime:
+            return _current
+
         settings = AppSettings.from_json_file()
         if settings is None:
-            print("Creating new settings")
+            log.info("Creating new settings")
             settings = AppSettings()
-            settings.to_json_file()
-        
-        return settings
+            if _current is None:
+                _current = settings
+            _current.to_json_file()
+            return _current
+
+        if _current is None:
+            _current = settings
+            _current_mtime = mtime
+            _saved_values = asdict(settings)
+            return _current
+
+        # Datei wurde von aussen geaendert: Werte uebernehmen, Objekt behalten
+        changed = set()
+        for settings_field in fields(AppSettings):
+            value = getattr(settings, settings_field.name)
+            if getattr(_current, settings_field.name) != value:
+                setattr(_current, settings_field.name, value)
+                changed.add(settings_field.name)
+        _current_mtime = mtime
+        _saved_values = asdict(_current)
+        AppSettings.notify(changed)
+
+        return _current
+
+    @staticmethod
+    def current() -> "AppSettings":
+        """
+        Liefert die prozessweit geteilten Einstellungen, ohne auf die Datei zuzugreifen.
+        Nur beim ersten Aufruf werden die Einstellungen gelesen.
+
+        :return: Die aktuellen Einstellungen als ``AppSettings``.
+        """
+        if _current is None:
+            return AppSettings.get_or_create()
+
+        return _current
+
+    # region change notification
+
+    @staticmethod
+    def bind(callback: Callable[["AppSettings", Set[str]], None]):
+        """
+        Registriert einen Beobachter, der bei geaenderten Einstellungen aufgerufen wird.
+
+        :param callback: Wird mit den Einstellungen und den Namen der geaenderten Werte als
+        ``set`` aufgerufen.
+        """
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+    @staticmethod
+    def unbind(callback: Callable[["AppSettings", Set[str]], None]):
+        """
+        Entfernt einen mit ``bind`` registrierten Beobachter.
+
+        :param callback: Der Beobachter als ``Callable``.
+        """
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+    @staticmethod
+    def notify(changed: Set[str]):
+        """
+        Informiert alle Beobachter ueber geaenderte Einstellungen.
+
+        :param changed: Die Namen der geaenderten Werte als ``set``.
+        """
+        if not changed or _current is None:
+            return
+
+        for callback in list(_listeners):
+            callback(_current, changed)
+
+    # endregion
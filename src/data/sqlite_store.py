@@ -0,0 +1,239 @@
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from data.files import FILES_PATH, entries_filename
+from data.store import EntriesStore
+from sync import (
+    OPERATION_REGISTERS, REGISTERS, creates_entry, get_register_timestamp, new_entry,
+)
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+database_filename = "entries.db"
+
+# Spalten, die erst spaeter hinzugekommen sind und beim Oeffnen ergaenzt werden
+ADDED_COLUMNS = {
+    "text_ts": "TEXT NOT NULL DEFAULT ''",
+    "checked_ts": "TEXT NOT NULL DEFAULT ''",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    is_checked INTEGER NOT NULL DEFAULT 0,
+    text_ts TEXT NOT NULL DEFAULT '',
+    checked_ts TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_sort ON entries (is_checked, text);
+CREATE TABLE IF NOT EXISTS tombstones (
+    id TEXT PRIMARY KEY,
+    ts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SqliteEntriesStore(EntriesStore):
+    """
+    Speichert die Eintraege der Einkaufsliste in einer SQLite-Datenbank.
+    Einzelne Aenderungen betreffen nur die jeweilige Zeile, sortierte Ausschnitte
+    (``query_range``) und Anzahlen (``count``) werden ueber den Index auf ``(is_checked, text)``
+    abgefragt, ohne die ganze Liste zu laden. Die App selbst liest die Liste beim Start mit
+    ``load`` komplett in das ``EntryModel`` und verwendet Ausschnitte und Anzahlen bisher nicht.
+    Aenderungen mit Zeitstempel werden wie in ``sync.apply_operations`` nur uebernommen, wenn
+    sie neuer als der gespeicherte Stand sind.
+    """
+    def __init__(self, directory: Path = FILES_PATH, filename: str = database_filename) -> None:
+        """
+        Oeffnet die Datenbank und uebernimmt beim ersten Start eine vorhandene
+        ``entries.json``.
+
+        :param directory: Ordner der Datenbank als ``Path``.
+        :param filename: Dateiname der Datenbank als ``str``.
+        """
+        if not directory.is_dir():
+            directory.mkdir(parents=True)
+
+        self.__directory = directory
+        self.__connection = sqlite3.connect(str(Path(directory, filename)))
+        self.__connection.executescript(SCHEMA)
+        self.__add_columns()
+        self.migrate_from_json()
+
+    # region read
+
+    def load(self) -> Dict[str, Any]:
+        tombstones = dict(self.__connection.execute("SELECT id, ts FROM tombstones"))
+        return {"entries": self.query_range(), "tombstones": tombstones}
+
+    def query_range(
+        self, offset: int = 0, limit: Optional[int] = None, reverse: bool = False
+    ) -> List[dict]:
+        """
+        Liefert einen nach Status und Text sortierten Ausschnitt der Eintraege.
+
+        :param offset: Index des ersten Eintrags als ``int``.
+        :param limit: Maximale Anzahl an Eintraegen als ``int``, ``None`` fuer alle.
+        :param reverse: Ob umgekehrt sortiert werden soll, als ``bool``.
+        :return: Die Eintraege als ``list``.
+        """
+        direction = "DESC" if reverse else "ASC"
+        rows = self.__connection.execute(
+            f"SELECT id, text, is_checked, text_ts, checked_ts FROM entries "
+            f"ORDER BY is_checked {direction}, text {direction} LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        entries = []
+        for entry_id, text, is_checked, text_ts, checked_ts in rows:
+            entry = {"id": entry_id, "text": text, "is_checked": bool(is_checked)}
+            if text_ts:
+                entry["text_ts"] = text_ts
+            if checked_ts:
+                entry["checked_ts"] = checked_ts
+            entries.append(entry)
+
+        return entries
+
+    def count(self, is_checked: Optional[bool] = None) -> int:
+        """
+        Zaehlt die Eintraege.
+
+        :param is_checked: Wenn angegeben, werden nur Eintraege mit diesem Status gezaehlt.
+        :return: Die Anzahl als ``int``.
+        """
+        if is_checked is None:
+            row = self.__connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        else:
+            row = self.__connection.execute(
+                "SELECT COUNT(*) FROM entries WHERE is_checked = ?", (int(is_checked),)
+            ).fetchone()
+
+        return row[0]
+
+    # endregion
+
+    # region write
+
+    def append(self, operations: List[dict]):
+        with self.__connection:
+            for operation in operations:
+                self.__apply(operation)
+
+    def replace(self, entries_dict: Dict[str, list]):
+        self.append([{
+            "op": "reset",
+            "entries": entries_dict["entries"],
+            "tombstones": entries_dict.get("tombstones", {}),
+        }])
+
+    def __apply(self, operation: dict):
+        kind = operation.get("op")
+        entry_id = operation.get("id")
+        execute = self.__connection.execute
+
+        if kind in OPERATION_REGISTERS:
+            if self.__is_deleted(entry_id):  # type: ignore
+                return
+            if creates_entry(operation):
+                entry = new_entry(operation)
+                execute(
+                    "INSERT OR IGNORE INTO entries (id, text, is_checked, text_ts, checked_ts) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        entry_id, entry["text"], int(entry["is_checked"]),
+                        entry.get("text_ts", ""), entry.get("checked_ts", ""),
+                    ),
+                )
+            if kind == "add" and "ts" not in operation:
+                return
+            for field, timestamp_field in REGISTERS:
+                if field not in operation:
+                    continue
+                # ohne Zeitstempel (aeltere Versionen) wird die Aenderung immer uebernommen
+                timestamp = get_register_timestamp(operation, field)
+                execute(
+                    f"UPDATE entries SET {field} = ?, "
+                    f"{timestamp_field} = COALESCE(?, {timestamp_field}) "
+                    f"WHERE id = ? AND (? IS NULL OR {timestamp_field} < ?)",
+                    (operation[field], timestamp, entry_id, timestamp, timestamp),
+                )
+        elif kind == "delete":
+            execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            execute(
+                "INSERT OR REPLACE INTO tombstones (id, ts) VALUES "
+                "(?, MAX(?, COALESCE((SELECT ts FROM tombstones WHERE id = ?), '')))",
+                (entry_id, operation.get("ts", ""), entry_id),
+            )
+        elif kind == "reset":
+            execute("DELETE FROM entries")
+            execute("DELETE FROM tombstones")
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO entries (id, text, is_checked, text_ts, checked_ts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        entry["id"], entry["text"], int(entry["is_checked"]),
+                        entry.get("text_ts", ""), entry.get("checked_ts", ""),
+                    )
+                    for entry in operation["entries"]
+                ],
+            )
+            self.__connection.executemany(
+                "INSERT INTO tombstones (id, ts) VALUES (?, ?)",
+                operation.get("tombstones", {}).items(),
+            )
+        else:
+            log.warning("ignoring unknown operation %s", operation)
+
+    def __is_deleted(self, entry_id: str) -> bool:
+        row = self.__connection.execute(
+            "SELECT 1 FROM tombstones WHERE id = ?", (entry_id,)
+        ).fetchone()
+        return row is not None
+
+    # endregion
+
+    def migrate_from_json(self):
+        """
+        Uebernimmt einmalig die Eintraege aus ``entries.json`` (inklusive Journal) in die
+        Datenbank. Die JSON-Dateien bleiben dabei unveraendert erhalten.
+        """
+        migrated = self.__connection.execute(
+            "SELECT value FROM meta WHERE key = 'migrated_from_json'"
+        ).fetchone()
+        if migrated is not None:
+            return
+
+        from data.journal import EntriesJournal
+        from sync import ensure_entry_ids
+
+        state = EntriesJournal(self.__directory).load()
+        if state["entries"]:
+            log.info("migrating %s to sqlite", entries_filename)
+            self.replace({
+                "entries": ensure_entry_ids(state["entries"]),
+                "tombstones": state["tombstones"],
+            })
+
+        with self.__connection:
+            self.__connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_from_json', '1')"
+            )
+
+    def __add_columns(self):
+        columns = {row[1] for row in self.__connection.execute("PRAGMA table_info(entries)")}
+        with self.__connection:
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.__connection.execute(
+                        f"ALTER TABLE entries ADD COLUMN {column} {definition}"
+                    )
+
+    def close(self):
+        self.__connection.close()
@@ -0,0 +1,80 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List
+
+from data.files import FILES_PATH
+from sync import DEFAULT_LIST
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+# Ordner (in ``FILES_PATH``), in dem die weiteren Einkaufslisten gespeichert werden
+LISTS_FOLDER = "lists"
+
+
+class EntriesStore(ABC):
+    """
+    Gemeinsame Schnittstelle der Speicher fuer die Eintraege der Einkaufsliste.
+    """
+    @abstractmethod
+    def load(self) -> Dict[str, Any]:
+        """
+        Liest alle Eintraege ein.
+
+        :return: Die Eintraege und Loeschmarken als ``dict`` im Format der ``entries.json``.
+        """
+
+    @abstractmethod
+    def append(self, operations: List[dict]):
+        """
+        Speichert einzelne Aenderungen.
+
+        :param operations: Die Aenderungen als ``list`` (siehe ``sync``).
+        """
+
+    @abstractmethod
+    def replace(self, entries_dict: Dict[str, list]):
+        """
+        Ersetzt alle Eintraege.
+
+        :param entries_dict: Die Eintraege (und Loeschmarken) als ``dict`` im Format der
+        ``entries.json``.
+        """
+
+    def close(self):
+        """
+        Gibt alle vom Speicher gehaltenen Ressourcen frei.
+        """
+
+
+def get_list_directory(list_name: str) -> Path:
+    """
+    Liefert den Ordner, in dem eine Einkaufsliste gespeichert wird. Die Standardliste liegt
+    weiterhin direkt in ``FILES_PATH``.
+
+    :param list_name: Der Name der Einkaufsliste als ``str``.
+    :return: Der Ordner als ``Path``.
+    """
+    if list_name == DEFAULT_LIST:
+        return FILES_PATH
+
+    return Path(FILES_PATH, LISTS_FOLDER, list_name)
+
+
+def create_entries_store(backend: str, directory: Path = FILES_PATH) -> EntriesStore:
+    """
+    Erstellt den Speicher fuer die Eintraege anhand des eingestellten Backends.
+
+    :param backend: ``"journal"`` (JSON-Snapshot mit Journal) oder ``"sqlite"`` als ``str``.
+    :param directory: Ordner, in dem die Eintraege gespeichert werden, als ``Path``.
+    :return: Den Speicher als ``EntriesStore``.
+    """
+    if backend == "sqlite":
+        from data.sqlite_store import SqliteEntriesStore
+        return SqliteEntriesStore(directory)
+
+    if backend != "journal":
+        log.warning('unknown storage backend "%s", using journal', backend)
+
+    from data.journal import EntriesJournal
+    return EntriesJournal(directory)
@@ -0,0 +1,373 @@
+import csv
+import io
+import itertools
+import json
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, List, Optional, Tuple
+
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+# Unterstuetzte Formate fuer Import und Export, erkannt an der Dateiendung
+FORMATS = ("txt", "csv", "json")
+# Laengster erlaubter Text eines importierten Eintrags
+MAX_TEXT_LENGTH = 500
+# Hoechstens so viele Eintraege werden aus einer Datei importiert
+MAX_IMPORT_ENTRIES = 100_000
+# So viele fehlerhafte Zeilen werden mit Grund gemerkt, weitere nur gezaehlt
+MAX_REPORTED_ERRORS = 20
+# Groesse der Bloecke, in denen JSON-Dateien gelesen werden
+JSON_CHUNK_SIZE = 64 * 1024
+# Anhand so vieler Zeichen wird das Trennzeichen einer CSV-Datei bestimmt
+CSV_SAMPLE_SIZE = 4096
+CSV_DELIMITERS = ",;\t"
+
+TRUE_VALUES = {"1", "true", "yes", "ja", "oui", "x"}
+FALSE_VALUES = {"", "0", "false", "no", "nein", "non"}
+# Abhaken in Textdateien wie in Markdown-Checklisten: ``[x] Milch`` bzw. ``[ ] Milch``
+CHECKED_MARKERS = ("[x] ", "[X] ")
+UNCHECKED_MARKER = "[ ] "
+BULLETS = ("- ", "* ")
+
+
+class ImportReport:
+    """
+    Ergebnis eines Imports: Anzahl der uebernommenen und der fehlerhaften Zeilen sowie die
+    Gruende der ersten ``MAX_REPORTED_ERRORS`` Fehler.
+    """
+    def __init__(self) -> None:
+        self.imported = 0
+        self.skipped = 0
+        self.truncated = False
+        # (Zeile, Grund)
+        self.errors: List[Tuple[int, str]] = []
+
+    def add_error(self, row: int, reason: str):
+        """
+        Merkt eine fehlerhafte Zeile.
+
+        :param row: Die Zeile (bei JSON die Position in der Liste) als ``int``, ab 1.
+        :param reason: Der Grund als ``str``.
+        """
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, reason))
+
+    def __repr__(self) -> str:
+        return (
+            f"ImportReport(imported={self.imported}, skipped={self.skipped}, "
+            f"truncated={self.truncated})"
+        )
+
+
+def get_format(path: Path) -> str:
+    """
+    Bestimmt das Format einer Datei anhand ihrer Endung.
+
+    :param path: Der Pfad als ``Path``.
+    :return: Das Format als ``str`` (siehe ``FORMATS``).
+    :raises ValueError: Wenn das Format nicht unterstuetzt wird.
+    """
+    file_format = Path(path).suffix.lower().lstrip(".")
+    if file_format not in FORMATS:
+        raise ValueError(f"unsupported file format {path}")
+
+    return file_format
+
+
+def parse_checked(value: Any) -> bool:
+    """
+    Liest den Status eines Eintrags, z.B. ``True``, ``"1"``, ``"ja"`` oder ``"x"``.
+
+    :param value: Der Wert aus der Datei.
+    :return: Der Status als ``bool``.
+    :raises ValueError: Wenn der Wert kein Status ist.
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        normalized = value.strip().casefold()
+        if normalized in TRUE_VALUES:
+            return True
+        if normalized in FALSE_VALUES:
+            return False
+
+    raise ValueError(f"invalid checked state {value!r}")
+
+
+def validate_entry(text: Any, is_checked: Any = False) -> dict:
+    """
+    Prueft eine importierte Zeile und wandelt sie in einen Eintrag ohne ID um.
+
+    :param text: Der Text aus der Datei.
+    :param is_checked: Der Status aus der Datei.
+    :return: Der Eintrag als ``dict`` mit ``"text"`` und ``"is_checked"``.
+    :raises ValueError: Wenn die Zeile ungueltig ist.
+    """
+    if not isinstance(text, str):
+        raise ValueError("text is missing")
+    text = " ".join(text.split())
+    if not text:
+        raise ValueError("text is empty")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ValueError(f"text is longer than {MAX_TEXT_LENGTH} characters")
+
+    return {"text": text, "is_checked": parse_checked(is_checked)}
+
+
+# region import
+
+def _read_txt(file: IO[str]) -> Iterator[Tuple[int, Any, Any]]:
+    for line_number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(BULLETS):
+            line = line[2:].lstrip()
+        is_checked = line.startswith(CHECKED_MARKERS)
+        if is_checked or line.startswith(UNCHECKED_MARKER):
+            line = line[len(UNCHECKED_MARKER):]
+        yield line_number, line, is_checked
+
+
+def _read_csv(file: IO[str]) -> Iterator[Tuple[int, Any, Any]]:
+    # Tabellenkalkulationen trennen je nach Sprache auch mit Semikolon
+    sample = file.read(CSV_SAMPLE_SIZE)
+    sample += file.readline()
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(itertools.chain(io.StringIO(sample), file), dialect)
+    text_column, checked_column = 0, 1
+    is_first_row = True
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if is_first_row:
+            is_first_row = False
+            header = [cell.strip().casefold() for cell in row]
+            if "text" in header:
+                text_column = header.index("text")
+                checked_column = header.index("is_checked") if "is_checked" in header else -1
+                continue
+
+        text = row[text_column] if text_column < len(row) else None
+        is_checked = row[checked_column] if 0 <= checked_column < len(row) else False
+        yield reader.line_num, text, is_checked
+
+
+class _JsonStream:
+    """
+    Liest eine JSON-Datei blockweise, sodass von einer langen Liste immer nur ein Element im
+    Speicher ist.
+    """
+    def __init__(self, file: IO[str]) -> None:
+        self.__file = file
+        self.__buffer = ""
+        self.__position = 0
+        self.__decoder = json.JSONDecoder()
+
+    def peek(self) -> str:
+        """
+        Ueberspringt Leerzeichen und liefert das naechste Zeichen, ohne es zu lesen.
+
+        :return: Das Zeichen als ``str`` oder ``""`` am Ende der Datei.
+        """
+        while True:
+            buffer = self.__buffer
+            while self.__position < len(buffer) and buffer[self.__position].isspace():
+                self.__position += 1
+            if self.__position < len(buffer):
+                return buffer[self.__position]
+            if not self.__fill():
+                return ""
+
+    def expect(self, char: str):
+        """
+        Liest das naechste Zeichen, das ``char`` sein muss.
+
+        :param char: Das erwartete Zeichen als ``str``.
+        :raises ValueError: Wenn ein anderes Zeichen folgt.
+        """
+        if self.peek() != char:
+            raise ValueError(f"invalid JSON: expected {char!r} at {self.__describe()}")
+        self.__position += 1
+
+    def value(self) -> Any:
+        """
+        Liest den naechsten JSON-Wert.
+
+        :return: Der Wert.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__position)
+            except json.JSONDecodeError as e:
+                # unvollstaendiger Wert am Ende des Blocks
+                if self.__fill():
+                    continue
+                raise ValueError(f"invalid JSON: {e}") from e
+            if end == len(self.__buffer) and self.__fill():
+                # eine Zahl koennte im naechsten Block weitergehen
+                continue
+            self.__position = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """
+        Liest die Elemente einer Liste nacheinander.
+
+        :return: Die Elemente als ``Iterator``.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self.expect("]")
+                return
+            self.expect(",")
+
+    def __fill(self) -> bool:
+        chunk = self.__file.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.__buffer = self.__buffer[self.__position:] + chunk
+        self.__position = 0
+        return True
+
+    def __describe(self) -> str:
+        return repr(self.__buffer[self.__position:self.__position + 20])
+
+
+def _read_json(file: IO[str]) -> Iterator[Tuple[int, Any, Any]]:
+    stream = _JsonStream(file)
+    if stream.peek() == "{":
+        # kompletter Stand wie ``entries.json``: nur die Liste unter ``"entries"`` lesen
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key == "entries":
+                break
+            stream.value()
+            if stream.peek() == ",":
+                stream.expect(",")
+        else:
+            raise ValueError('invalid JSON: "entries" is missing')
+
+    for index, item in enumerate(stream.items(), 1):
+        if isinstance(item, dict):
+            yield index, item.get("text"), item.get("is_checked", False)
+        else:
+            yield index, item, False
+
+
+READERS = {"txt": _read_txt, "csv": _read_csv, "json": _read_json}
+
+
+def read_entries(
+    file: IO[str], file_format: str, report: Optional[ImportReport] = None
+) -> Iterator[dict]:
+    """
+    Liest Eintraege zeilenweise aus einer Datei und prueft sie. Fehlerhafte Zeilen werden
+    uebersprungen und im Bericht vermerkt, nach ``MAX_IMPORT_ENTRIES`` Eintraegen wird
+    abgebrochen.
+
+    - ``txt``: ein Eintrag pro Zeile, optional als Checkliste (``- [x] Milch``)
+    - ``csv``: Text und optional Status pro Zeile, optional mit Kopfzeile
+      (``text,is_checked``)
+    - ``json``: eine Liste von Texten oder Eintraegen bzw. ein Stand mit ``"entries"``
+
+    :param file: Die im Textmodus geoeffnete Datei.
+    :param file_format: Das Format als ``str`` (siehe ``FORMATS``).
+    :param report: [optional] Der Bericht als ``ImportReport``, wird waehrend des Lesens
+    aktualisiert.
+    :return: Die Eintraege ohne ID als ``Iterator`` von ``dict``.
+    :raises ValueError: Wenn die Datei nicht gelesen werden kann, z.B. bei ungueltigem JSON.
+    """
+    if report is None:
+        report = ImportReport()
+
+    for row, text, is_checked in READERS[file_format](file):
+        if report.imported >= MAX_IMPORT_ENTRIES:
+            log.warning("import stopped after %d entries", MAX_IMPORT_ENTRIES)
+            report.truncated = True
+            return
+        try:
+            entry = validate_entry(text, is_checked)
+        except ValueError as e:
+            report.add_error(row, str(e))
+            continue
+
+        report.imported += 1
+        yield entry
+
+
+def open_import_file(path: Path) -> IO[str]:
+    """
+    Oeffnet eine Datei zum Importieren. Ein UTF-8-BOM, wie ihn Tabellenkalkulationen
+    schreiben, wird ignoriert.
+
+    :param path: Der Pfad als ``Path``.
+    :return: Die Datei im Textmodus.
+    """
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+# endregion
+
+# region export
+
+def write_entries(entries: Iterable[dict], file: IO[str], file_format: str) -> int:
+    """
+    Schreibt Eintraege einzeln in eine Datei, sodass sie wieder importiert werden koennen.
+
+    :param entries: Die Eintraege als ``Iterable`` von ``dict``.
+    :param file: Die im Textmodus geoeffnete Datei.
+    :param file_format: Das Format als ``str`` (siehe ``FORMATS``).
+    :return: Die Anzahl der geschriebenen Eintraege als ``int``.
+    """
+    count = 0
+    if file_format == "txt":
+        for entry in entries:
+            marker = CHECKED_MARKERS[0] if entry["is_checked"] else UNCHECKED_MARKER
+            file.write(f"{marker}{entry['text']}\n")
+            count += 1
+    elif file_format == "csv":
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(("text", "is_checked"))
+        for entry in entries:
+            writer.writerow((entry["text"], int(entry["is_checked"])))
+            count += 1
+    elif file_format == "json":
+        file.write("[")
+        for entry in entries:
+            item = {"text": entry["text"], "is_checked": entry["is_checked"]}
+            file.write(("\n" if count == 0 else ",\n") + json.dumps(item, ensure_ascii=False))
+            count += 1
+        file.write("\n]\n")
+    else:
+        raise ValueError(f"unsupported file format {file_format}")
+
+    return count
+
+
+def open_export_file(path: Path) -> IO[str]:
+    """
+    Oeffnet eine Datei zum Exportieren.
+
+    :param path: Der Pfad als ``Path``.
+    :return: Die Datei im Textmodus.
+    """
+    return open(path, "w", encoding="utf-8", newline="")
+
+# endregion
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict
+
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+# Felder, mit denen gesendete Nachrichten markiert werden
+ORIGIN_FIELD = "origin"
+HASH_FIELD = "hash"
+
+
+def content_hash(msg: dict) -> str:
+    """
+    Berechnet einen Hash ueber den Inhalt eines kompletten Stands (Eintraege und Loeschmarken),
+    unabhaengig von der Reihenfolge der Schluessel.
+
+    :param msg: Der Stand als ``dict`` mit ``"entries"``.
+    :return: Der Hash als ``str``.
+    """
+    content = {"entries": msg["entries"], "tombstones": msg.get("tombstones", {})}
+    data = json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class EchoFilter:
+    """
+    Erkennt empfangene Nachrichten, die nichts Neues enthalten, bevor sie angewendet werden.
+    Da jedes Geraet die Topic abonniert, auf die es sendet, kommt jede eigene Nachricht zurueck.
+
+    Gesendete Nachrichten werden dazu mit der ID des Geraets (``"origin"``) und komplette Staende
+    zusaetzlich mit dem Hash ihres Inhalts (``"hash"``) markiert. Verworfen werden eigene
+    Nachrichten sowie komplette Staende, deren Inhalt auf derselben Topic bereits gesendet oder
+    empfangen wurde; da Staende zusammengefuehrt werden, kann ein bereits bekannter Stand nichts
+    mehr aendern. Nachrichten aelterer Versionen sind nicht markiert und werden immer angewendet.
+    """
+    def __init__(self, origin: str) -> None:
+        """
+        Instantiiert den Filter.
+
+        :param origin: Die ID dieses Geraets als ``str``.
+        """
+        self.origin = origin
+        self.__lock = threading.Lock()
+        # Topic -> Hash des zuletzt gesendeten oder empfangenen kompletten Stands
+        self.__hashes: Dict[str, str] = {}
+
+        self.echoes = 0
+        self.duplicates = 0
+        self.unchanged = 0
+
+    def tag(self, msg: dict, topic: str) -> dict:
+        """
+        Markiert eine zu sendende Nachricht. Kann von jedem Thread aufgerufen werden.
+
+        :param msg: Die Nachricht als ``dict``, wird nicht veraendert.
+        :param topic: Die Topic, auf die gesendet wird, als ``str``.
+        :return: Die markierte Nachricht als neues ``dict``.
+        """
+        tagged = {**msg, ORIGIN_FIELD: self.origin}
+        if "entries" in msg:
+            digest = content_hash(msg)
+            tagged[HASH_FIELD] = digest
+            with self.__lock:
+                self.__hashes[topic] = digest
+
+        return tagged
+
+    def is_own(self, msg: Any) -> bool:
+        """
+        Prueft, ob eine empfangene Nachricht von diesem Geraet gesendet wurde.
+
+        :param msg: Die dekodierte Nachricht.
+        :return: ``True`` fuer eine eigene Nachricht.
+        """
+        return isinstance(msg, dict) and msg.get(ORIGIN_FIELD) == self.origin
+
+    def accept(self, msg: dict, topic: str) -> bool:
+        """
+        Prueft, ob eine empfangene Nachricht angewendet werden muss. Kann von jedem Thread
+        aufgerufen werden.
+
+        :param msg: Die dekodierte Nachricht als ``dict``.
+        :param topic: Die Topic der Nachricht als ``str``.
+        :return: ``False``, wenn die Nachricht verworfen werden kann.
+        """
+        with self.__lock:
+            if self.is_own(msg):
+                self.echoes += 1
+                return False
+
+            digest = msg.get(HASH_FIELD)
+            if digest is None:
+                return True
+            if self.__hashes.get(topic) == digest:
+                self.duplicates += 1
+                log.debug("skipping already known state on %s", topic)
+                return False
+
+            self.__hashes[topic] = digest
+            return True
+
+    def note_unchanged(self):
+        """
+        Zaehlt eine angewendete Nachricht, die nichts geaendert hat, sodass weder angezeigt
+        noch gespeichert wurde.
+        """
+        with self.__lock:
+            self.unchanged += 1
+
+    def get_stats(self) -> dict:
+        """
+        Liefert Zaehler zu den verworfenen Nachrichten.
+
+        :return: Die Zaehler als ``dict`` mit ``"echoes"``, ``"duplicates"`` und
+        ``"unchanged"``.
+        """
+        with self.__lock:
+            return {
+                "echoes": self.echoes,
+                "duplicates": self.duplicates,
+                "unchanged": self.unchanged,
+            }
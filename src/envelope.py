@@ -0,0 +1,237 @@
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from data.serialization import JSON, SERIALIZERS, loads
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+# Kennzeichnet eine Nachricht im Envelope-Format. JSON beginnt nie mit einem Null-Byte, daher
+# koennen Nachrichten aelterer Versionen (reines JSON) weiterhin gelesen werden.
+MAGIC = b"\x00SL"
+ENVELOPE_VERSION = 1
+# Aufbau: MAGIC, Version, Kompression, Kodierung, Nutzdaten
+HEADER_SIZE = len(MAGIC) + 3
+
+# Kleinere Nachrichten werden nicht komprimiert, da sich der Aufwand nicht lohnt
+COMPRESS_MIN_SIZE = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class Codec(NamedTuple):
+    """
+    Beschreibt ein Kompressions- oder Kodierungsverfahren des Envelopes.
+    """
+    name: str
+    id: int
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+class PayloadFormat(NamedTuple):
+    """
+    Kombination aus Kompression und Kodierung, in der Nachrichten gesendet werden.
+    """
+    compression: str
+    encoding: str
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+# in der Reihenfolge der Bevorzugung
+COMPRESSIONS: Dict[str, Codec] = {}
+try:
+    import zstandard
+
+    COMPRESSIONS["zstd"] = Codec(
+        "zstd",
+        2,
+        lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+except ImportError:
+    pass
+COMPRESSIONS["zlib"] = Codec(
+    "zlib", 1, lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress
+)
+COMPRESSIONS["none"] = Codec("none", 0, _identity, _identity)
+
+ENCODINGS: Dict[str, Codec] = {}
+if "msgpack" in SERIALIZERS:
+    ENCODINGS["msgpack"] = Codec(
+        "msgpack", 1, SERIALIZERS["msgpack"].dumps, SERIALIZERS["msgpack"].loads
+    )
+ENCODINGS["json"] = Codec("json", 0, JSON.dumps, JSON.loads)
+
+_COMPRESSIONS_BY_ID = {codec.id: codec for codec in COMPRESSIONS.values()}
+_ENCODINGS_BY_ID = {codec.id: codec for codec in ENCODINGS.values()}
+
+
+def encode_payload(obj: Any, payload_format: Optional[PayloadFormat] = None) -> bytes:
+    """
+    Wandelt eine Nachricht in die zu sendenden Bytes um.
+
+    :param obj: Die Nachricht.
+    :param payload_format: [optional] Das Format als ``PayloadFormat``. Ist es ``None``, wird
+    reines JSON ohne Envelope erzeugt, das auch aeltere Versionen lesen koennen.
+    :return: Die Nutzdaten als ``bytes``.
+    """
+    if payload_format is None:
+        return JSON.dumps(obj)
+
+    compression = COMPRESSIONS[payload_format.compression]
+    encoding = ENCODINGS[payload_format.encoding]
+    body = encoding.encode(obj)
+    if len(body) < COMPRESS_MIN_SIZE:
+        compression = COMPRESSIONS["none"]
+
+    header = MAGIC + bytes((ENVELOPE_VERSION, compression.id, encoding.id))
+    return header + compression.encode(body)
+
+
+def is_envelope(payload: bytes) -> bool:
+    """
+    Prueft, ob Nutzdaten im Envelope-Format vorliegen.
+
+    :param payload: Die Nutzdaten als ``bytes``.
+    :return: ``True`` fuer das Envelope-Format, ``False`` fuer reines JSON.
+    """
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def decode_payload(payload: bytes) -> Any:
+    """
+    Liest eine empfangene Nachricht, im Envelope-Format oder als reines JSON.
+
+    :param payload: Die Nutzdaten als ``bytes``.
+    :return: Die Nachricht.
+    :raises ValueError: Wenn Version, Kompression oder Kodierung nicht unterstuetzt werden oder
+    die Nutzdaten fehlerhaft sind.
+    """
+    if not is_envelope(payload):
+        return loads(payload)
+
+    if len(payload) < HEADER_SIZE:
+        raise ValueError("truncated payload envelope")
+
+    version, compression_id, encoding_id = payload[len(MAGIC):HEADER_SIZE]
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"unsupported payload envelope version {version}")
+
+    compression = _COMPRESSIONS_BY_ID.get(compression_id)
+    encoding = _ENCODINGS_BY_ID.get(encoding_id)
+    if compression is None or encoding is None:
+        raise ValueError(f"unsupported payload format {compression_id}/{encoding_id}")
+
+    try:
+        body = compression.decode(payload[HEADER_SIZE:])
+    except Exception as e:
+        raise ValueError(f"invalid compressed payload: {e}") from e
+    return encoding.decode(body)
+
+
+def get_capabilities() -> dict:
+    """
+    Beschreibt die unterstuetzten Formate, so wie sie anderen Geraeten mitgeteilt werden.
+
+    :return: Die Faehigkeiten als ``dict``.
+    """
+    return {
+        "version": ENVELOPE_VERSION,
+        "compression": list(COMPRESSIONS.keys()),
+        "encoding": list(ENCODINGS.keys()),
+    }
+
+
+class FormatNegotiator:
+    """
+    Waehlt das beste Format, das alle bekannten Geraete lesen koennen.
+    Jedes Geraet (auch dieses) teilt seine Faehigkeiten mit (``get_capabilities``). Solange noch
+    keine Faehigkeiten bekannt sind oder ein Geraet einer aelteren Version reines JSON sendet,
+    wird reines JSON gesendet.
+    """
+    def __init__(self) -> None:
+        """
+        Instantiiert die Auswahl ohne bekannte Geraete.
+        """
+        self.__lock = threading.Lock()
+        self.__peers: Dict[str, dict] = {}
+        self.__legacy_peer = False
+        self.__format: Optional[PayloadFormat] = None
+
+    def update_peer(self, peer_id: str, capabilities: Optional[dict]):
+        """
+        Merkt sich die Faehigkeiten eines Geraets.
+
+        :param peer_id: ID des Geraets als ``str``.
+        :param capabilities: Die Faehigkeiten als ``dict`` oder ``None``, wenn das Geraet
+        entfernt wurde.
+        """
+        with self.__lock:
+            if capabilities is None:
+                self.__peers.pop(peer_id, None)
+            else:
+                self.__peers[peer_id] = capabilities
+            self.__format = self.__choose()
+
+    def note_legacy_peer(self):
+        """
+        Wird aufgerufen, wenn ein Geraet reines JSON gesendet hat und damit das Envelope-Format
+        moeglicherweise nicht versteht.
+        """
+        with self.__lock:
+            if not self.__legacy_peer:
+                log.info("received plain json from a peer, sending plain json")
+            self.__legacy_peer = True
+            self.__format = None
+
+    @property
+    def has_legacy_peer(self) -> bool:
+        """
+        Ob bereits ein Geraet einer aelteren Version reines JSON gesendet hat.
+        """
+        return self.__legacy_peer
+
+    @property
+    def format(self) -> Optional[PayloadFormat]:
+        """
+        Das aktuell gewaehlte Format oder ``None`` fuer reines JSON.
+        """
+        return self.__format
+
+    def encode(self, obj: Any) -> bytes:
+        """
+        Wandelt eine Nachricht im gewaehlten Format in Bytes um.
+
+        :param obj: Die Nachricht.
+        :return: Die Nutzdaten als ``bytes``.
+        """
+        return encode_payload(obj, self.__format)
+
+    def __choose(self) -> Optional[PayloadFormat]:
+        if self.__legacy_peer or not self.__peers:
+            return None
+
+        peers = [
+            capabilities for capabilities in self.__peers.values()
+            if capabilities.get("version", 0) >= ENVELOPE_VERSION
+        ]
+        if len(peers) < len(self.__peers):
+            return None
+
+        compressions: List[str] = [
+            name for name in COMPRESSIONS
+            if all(name in peer.get("compression", ()) for peer in peers)
+        ]
+        encodings: List[str] = [
+            name for name in ENCODINGS
+            if all(name in peer.get("encoding", ()) for peer in peers)
+        ]
+        if not compressions or not encodings:
+            return None
+
+        return PayloadFormat(compressions[0], encodings[0])
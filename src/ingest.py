@@ -0,0 +1,142 @@
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from kivy.clock import Clock
+
+from echo import EchoFilter
+from envelope import decode_payload
+from sync import is_ops_topic, is_valid_message, merge_states
+from tracing import get_logger, tracer
+
+log = get_logger(__name__)
+
+# Maximale Anzahl empfangener, noch nicht dekodierter Nachrichten
+MAX_PENDING_MESSAGES = 256
+
+
+class IngestQueue:
+    """
+    Nimmt empfangene MQTT-Nachrichten entgegen, dekodiert sie in einem eigenen Thread und
+    uebergibt sie gesammelt einmal pro Frame an den Main-Thread.
+    Eigene und bereits bekannte Nachrichten (siehe ``EchoFilter``) werden direkt nach dem
+    Dekodieren verworfen, ebenso Nachrichten, die nicht die erwartete Form haben (siehe
+    ``sync.is_valid_message``). Mehrere noch nicht angewendete komplette Listen derselben Topic
+    werden zu einer zusammengefuehrt, sodass pro Frame nur eine angewendet wird.
+    """
+    def __init__(
+        self,
+        apply_batch: Callable[[List[Tuple[dict, str]]], None],
+        maxsize: int = MAX_PENDING_MESSAGES,
+        echo_filter: Optional[EchoFilter] = None,
+    ) -> None:
+        """
+        Instantiiert die Warteschlange und startet den Worker-Thread.
+
+        :param apply_batch: Wird im Main-Thread mit allen seit dem letzten Frame dekodierten
+        Nachrichten als ``list`` von ``(message, topic)`` aufgerufen.
+        :param maxsize: Maximale Anzahl wartender Nachrichten als ``int``. Ist die
+        Warteschlange voll, wartet der MQTT-Thread.
+        :param echo_filter: [optional] ``EchoFilter``, der eigene und bereits bekannte
+        Nachrichten verwirft.
+        """
+        self.__apply_batch = apply_batch
+        self.__echo_filter = echo_filter
+        self.__queue: "queue.Queue[Optional[Tuple[bytes, str]]]" = queue.Queue(maxsize)
+        self.__lock = threading.Lock()
+        self.__decoded: List[Tuple[dict, str]] = []
+        self.__drain_scheduled = False
+
+        self.received = 0
+        self.merged_snapshots = 0
+        self.batches = 0
+
+        self.__worker = threading.Thread(target=self.__run, daemon=True)
+        self.__worker.start()
+
+    def put(self, payload: bytes, topic: str):
+        """
+        Reiht eine empfangene Nachricht ein. Wird vom MQTT-Thread aufgerufen.
+
+        :param payload: Der Inhalt der Nachricht als ``bytes``.
+        :param topic: Die Topic der Nachricht als ``str``.
+        """
+        self.__queue.put((payload, topic))
+
+    def stop(self):
+        """
+        Beendet den Worker-Thread.
+        """
+        self.__queue.put(None)
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+
+            payload, topic = item
+            try:
+                self.__ingest(payload, topic)
+            except Exception:
+                # eine fehlerhafte Nachricht darf den Worker nicht beenden, sonst laeuft die
+                # Warteschlange voll und blockiert den MQTT-Thread
+                log.exception("dropping mqtt message on %s", topic)
+
+    def __ingest(self, payload: bytes, topic: str):
+        try:
+            with tracer.span("mqtt_decode", topic=topic, size=len(payload)):
+                message = decode_payload(payload)
+        except ValueError as e:
+            log.warning("dropping undecodable mqtt message on %s: %s", topic, e)
+            return
+        if not is_valid_message(message, is_ops_topic(topic)):
+            log.warning("dropping malformed mqtt message on %s", topic)
+            return
+        if self.__echo_filter is not None and not self.__echo_filter.accept(message, topic):
+            return
+
+        with self.__lock:
+            self.received += 1
+            if not is_ops_topic(topic):
+                message = self.__merge_pending(message, topic)
+            self.__decoded.append((message, topic))
+
+            if not self.__drain_scheduled:
+                self.__drain_scheduled = True
+                Clock.schedule_once(lambda _: self.__drain())
+
+    def __merge_pending(self, message: dict, topic: str) -> dict:
+        # noch wartende komplette Listen derselben Topic in die neue uebernehmen
+        decoded = []
+        for pending_message, pending_topic in self.__decoded:
+            if pending_topic == topic:
+                message = merge_states(pending_message, message)
+                self.merged_snapshots += 1
+            else:
+                decoded.append((pending_message, pending_topic))
+        self.__decoded = decoded
+        return message
+
+    def __drain(self):
+        with self.__lock:
+            batch = self.__decoded
+            self.__decoded = []
+            self.__drain_scheduled = False
+
+        if batch:
+            self.batches += 1
+            self.__apply_batch(batch)
+
+    def get_stats(self) -> dict:
+        """
+        Liefert Zaehler zu empfangenen, zusammengefuehrten und gesammelt angewendeten
+        Nachrichten.
+
+        :return: Die Zaehler als ``dict``.
+        """
+        return {
+            "received": self.received,
+            "merged_snapshots": self.merged_snapshots,
+            "batches": self.batches,
+        }
@@ -1,60 +1,157 @@
 import json
+import marshal
+import os
+import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
+
+from data.files import FILES_PATH, write_atomic
+from tracing import get_logger
+
+log = get_logger(__name__)
 
 
 LANGUAGES = {"DE": "Deutsch", "EN": "English", "FR": "Francais"}
 LANGUAGE_FOLDER = Path("res", "lang")
+# Sprache, deren Uebersetzung verwendet wird, wenn ein Schluessel in einer Sprache fehlt
+DEFAULT_LANGUAGE = "EN"
+CACHE_FILENAME = "translations.cache"
+CACHE_VERSION = 1
 
 
 class TranslationProvider:
     """
     Dient als statische Hilfsklasse zum Uebersetzen von Texten innerhalb der App.
+    Die Sprachdateien werden erst bei Bedarf geladen und danach im Speicher gehalten.
+    Optional werden sie als vorkompilierter Cache gespeichert, damit beim Start kein JSON
+    geparst werden muss.
     """
-    src_dir : Path 
-    last_language_key: Optional[str] = None
-    last_language_dict: Optional[Dict[str, str]] = None
+    src_dir : Path
+    use_cache: bool = True
+    tables: Dict[str, Dict[str, str]] = {}
+    __cache: Optional[Dict[str, dict]] = None
+    __reported_misses: Set[str] = set()
 
     @classmethod
     def get_language_file(cls, language: str) -> Dict[str, str]:
         """
         Statische Methode zum Auslesen einer Sprach-JSON-Datei.
-        Laedt die Uebersetzungen anhand der ausgewaehlten Sprache.
+        Laedt die Uebersetzungen anhand der ausgewaehlten Sprache, sofern sie noch nicht geladen
+        wurden.
 
         :param language: Sprachschluessel der gewuenschten Sprache als ``str``.
         """
-        if language not in list(LANGUAGES.keys()):
-            raise ValueError('invalid language key: "{language}"')
+        table = cls.tables.get(language)
+        if table is not None:
+            return table
 
-        if cls.last_language_key == language and cls.last_language_dict is not None:
-            return cls.last_language_dict
+        if language not in LANGUAGES:
+            raise ValueError(f'invalid language key: "{language}"')
 
-        path = Path(cls.src_dir, LANGUAGE_FOLDER, f"{language}.json")
-        print(f"loading language file: {path}")
-        print(f'src_dir: {cls.src_dir}')
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                result = json.load(f)
-                cls.last_language_key = language
-                cls.last_language_dict = result
-                return result
+        table = cls.__load_from_cache(language)
+        if table is None:
+            table = cls.__load_from_json(language)
 
-        except FileNotFoundError:
-            print(f'Language not found: "{language}"')
-            return {}
+        cls.tables[language] = table
+        return table
 
     @classmethod
     def get_translated(cls, key: str, language: str) -> str:
         """
         Diese statische Methide uebersetzt einen Text anhand des Text-Schluessels und der Sprache.
+        Fehlt der Schluessel in der Sprache, wird die Uebersetzung der Standardsprache verwendet.
 
         :param key: Schluessel des zu uebersetzenden Texts als ``str``.
         :param language: Sprachschluessel der gewuenschten Sprache als ``str``.
         """
-        lang_dict = cls.get_language_file(language)
-        result = lang_dict.get(key, None)
+        result = cls.get_language_file(language).get(key)
         if result:
             return result
 
-        print(f"unsuccessful try to get {key} in language {language}")
-        return f'key not found for language: \nkey:"{key}"\nlanguage:"{language}"'
+        if language != DEFAULT_LANGUAGE:
+            result = cls.get_language_file(DEFAULT_LANGUAGE).get(key)
+            if result:
+                return result
+
+        if key not in cls.__reported_misses:
+            cls.__reported_misses.add(key)
+            log.warning("unsuccessful try to get %s in language %s", key, language)
+        return key
+
+    # region loading
+
+    @classmethod
+    def __get_path(cls, language: str) -> Path:
+        return Path(cls.src_dir, LANGUAGE_FOLDER, f"{language}.json")
+
+    @classmethod
+    def __load_from_json(cls, language: str) -> Dict[str, str]:
+        path = cls.__get_path(language)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw_table = json.load(f)
+        except FileNotFoundError:
+            log.warning('Language not found: "%s"', language)
+            return {}
+
+        table = {sys.intern(key): value for key, value in raw_table.items()}
+        cls.__store_in_cache(language, path, table)
+        return table
+
+    # endregion
+
+    # region cache
+
+    @classmethod
+    def __read_cache(cls) -> Dict[str, dict]:
+        if cls.__cache is not None:
+            return cls.__cache
+
+        cls.__cache = {}
+        if not cls.use_cache:
+            return cls.__cache
+
+        try:
+            with open(Path(FILES_PATH, CACHE_FILENAME), "rb") as cache_file:
+                cache = marshal.load(cache_file)
+            if cache.get("version") == CACHE_VERSION:
+                cls.__cache = cache["languages"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
+
+        return cls.__cache
+
+    @classmethod
+    def __load_from_cache(cls, language: str) -> Optional[Dict[str, str]]:
+        cached = cls.__read_cache().get(language)
+        if cached is None:
+            return None
+
+        try:
+            if os.stat(cls.__get_path(language)).st_mtime != cached["mtime"]:
+                return None
+        except OSError:
+            return None
+
+        return {sys.intern(key): value for key, value in cached["table"].items()}
+
+    @classmethod
+    def __store_in_cache(cls, language: str, path: Path, table: Dict[str, str]):
+        if not cls.use_cache:
+            return
+
+        try:
+            mtime = os.stat(path).st_mtime
+            cache = cls.__read_cache()
+            cache[language] = {"mtime": mtime, "table": table}
+
+            if not FILES_PATH.is_dir():
+                FILES_PATH.mkdir()
+            write_atomic(
+                Path(FILES_PATH, CACHE_FILENAME),
+                marshal.dumps({"version": CACHE_VERSION, "languages": cache}),
+            )
+        except OSError as e:
+            log.warning("writing translation cache failed: %s", e)
+
+    # endregion
@@ -0,0 +1,97 @@
+from typing import Dict
+
+from data.store import EntriesStore, create_entries_store, get_list_directory
+from sync import merge_states
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+
+class ShoppingLists:
+    """
+    Verwaltet die Speicher aller Einkaufslisten. Nur die aktive Liste wird vom
+    ``ShoppingEntryScreen`` geladen und angezeigt. Empfangene Aenderungen an den anderen Listen
+    werden an deren Speicher angehaengt, ohne sie einzulesen. Empfangene komplette Staende werden
+    nur im Speicher gesammelt und erst beim Oeffnen der Liste oder beim Schliessen mit dem
+    gespeicherten Stand zusammengefuehrt, damit der UI-Thread nicht bei jedem Stand die ganze Liste
+    lesen und schreiben muss.
+    """
+    def __init__(self, backend: str) -> None:
+        """
+        Instantiiert die Verwaltung.
+
+        :param backend: Das Speicher-Backend als ``str`` (siehe ``create_entries_store``).
+        """
+        self.__backend = backend
+        self.__stores: Dict[str, EntriesStore] = {}
+        # Einkaufsliste -> zusammengefuehrte, noch nicht gespeicherte empfangene Staende
+        self.__pending: Dict[str, dict] = {}
+
+    def get_store(self, list_name: str) -> EntriesStore:
+        """
+        Liefert den Speicher einer Einkaufsliste und oeffnet ihn beim ersten Zugriff.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        :return: Der Speicher als ``EntriesStore``.
+        """
+        store = self.__stores.get(list_name)
+        if store is None:
+            store = create_entries_store(self.__backend, get_list_directory(list_name))
+            self.__stores[list_name] = store
+
+        return store
+
+    def load(self, list_name: str) -> dict:
+        """
+        Liest eine Einkaufsliste und fuehrt sie mit den fuer sie gesammelten Staenden zusammen.
+        Das Ergebnis wird dann gespeichert.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        :return: Die Eintraege und Tombstones als ``dict``.
+        :raises OSError: Wenn der Speicher nicht gelesen oder geschrieben werden kann.
+        :raises ValueError: Wenn der gespeicherte Stand ungueltig ist.
+        """
+        store = self.get_store(list_name)
+        state = store.load()
+        pending = self.__pending.get(list_name)
+        if pending is not None:
+            state = merge_states(state, pending)
+            store.replace(state)
+            del self.__pending[list_name]
+
+        return state
+
+    def apply_in_background(self, list_name: str, msg_dict: dict, is_ops: bool):
+        """
+        Uebernimmt eine empfangene Nachricht fuer eine nicht angezeigte Einkaufsliste.
+        Aenderungen werden nur an den Speicher angehaengt, ein kompletter Stand wird mit den
+        bisher gesammelten zusammengefuehrt (siehe ``load``).
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        :param msg_dict: Die Nachricht als ``dict``.
+        :param is_ops: Ob die Nachricht einzelne Aenderungen enthaelt, als ``bool``.
+        """
+        if not is_ops:
+            pending = self.__pending.get(list_name)
+            self.__pending[list_name] = (
+                msg_dict if pending is None else merge_states(pending, msg_dict)
+            )
+            return
+
+        try:
+            self.get_store(list_name).append(msg_dict["ops"])
+        except (OSError, ValueError) as e:
+            log.warning('saving list "%s" failed: %s', list_name, e)
+
+    def close(self):
+        """
+        Speichert die gesammelten Staende und schliesst alle geoeffneten Speicher.
+        """
+        for list_name in list(self.__pending):
+            try:
+                self.load(list_name)
+            except (OSError, ValueError) as e:
+                log.warning('saving list "%s" failed: %s', list_name, e)
+        for store in self.__stores.values():
+            store.close()
+        self.__stores.clear()
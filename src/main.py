@@ -1,11 +1,44 @@
 import socket
-from typing import Any, Dict, List, Optional, Tuple, Union
+import threading
+import time
+from typing import Any, Callable, List, Optional, Set, Tuple
 from pathlib import Path
 
-from data import AppSettings
-from data.files import read_entries_from_files, write_entries_to_files
+from startup import StartupTimer
+
+startup = StartupTimer()
+
+from data import AppSettings, FILES_PATH
+from data.diff import apply_diff, changed_span, diff_entries
+from data.model import EntryModel
+from data.store import EntriesStore
+from data.transfer import (
+    FORMATS, ImportReport, get_format, open_export_file, open_import_file, read_entries,
+    write_entries,
+)
+from echo import EchoFilter
 from language import TranslationProvider, LANGUAGES
-from mqtt import MqttClient
+from ingest import IngestQueue
+from lists import ShoppingLists
+from outbox import Outbox
+from mqtt import STATE_CONNECTED, STATE_CONNECTING, STATE_DISCONNECTED, MqttClient
+from persistence import WriteBehindScheduler
+from pool import WidgetPool
+from sync import (
+    DEFAULT_LIST,
+    SNAPSHOT_DELAY,
+    HybridClock,
+    add_operation,
+    check_operation,
+    delete_operation,
+    get_list_topic,
+    get_ops_topic,
+    is_valid_list_name,
+    new_entry_id,
+    parse_list_topic,
+    rename_operation,
+)
+from tracing import TRACE_FILENAME, get_logger, set_log_level, tracer
 
 import kivy.utils
 from kivy.properties import (
@@ -15,42 +48,89 @@ from kivy.properties import (
     ListProperty,
 )
 from kivy.metrics import dp
+from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen, ScreenManager
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataAdapter, RecycleDataViewBehavior
 from kivy.core.window import Window
-from kivy.clock import mainthread
+from kivy.clock import Clock, mainthread
 
 from kivymd.app import MDApp
-from kivymd.uix.button import MDFlatButton
 from kivymd.uix.card.card import MDBoxLayout
-from kivymd.uix.dialog import MDDialog
-from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.list import OneLineAvatarIconListItem
 from kivymd.toast import toast
 
+# Dialoge und Menues werden erst beim ersten Oeffnen importiert, um den Start zu beschleunigen
+startup.mark("imports")
+
+log = get_logger(__name__)
+
 
 if kivy.utils.platform not in ["android", "ios"]:
     Window.size = (400, 800)
 
-
-class ShoppingEntry(OneLineAvatarIconListItem):
+CONNECTION_ICONS = {
+    STATE_CONNECTED: "cloud-check-outline",
+    STATE_CONNECTING: "cloud-sync-outline",
+    STATE_DISCONNECTED: "cloud-off-outline",
+}
+
+# Sekunden zwischen zwei Aktualisierungen der Debug-Anzeige
+DEBUG_OVERLAY_INTERVAL = 0.5
+# Taste zum Ein- und Ausblenden der Debug-Anzeige am Desktop
+DEBUG_OVERLAY_KEY = 293  # F12
+# Einstellungen, die Logging, Tracing und Debug-Anzeige betreffen
+DIAGNOSTICS_SETTINGS = {"log_level", "tracing", "debug_overlay"}
+# Ab so vielen importierten Eintraegen wird statt der einzelnen Aenderungen der komplette Stand
+# gespeichert und gesendet
+IMPORT_SNAPSHOT_THRESHOLD = 100
+# Format, in dem Einkaufslisten exportiert werden
+EXPORT_FORMAT = "csv"
+# Nach dem ersten Frame vorab erstellte Dialoge und Zeilen (zusaetzlich zu den sichtbaren)
+PREBUILT_DIALOGS = 1
+PREBUILT_ROWS = 4
+
+
+class ShoppingEntry(RecycleDataViewBehavior, OneLineAvatarIconListItem):
     """
     Stellt einen Eintrag in der Einkaufsliste dar.
+    Die Widgets werden von der ``ShoppingRecycleView`` wiederverwendet und nur fuer die
+    sichtbaren Zeilen erzeugt.
     """
-    edit_dialog = None
+    entry_id = StringProperty("")
     is_checked = BooleanProperty(False)
 
-    def __init__(self, text, **kwargs):
+    def __init__(self, text="", **kwargs):
         """
         Instatiiert ein Einkaufslistenobjekt.
 
+        :param text: Anzeigetext des Eintrags als ``str``.
         :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
         """
         super().__init__(**kwargs)
         self.initialized = False
+        self.index = None
+        self.recycle_view = None
         self.text = text
         self.is_checked = False
         self.initialized = True
 
+    def refresh_view_attrs(self, rv, index, data):
+        """
+        Wird von der ``RecycleView`` aufgerufen, wenn das Widget einen (anderen) Eintrag anzeigen
+        soll. Waehrenddessen werden keine Aenderungs-Events an die Einkaufsliste weitergegeben.
+
+        :param rv: Die ``RecycleView``, zu der das Widget gehoert.
+        :param index: Index des Eintrags in den Daten der ``RecycleView`` als ``int``.
+        :param data: Daten des Eintrags als ``dict``.
+        """
+        self.initialized = False
+        self.index = index
+        self.recycle_view = rv
+        super().refresh_view_attrs(rv, index, data)
+        self.initialized = True
+
     # region events
 
     def on_is_checked(self, *_):
@@ -64,7 +144,7 @@ class ShoppingEntry(OneLineAvatarIconListItem):
 
         list = self.get_shopping_list()
         if list:
-            list.save_entries()
+            list.set_entry_checked(self.entry_id, self.is_checked)
 
     # endregion
     def get_shopping_list(self):
@@ -73,107 +153,216 @@ class ShoppingEntry(OneLineAvatarIconListItem):
 
         :return: Einkaufliste als ``list``.
         """
-        if not self.initialized:
+        if not self.initialized or self.index is None:
             return None
-        if self.parent:
-            return self.parent.parent.parent.parent
+        if self.recycle_view:
+            return self.recycle_view.screen
 
         return None
 
-    def delete(self, shopping_entry):
+    def delete(self):
         """
         Loescht den Eintrag aus der Einkaufsliste des Eltern-Elements.
-
-        :param shopping_entry: Loescht den angegebenen ``ShoppingEntry`` aus Einkaufsliste.
         """
         list = self.get_shopping_list()
         if list:
-            list.delete_entry(shopping_entry)
+            list.delete_entry(self.entry_id)
 
     def open_edit_popup(self):
         """
         Oeffnet ein Popup zum Bearbeiten des Eintrag-Texts.
         """
-        if self.edit_dialog:
-            return
+        list = self.get_shopping_list()
+        if list:
+            list.open_edit_popup(self.entry_id, self.text)
 
-        buttons = [
-            MDFlatButton(
-                text=self.get_translated("cancel"),
-                on_release=lambda _: self.edit_dialog.dismiss()  # type: ignore
-            ),
-            MDFlatButton(
-                text=self.get_translated("confirm"),
-                on_release=lambda _: self.save_changes(),
-            ),
-        ]
+    def detach(self):
+        """
+        Loest das Widget von seinem Eintrag, wenn die ``RecycleView`` es nicht mehr anzeigt.
+        Bis es einen anderen Eintrag anzeigt, gibt es keine Aenderungen weiter.
+        """
+        self.initialized = False
+        self.index = None
+        self.recycle_view = None
+        self.entry_id = ""
 
-        self.edit_dialog = MDDialog(
-            title=self.get_translated("edit_entry"),
-            type="custom",
-            content_cls=AddDialog(self.text),
-            buttons=buttons,
-        )
+    def __str__(self) -> str:
+        return super().__str__() + f"is_checked: {self.is_checked} text: {self.text}"
 
-        self.edit_dialog.on_dismiss = lambda: self.close_edit_popup()
-        self.edit_dialog.open()
+class PooledViewAdapter(RecycleDataAdapter):
+    """
+    Erstellt fehlende Zeilen der ``ShoppingRecycleView`` aus einem ``WidgetPool`` vorab
+    gebauter Widgets und zaehlt Zeilen, die die ``RecycleView`` selbst wiederverwendet, als
+    Treffer. Aendern sich die Daten, werden alle Zeilen von ihren Eintraegen geloest.
+    """
+    def __init__(self, pool: WidgetPool, **kwargs):
+        """
+        Instantiiert den Adapter.
 
-    def save_changes(self):
+        :param pool: Der Pool der Zeilen als ``WidgetPool``.
+        :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
         """
-        Speichert alle Aenderungen am Eintrag lokal und per MQTT auf dem jeweiligen Server.
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.created = False
+
+    def create_view(self, index, data_item, viewclass):
+        if viewclass is not ShoppingEntry:
+            return super().create_view(index, data_item, viewclass)
+
+        self.created = True
+        view = self.pool.checkout()
+        self.refresh_view_attrs(index, data_item, view)
+        return view
+
+    def get_view(self, index, data_item, viewclass):
+        self.created = False
+        view = super().get_view(index, data_item, viewclass)
+        if view is not None and not self.created:
+            self.pool.count_reuse()
+        return view
+
+    def invalidate(self):
+        for view in self.views.values():
+            view.detach()
+        for views in self.dirty_views.values():
+            for view in views.values():
+                view.detach()
+        super().invalidate()
+
+
+# Eigenschaften des Layouts, mit denen die Daten die Groesse und Art der Zeilen bestimmen
+SIZE_KEYS = (
+    "key_size", "key_size_hint", "key_size_hint_min", "key_size_hint_max", "key_pos_hint",
+    "key_viewclass",
+)
+
+
+class ShoppingRecycleBoxLayout(RecycleBoxLayout):
+    """
+    Layout der ``ShoppingRecycleView``. Werden nur Daten an bestehenden Positionen ersetzt
+    (``data[i:j] = ...`` mit gleicher Laenge) und bestimmen die Daten nicht die Groesse der
+    Zeilen, behalten alle Zeilen ihre Position: Das Layout wird nicht neu berechnet und die Zeilen
+    wandern mit ihrem Eintrag an dessen neue Position, statt dass alle Zeilen geloest und neu
+    befuellt (und ihre Texte neu gerendert) werden.
+    """
+    def __init__(self, **kwargs):
         """
-        if self.edit_dialog is None:
-            return
+        Instantiiert das Layout.
 
-        changed_text = self.edit_dialog.content_cls.ids["shopping_entry_text"].text
-        if not changed_text or len(changed_text) == 0:
-            toast(self.get_translated("empty_text_alert"))
-            return
+        :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
+        """
+        super().__init__(**kwargs)
+        self.__keep_positions = False
+        # sichtbare Zeilen, die an eine neue Position wandern und dort eventuell nicht mehr
+        # sichtbar sind
+        self.__moved_views: List[ShoppingEntry] = []
 
-        self.text = changed_text
+    def compute_sizes_from_data(self, data, flags):
+        if (
+            not flags
+            or any(list(flag) != ["modified"] for flag in flags)
+            or len(self.view_opts) != len(data)
+            or any(getattr(self, key) is not None for key in SIZE_KEYS)
+        ):
+            super().compute_sizes_from_data(data, flags)
+            return
 
-        self.edit_dialog.dismiss()
-        list = self.get_shopping_list()
-        if list:
-            list.save_entries()
+        modified = set()
+        for flag in flags:
+            modified.update(range(*flag["modified"].indices(len(data))))
+        sizing_attrs = RecycleDataAdapter._sizing_attrs
+        if any(not sizing_attrs.isdisjoint(data[index]) for index in modified):
+            # die Daten bestimmen die Groesse der Zeilen, diese koennen sich also aendern
+            super().compute_sizes_from_data(data, flags)
+            return
 
-    def get_translated(self, key: str) -> str:
-        """    
-        Liefert die Uebersetzung zu einem Text-Schluessel.
+        self.__keep_positions = True
+        self.__move_views(data, modified)
+
+    def __move_views(self, data, modified: Set[int]):
+        adapter = self.recycleview.view_adapter
+        views = []
+        for index in modified:
+            view = adapter.views.pop(index, None)
+            if view is not None:
+                del self.view_indices[view]
+                self.__moved_views.append(view)
+                views.append((index, view))
+            for dirty_views in adapter.dirty_views.values():
+                view = dirty_views.pop(index, None)
+                if view is not None:
+                    views.append((index, view))
+
+        # als geaenderte Zeilen zwischengespeicherte Widgets werden an ihrer (neuen) Position
+        # ohne Aktualisierung wiederverwendet
+        new_indices = {data[index].get("entry_id"): index for index in modified}
+        free = []
+        for index, view in views:
+            new_index = new_indices.pop(getattr(view, "entry_id", None), None)
+            if new_index is None:
+                free.append(view)
+                continue
+            adapter.refresh_view_attrs(new_index, data[new_index], view)
+            adapter.dirty_views[view.__class__][new_index] = view
+        for view, new_index in zip(free, new_indices.values()):
+            adapter.refresh_view_attrs(new_index, data[new_index], view)
+            adapter.dirty_views[view.__class__][new_index] = view
+
+    def compute_layout(self, data, flags):
+        if self.__keep_positions:
+            self.__keep_positions = False
+            flags = [flag for flag in flags if flag]
+        super().compute_layout(data, flags)
+
+    def set_visible_views(self, indices, data, viewport):
+        super().set_visible_views(indices, data, viewport)
+        for view in self.__moved_views:
+            if view not in self.view_indices and view.parent is self:
+                self.remove_widget(view)
+        self.__moved_views = []
+
+    def clear_layout(self):
+        super().clear_layout()
+        self.__moved_views = []
+
+
+class ShoppingRecycleView(RecycleView):
+    """
+    Virtualisierte Liste der Einkaufslisten-Eintraege.
+    Es werden nur Widgets fuer die sichtbaren Zeilen erzeugt und beim Scrollen wiederverwendet.
+    Fehlende Zeilen kommen aus dem ``row_pool`` der App.
+    """
+    screen = ObjectProperty(None)
 
-        :param key: Schluessel als ``str`` zu uebersetzendem Text
-        :return: Uebersetzter Text als ``str``.
+    def __init__(self, **kwargs):
         """
-        settings = AppSettings.get_or_create()
-        return TranslationProvider.get_translated(key, settings.language)
+        Instantiiert die Liste.
 
-    def close_edit_popup(self):
-        """
-        Schliesst das Aendern-Popup sauber.
+        :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
         """
-        if not self.edit_dialog:
-            return
-
-        self.edit_dialog = None
+        kwargs.setdefault("view_adapter", PooledViewAdapter(app.row_pool))
+        super().__init__(**kwargs)
 
-    def __str__(self) -> str:
-        return super().__str__() + f"is_checked: {self.is_checked} text: {self.text}"
 
 class AddDialog(MDBoxLayout):
     """
     Stellt den Dialog zum Hinzufuegen und Aendern eines Einkaufslisten-Eintrags dar.
     """
     text = StringProperty("")
+    hint_key = StringProperty("new_entry")
 
-    def __init__(self, text="", **kwargs):
+    def __init__(self, text="", hint_key="new_entry", **kwargs):
         """
         Inistantiiert ein Popup-Objekt.
 
         :param text: Default ist leer, gibt den initialen Anzeigetext als ``str`` an.
+        :param hint_key: Schluessel des Hinweistexts im Eingabefeld als ``str``.
         :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
         """
         super().__init__(**kwargs)
         self.text = text
+        self.hint_key = hint_key
 
     def get_translated(self, key: str) -> str:
         """    
@@ -182,17 +371,196 @@ class AddDialog(MDBoxLayout):
         :param key: Schluessel als ``str`` zu uebersetzendem Text.
         :return: Uebersetzter Text als ``str``.
         """
-        settings = AppSettings.get_or_create()
+        settings = AppSettings.current()
         return TranslationProvider.get_translated(key, settings.language)
 
 
+class TextDialog:
+    """
+    Dialog mit einem Eingabefeld zum Hinzufuegen und Aendern von Eintraegen sowie zum Anlegen
+    von Einkaufslisten. Er wird einmal aufgebaut und ueber den ``dialog_pool`` der App
+    wiederverwendet; Titel, Texte und Callbacks werden bei jedem Ausleihen neu gesetzt.
+    """
+    def __init__(self, pool: Optional[WidgetPool] = None) -> None:
+        """
+        Baut den Dialog auf, ohne ihn zu oeffnen.
+
+        :param pool: [optional] Der ``WidgetPool``, an den der Dialog nach dem Schliessen
+        zurueckgegeben wird.
+        """
+        from kivymd.uix.button import MDFlatButton
+        from kivymd.uix.dialog import MDDialog
+
+        self.pool = pool
+        self.on_confirm: Optional[Callable[[str], None]] = None
+        self.on_close: Optional[Callable[[], None]] = None
+        self.content = AddDialog()
+        self.cancel_button = MDFlatButton(on_release=lambda _: self.dismiss())
+        self.confirm_button = MDFlatButton(on_release=lambda _: self.confirm())
+        self.dialog = MDDialog(
+            title=TranslationProvider.get_translated("add_entry", app.settings.language),
+            type="custom",
+            content_cls=self.content,
+            buttons=[self.cancel_button, self.confirm_button],
+        )
+        self.dialog.bind(on_dismiss=lambda _: self.on_dismiss(), parent=self.on_parent)
+
+    @property
+    def text(self) -> str:
+        """
+        Der eingegebene Text als ``str``.
+        """
+        return self.content.ids["shopping_entry_text"].text
+
+    def reset(
+        self,
+        title_key: str,
+        on_confirm: Callable[[str], None],
+        on_close: Optional[Callable[[], None]] = None,
+        text: str = "",
+        hint_key: str = "new_entry",
+    ):
+        """
+        Setzt den Dialog fuer die naechste Verwendung. Wird beim Ausleihen aus dem Pool
+        aufgerufen.
+
+        :param title_key: Schluessel des Titels als ``str``.
+        :param on_confirm: Wird beim Bestaetigen mit dem eingegebenen Text aufgerufen.
+        :param on_close: [optional] Wird nach dem Schliessen aufgerufen.
+        :param text: Der initiale Text als ``str``.
+        :param hint_key: Schluessel des Hinweistexts im Eingabefeld als ``str``.
+        """
+        language = app.settings.language
+        self.on_confirm = on_confirm
+        self.on_close = on_close
+        self.dialog.title = TranslationProvider.get_translated(title_key, language)
+        self.cancel_button.text = TranslationProvider.get_translated("cancel", language)
+        self.confirm_button.text = TranslationProvider.get_translated("confirm", language)
+        self.content.text = text
+        self.content.hint_key = hint_key
+        field = self.content.ids["shopping_entry_text"]
+        field.text = text
+        field.hint_text = TranslationProvider.get_translated(hint_key, language)
+
+    def clear(self):
+        """
+        Loest den Dialog nach der Verwendung von seinen Callbacks und dem eingegebenen Text.
+        Wird bei der Rueckgabe an den Pool aufgerufen.
+        """
+        self.on_confirm = None
+        self.on_close = None
+        self.content.text = ""
+        self.content.ids["shopping_entry_text"].text = ""
+
+    def open(self):
+        self.dialog.open()
+
+    def dismiss(self):
+        self.dialog.dismiss()
+
+    def confirm(self):
+        """
+        Gibt den eingegebenen Text an ``on_confirm`` weiter. Der Callback schliesst den Dialog,
+        wenn der Text gueltig ist.
+        """
+        if self.on_confirm is not None:
+            self.on_confirm(self.text)
+
+    def on_dismiss(self):
+        """
+        Wird beim Schliessen aufgerufen.
+        """
+        if self.on_close is not None:
+            self.on_close()
+        self.on_close = None
+
+    def on_parent(self, _dialog, parent):
+        """
+        Gibt den Dialog an den Pool zurueck, sobald er nach dem Ausblenden aus dem Fenster
+        entfernt wurde. Vorher kann er nicht erneut geoeffnet werden.
+
+        :param _dialog: Der ``MDDialog``.
+        :param parent: Das neue Eltern-Widget oder ``None``.
+        """
+        if parent is None and self.pool is not None:
+            self.pool.release(self)
+
+
+class DebugOverlay(Label):
+    """
+    Blendet die Dauer der zuletzt gemessenen Abschnitte (siehe ``tracing``) ueber der App ein.
+    Die Anzeige wird nur aktualisiert, solange sie sichtbar ist.
+    """
+    def __init__(self, **kwargs):
+        """
+        Instantiiert die Debug-Anzeige, ohne sie einzublenden.
+
+        :param kwargs: Zusaetzliche Keyword-Parameter als ``dict``.
+        """
+        super().__init__(**kwargs)
+        self.update_event = None
+
+    def show(self):
+        """
+        Blendet die Anzeige ueber allen Screens ein.
+        """
+        if self.parent is None:
+            Window.add_widget(self)
+        if self.update_event is None:
+            self.update_event = Clock.schedule_interval(
+                lambda _: self.update(), DEBUG_OVERLAY_INTERVAL
+            )
+        self.update()
+
+    def hide(self):
+        """
+        Blendet die Anzeige aus.
+        """
+        if self.update_event is not None:
+            self.update_event.cancel()
+            self.update_event = None
+        if self.parent is not None:
+            Window.remove_widget(self)
+
+    def update(self):
+        """
+        Zeigt die aktuellen Messungen und die Zahl der uebersprungenen MQTT-Nachrichten an.
+        """
+        lines = [
+            f"fps {Clock.get_fps():.0f}",
+            f"{'span':<12}{'last':>8}{'median':>8}{'max':>8}{'count':>7}",
+        ]
+        for span in tracer.get_summary():
+            lines.append(
+                f"{span['name']:<12}{span['last_ms']:>8.2f}{span['median_ms']:>8.2f}"
+                f"{span['max_ms']:>8.2f}{span['count']:>7}"
+            )
+        for pool in (app.dialog_pool, app.row_pool):
+            stats = pool.get_stats()
+            lines.append(
+                f"pool {pool.name:<8}hits {stats['hits']:>5} misses {stats['misses']:>4} "
+                f"({stats['hit_rate']:.0%})"
+            )
+        if app.echo_filter is not None:
+            skipped = app.echo_filter.get_stats()
+            lines.append(
+                f"skipped echoes {skipped['echoes']}, duplicates {skipped['duplicates']}, "
+                f"unchanged {skipped['unchanged']}"
+            )
+        self.text = "\n".join(lines)
+
+
 class ShoppingEntryScreen(Screen):
     """
     Screen zum Anzeigen und Bearbeiten der Einkaufsliste.
     """
-    add_dialog = None
+    add_dialog: Optional[TextDialog] = None
+    edit_dialog: Optional[TextDialog] = None
+    lists_menu = None
     entries = ListProperty([])
+    list_name = StringProperty(DEFAULT_LIST)
     sort_reverse = BooleanProperty(False)
+    filter_text = StringProperty("")
 
     def __init__(self, **kwargs):
         """
@@ -202,21 +570,33 @@ class ShoppingEntryScreen(Screen):
         """
         super().__init__(**kwargs)
         self.initialized = False
+        self.edit_entry_id: Optional[str] = None
+        self.model = EntryModel(clock=HybridClock(app.settings.device_id))
+        self.shown_entries: List[dict] = []
+        self.snapshot_trigger = Clock.create_trigger(
+            lambda _: self.publish_snapshot(), SNAPSHOT_DELAY
+        )
+        self.lists = ShoppingLists(app.settings.storage_backend)
+        if app.settings.active_list in app.settings.lists:
+            self.list_name = app.settings.active_list
+        self.store = self.lists.get_store(self.list_name)
+        self.persistence = WriteBehindScheduler(
+            self.write_entries, self.publish_changes, app.settings.save_delay
+        )
         self.update_from_file()
         self.initialized = True
 
     # region events
 
-    def on_bestaetigen(self, *_):
+    def on_bestaetigen(self, text: str):
         """
         Event wird gefeuert, wenn das Popup bestaetigt wurde.
 
-        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        :param text: Der eingegebene Text als ``str``.
         """
         if self.add_dialog is None:
             return
 
-        text = self.add_dialog.content_cls.ids["shopping_entry_text"].text
         if not text or len(text) == 0:
             toast(self.get_translated("empty_text_alert"))
             return
@@ -230,9 +610,18 @@ class ShoppingEntryScreen(Screen):
 
         :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
         """
-        print("on_sort_reverse", self.sort_reverse)
-        entries = self.get_entries()
-        self.entries = self.sort(entries, self.sort_reverse)
+        log.debug("on_sort_reverse %s", self.sort_reverse)
+        self.entries = self.get_shown_entries()
+        self.set_entries_widgets()
+
+    def on_filter_text(self, *_):
+        """
+        Event wird gefeuert, wenn sich der Text im Filterfeld aendert. Zeigt nur noch die
+        passenden Eintraege an.
+
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        """
+        self.entries = self.get_shown_entries()
         self.set_entries_widgets()
 
     # endregion
@@ -243,24 +632,101 @@ class ShoppingEntryScreen(Screen):
 
     def update_from_file(self):
         """
-        Liest die Einkaufsliste aus der JSON-Datei.
+        Liest die Einkaufsliste aus dem eingestellten Speicher.
         """
-        try:
-            entries = read_entries_from_files()
-        except OSError:
-            return
+        entries = self.load_entries(self.store)
+        if entries is not None:
+            self.show_loaded_entries(entries)
+
+    @staticmethod
+    def load_entries(store: EntriesStore) -> Optional[dict]:
+        """
+        Liest eine Einkaufsliste aus einem Speicher, ohne sie anzuzeigen.
 
-        self.set_entries(entries["entries"])
+        :param store: Der Speicher als ``EntriesStore``.
+        :return: Die Eintraege und Tombstones als ``dict`` oder ``None``, wenn das Lesen
+        fehlgeschlagen ist.
+        """
+        try:
+            with tracer.span("file_io", operation="load"):
+                return store.load()
+        except (OSError, ValueError) as e:
+            log.warning("reading entries failed: %s", e)
+            return None
 
-    def update_from_mqtt(self, msg_dict):
+    def show_loaded_entries(self, entries: dict):
         """
-        Wird durch MQTT-Subscribe aufgerufen, wenn sich die Liste aendert.
-        Aktualisiert die Liste mit den neuen Eintraegen.
+        Uebernimmt eine aus ``self.store`` gelesene Einkaufsliste in das Modell und zeigt sie an.
 
-        :param msg_dict: Gesamte Einkaufsliste als ``dict``.
+        :param entries: Die Eintraege und Tombstones als ``dict``.
         """
-        self.from_mqtt = True
-        self.set_entries(msg_dict["entries"], from_mqtt=True)
+        self.model.reset(entries["entries"], entries.get("tombstones"))
+        if any(not entry.get("id") for entry in entries["entries"]):
+            # IDs von Listen aus aelteren Versionen dauerhaft speichern
+            self.store.replace(self.model.get_state())
+
+        self.entries = self.get_shown_entries()
+        self.set_entries_widgets()
+
+    def update_from_mqtt(self, msg_dict, topic: str = ""):
+        """
+        Wird durch MQTT-Subscribe aufgerufen, wenn sich eine Liste aendert.
+        Aktualisiert die Liste mit den neuen Eintraegen oder wendet eine einzelne Aenderung an.
+
+        :param msg_dict: Gesamte Einkaufsliste oder einzelne Aenderung als ``dict``.
+        :param topic: Die Topic, auf der die Nachricht empfangen wurde, als ``str``.
+        """
+        self.update_from_mqtt_batch([(msg_dict, topic)])
+
+    def update_from_mqtt_batch(self, messages: List[Tuple[dict, str]]):
+        """
+        Wird einmal pro Frame mit allen seitdem empfangenen MQTT-Nachrichten aufgerufen und
+        wendet sie gemeinsam an, sodass nur einmal sortiert, angezeigt und gespeichert wird.
+        Komplette Listen werden mit der eigenen zusammengefuehrt; fehlen ihnen lokale
+        Aenderungen, wird der eigene Stand anschliessend veroeffentlicht.
+        Nachrichten fuer andere Einkaufslisten werden an ``ShoppingLists`` weitergegeben.
+
+        :param messages: Die Nachrichten als ``list`` von ``(msg_dict, topic)``.
+        """
+        with tracer.span("mqtt_apply", messages=len(messages)):
+            self.__apply_mqtt_batch(messages)
+
+    def __apply_mqtt_batch(self, messages: List[Tuple[dict, str]]):
+        changed = False
+        remote_behind = False
+        operations: Optional[List[dict]] = []
+        for msg_dict, topic in messages:
+            parsed = parse_list_topic(app.settings.mqtt_topic, topic)
+            if parsed is None:
+                log.debug("ignoring message on unknown topic %s", topic)
+                continue
+
+            list_name, is_ops = parsed
+            if list_name != self.list_name:
+                self.add_list(list_name)
+                self.lists.apply_in_background(list_name, msg_dict, is_ops)
+                continue
+
+            if is_ops:
+                applied = self.model.apply_all(msg_dict["ops"])
+                if applied and operations is not None:
+                    operations.extend(msg_dict["ops"])
+            else:
+                result = self.model.merge(msg_dict)
+                applied = result.changed
+                if applied:
+                    operations = None
+                remote_behind = remote_behind or result.remote_behind
+
+            if applied:
+                changed = True
+            elif app.echo_filter is not None:
+                app.echo_filter.note_unchanged()
+
+        if changed:
+            self.save_entries(from_mqtt=True, operations=operations)
+        if remote_behind:
+            self.snapshot_trigger()
 
     # endregion
 
@@ -273,25 +739,9 @@ class ShoppingEntryScreen(Screen):
         if self.add_dialog:
             return
 
-        language = app.settings.language
-
-        buttons = [
-            MDFlatButton(
-                text=TranslationProvider.get_translated("cancel", language),
-                on_release=lambda _: self.add_dialog.dismiss(),  # type: ignore
-            ),
-            MDFlatButton(
-                text=TranslationProvider.get_translated("confirm", language),
-                on_release=lambda args: self.on_bestaetigen(args),
-            ),
-        ]
-        self.add_dialog = MDDialog(
-            title=TranslationProvider.get_translated("add_entry", language),
-            type="custom",
-            content_cls=AddDialog(),
-            buttons=buttons,
+        self.add_dialog = app.dialog_pool.checkout(
+            title_key="add_entry", on_confirm=self.on_bestaetigen, on_close=self.close_add_popup
         )
-        self.add_dialog.on_dismiss = lambda: self.close_add_popup()
         self.add_dialog.open()
 
     def close_add_popup(self):
@@ -303,71 +753,247 @@ class ShoppingEntryScreen(Screen):
 
         self.add_dialog = None
 
+    def open_edit_popup(self, entry_id: str, text: str):
+        """
+        Oeffnet das Popup zum Aendern des Texts eines Eintrags. Der Dialog merkt sich nur die
+        ID, sodass es keine Rolle spielt, wenn die Zeile inzwischen einen anderen Eintrag
+        anzeigt. Wird der Eintrag geloescht, wird das Popup geschlossen.
+
+        :param entry_id: ID des Eintrags als ``str``.
+        :param text: Der aktuelle Text als ``str``.
+        """
+        if self.edit_dialog:
+            return
+
+        self.edit_entry_id = entry_id
+        self.edit_dialog = app.dialog_pool.checkout(
+            title_key="edit_entry",
+            on_confirm=self.save_edited_text,
+            on_close=self.close_edit_popup,
+            text=text,
+        )
+        self.edit_dialog.open()
+
+    def save_edited_text(self, text: str):
+        """
+        Uebernimmt den im Aendern-Popup eingegebenen Text.
+
+        :param text: Der neue Text als ``str``.
+        """
+        if self.edit_dialog is None or self.edit_entry_id is None:
+            return
+
+        if not text or len(text) == 0:
+            toast(self.get_translated("empty_text_alert"))
+            return
+
+        entry_id = self.edit_entry_id
+        self.edit_dialog.dismiss()
+        self.set_entry_text(entry_id, text)
+
+    def close_edit_popup(self):
+        """
+        Schliesst das Aendern-Popup sauber.
+        """
+        self.edit_dialog = None
+        self.edit_entry_id = None
+
     def add_shopping_entry(self, text):
         """
         Fuegt der Einkaufsliste einen Eintrag hinzu.
 
         :param text: Eintrag-Text als ``str``.
         """
-        entry = ShoppingEntry(text=text)
-        self.ids["shopping_list"].add_widget(entry)
-        self.save_entries()
+        entry = {"id": new_entry_id(), "is_checked": False, "text": text}
+        self.apply_local_operation(add_operation(entry))
 
     # endregion
 
     @mainthread
     def set_entries_widgets(self):
         """
-        Setzt die einzelnen Widgets pro Einkauflisteneintrag auf der Oberflaeche.
+        Uebergibt die Eintraege an die ``RecycleView``, welche nur die sichtbaren Zeilen als
+        Widgets darstellt. Bleibt die Anzahl gleich (z.B. beim Abhaken), wird nur der Bereich
+        zwischen der ersten und der letzten geaenderten Zeile ersetzt, sodass alle Zeilen ihre
+        Position behalten (siehe ``ShoppingRecycleBoxLayout``). Sonst werden nur die
+        geaenderten Zeilen hinzugefuegt, entfernt, verschoben oder aktualisiert.
         """
-        print("set_entries_widgets", self)
-        self.ids["shopping_list"].clear_widgets()
-        for entry in self.entries:
-            shopping_entry = ShoppingEntry(text=entry["text"])
-            shopping_entry.is_checked = entry["is_checked"]  # type: ignore
-            self.ids["shopping_list"].add_widget(shopping_entry)
+        log.debug("set_entries_widgets %s", self)
+        entries = list(self.entries)
+        data = self.ids["shopping_list"].data
+        with tracer.span("widgets", entries=len(entries)):
+            span = changed_span(self.shown_entries, entries)
+            if span is not None:
+                start, stop = span
+                data[start:stop] = [self.get_view_data(entry) for entry in entries[start:stop]]
+            elif len(self.shown_entries) != len(entries):
+                operations = diff_entries(self.shown_entries, entries)
+                apply_diff(data, operations, self.get_view_data)
+        self.shown_entries = entries
 
-    def delete_entry(self, entry: ShoppingEntry):
+    def get_shown_entries(self) -> List[dict]:
+        """
+        Liefert die anzuzeigenden Eintraege: sortiert und, falls ein Filter eingegeben ist, nur
+        die passenden (siehe ``EntryModel.search``).
+
+        :return: Die Eintraege als ``list`` von ``dict``.
+        """
+        if not self.filter_text.strip():
+            return self.model.sorted_dicts(self.sort_reverse)
+
+        with tracer.span("search", entries=len(self.model)):
+            ids = self.model.search(self.filter_text)
+        return self.model.sorted_dicts(self.sort_reverse, ids)
+
+    @staticmethod
+    def get_view_data(entry: dict) -> dict:
+        """
+        Wandelt einen Eintrag in die Daten fuer eine Zeile der ``RecycleView`` um.
+
+        :param entry: Der Eintrag als ``dict``.
+        :return: Die Attribute des ``ShoppingEntry``-Widgets als ``dict``.
+        """
+        return {
+            "entry_id": entry["id"],
+            "text": entry["text"],
+            "is_checked": entry["is_checked"],
+        }
+
+    def delete_entry(self, entry_id: str):
         """
         Loescht einen Eintrag aus der Einkaufsliste.
 
-        :param entry: Ein Eintrag als ``ShoppingEntry``.
+        :param entry_id: ID des Eintrags als ``str``.
+        """
+        log.debug("remove_entry called %s", entry_id)
+        self.apply_local_operation(delete_operation(entry_id))
+
+    def set_entry_checked(self, entry_id: str, is_checked: bool):
+        """
+        Setzt den Status eines Eintrags und speichert die Einkaufsliste.
+
+        :param entry_id: ID des Eintrags als ``str``.
+        :param is_checked: Der neue Status als ``bool``.
+        """
+        self.apply_local_operation(check_operation(entry_id, is_checked))
+
+    def set_entry_text(self, entry_id: str, text: str):
+        """
+        Aendert den Text eines Eintrags und speichert die Einkaufsliste.
+
+        :param entry_id: ID des Eintrags als ``str``.
+        :param text: Der neue Text als ``str``.
         """
-        print("remove_entry called", entry)
-        self.ids.shopping_list.remove_widget(entry)
-        self.save_entries()
+        self.apply_local_operation(rename_operation(entry_id, text))
 
-    def save_entries(self, entries: Optional[list] = None, from_mqtt=False):
+    def apply_local_operation(self, operation: dict):
+        """
+        Versieht eine lokale Aenderung mit einem Zeitstempel, wendet sie an und speichert die
+        Einkaufsliste.
+
+        :param operation: Die Aenderung als ``dict`` (siehe ``sync``).
+        """
+        operation = self.model.apply_local(operation)
+        if operation is not None:
+            self.save_entries(operations=[operation])
+
+    def save_entries(
+        self,
+        entries: Optional[list] = None,
+        from_mqtt=False,
+        operations: Optional[List[dict]] = None,
+    ):
         """
         Speichert die Eintraege in einer JSON datei und wenn ``"from_mqtt" == False`` ist,
         sendet es die Eintraege auch an MQTT zur Synchronisation.
 
         :param entries: Die Eintraege, die gespeichert werden sollen, wenn ``None`` werden die
-        Eintraege von ``self.get_entries()`` genommen.
+        Eintraege aus ``self.model`` genommen.
 
         :param from_mqtt: Ob der Aufruf von MQTT kommt und nicht auf MQTT zurueckgeschrieben
         werden soll.
+
+        :param operations: Die einzelnen Aenderungen, die zu den Eintraegen gefuehrt haben. Ist
+        die Delta-Synchronisation aktiv, werden nur diese per MQTT gesendet und der komplette
+        Stand erst verzoegert veroeffentlicht.
         """
         if not self.initialized:
             return
 
-        print(f"saving entries (from mqtt: {from_mqtt})", self, entries)
-        if entries is None:
-            entries = self.get_entries()
+        log.debug("saving entries (from mqtt: %s) %s", from_mqtt, self)
+        with tracer.span("save", from_mqtt=from_mqtt):
+            if entries is not None:
+                self.model.reset(entries, self.model.get_tombstones())
+
+            self.entries = self.get_shown_entries()
+            self.set_entries_widgets()
+            if self.edit_dialog is not None and self.edit_entry_id not in self.model:
+                # der bearbeitete Eintrag wurde geloescht
+                self.edit_dialog.dismiss()
+            if self.sort_reverse or self.filter_text:
+                ascending = self.model.sorted_dicts()
+            else:
+                ascending = list(self.entries)
+            entries_dict = {"entries": ascending, "tombstones": self.model.get_tombstones()}
+
+            # dont push to mqtt if coming from mqtt
+            self.persistence.schedule(entries_dict, operations, publish=not from_mqtt)
+
+    def write_entries(self, entries_dict: dict, operations: Optional[List[dict]]):
+        """
+        Schreibt die Aenderungen in den Speicher. Wird vom ``WriteBehindScheduler`` aufgerufen.
+
+        :param entries_dict: Die Eintraege als ``dict``.
+        :param operations: Die zusammengefassten Aenderungen als ``list`` oder ``None``, wenn
+        der komplette Stand gespeichert werden soll.
+        """
+        log.debug("writing entries to file %s", self)
+        if operations is None:
+            with tracer.span("file_io", operation="replace", entries=len(entries_dict["entries"])):
+                self.store.replace(entries_dict)
+        else:
+            with tracer.span("file_io", operation="append", operations=len(operations)):
+                self.store.append(operations)
 
-        self.entries = self.sort(entries, self.sort_reverse)
-        self.set_entries_widgets()
-        entries_dict = {"entries": self.sort(self.entries, False)}
-        try:
-            print("writing entries to file", self)
-            write_entries_to_files(entries_dict)
-        except OSError:
+    def publish_changes(self, entries_dict: dict, operations: Optional[List[dict]]):
+        """
+        Sendet die gesammelten Aenderungen per MQTT. Wird vom ``WriteBehindScheduler``
+        aufgerufen.
+
+        :param entries_dict: Der komplette Stand der Einkaufsliste als ``dict``.
+        :param operations: Die zusammengefassten Aenderungen als ``list`` oder ``None``, wenn
+        der komplette Stand gesendet werden soll.
+        """
+        if operations is not None and app.settings.delta_sync:
+            if not operations:
+                return
+            log.debug("publishing operations to mqtt %s", self)
+            ops_topic = get_ops_topic(self.get_topic())
+            app.mqtt.publish({"ops": operations}, topic=ops_topic, retain=False)
+            self.snapshot_trigger()
             return
 
-        # dont push to mqtt if coming from mqtt
-        if not from_mqtt:
-            print('publishing entries to mqtt', self)
-            app.mqtt.publish(entries_dict)
+        log.debug("publishing entries to mqtt %s", self)
+        self.snapshot_trigger.cancel()
+        app.mqtt.publish(entries_dict, topic=self.get_topic())
+
+    def publish_snapshot(self):
+        """
+        Veroeffentlicht den kompletten Stand der Einkaufsliste (retained), damit spaeter
+        verbundene Geraete die Liste erhalten, ohne alle Aenderungen zu kennen.
+        """
+        log.debug("publishing snapshot to mqtt %s", self)
+        app.mqtt.publish(self.model.get_state(), topic=self.get_topic())
+
+    def flush_pending(self):
+        """
+        Speichert und sendet vorgemerkte Aenderungen sofort und veroeffentlicht einen noch
+        ausstehenden kompletten Stand, z.B. vor dem Wechsel der Liste oder beim Pausieren.
+        """
+        self.persistence.flush()
+        if self.snapshot_trigger.is_triggered:
+            self.snapshot_trigger.cancel()
+            self.publish_snapshot()
 
     def get_entries(self):
         """
@@ -375,34 +1001,309 @@ class ShoppingEntryScreen(Screen):
 
         :return: Alle Eintraege der Einkaufliste als ``list``.
         """
-        entries = []
-        for entry in self.ids.shopping_list.children:
-            entry_dict = {"is_checked": entry.is_checked, "text": entry.text}
-            entries.append(entry_dict)
+        return self.model.to_dicts()
+
+    # endregion
+
+    # region lists
+
+    def get_topic(self) -> str:
+        """
+        Liefert die MQTT-Topic der angezeigten Einkaufsliste.
 
-        return entries
+        :return: Die Topic als ``str``.
+        """
+        return get_list_topic(app.settings.mqtt_topic, self.list_name)
 
-    @staticmethod
-    def sort(entries, reverse) -> list:
+    def get_stored_state(self, topic: str) -> Optional[dict]:
+        """
+        Liefert den gespeicherten kompletten Stand der Einkaufsliste einer Topic, z.B. um einen
+        in der ``Outbox`` vorgemerkten Stand nach einem Neustart zu senden.
+
+        :param topic: Die Topic der Einkaufsliste als ``str``.
+        :return: Der Stand als ``dict`` oder ``None``, wenn die Topic zu keiner Einkaufsliste
+        gehoert oder sie nicht gelesen werden kann.
+        """
+        parsed = parse_list_topic(app.settings.mqtt_topic, topic)
+        if parsed is None or parsed[1]:
+            return None
+
+        list_name = parsed[0]
+        if list_name == self.list_name:
+            return self.model.get_state()
+        if list_name not in app.settings.lists:
+            return None
+        try:
+            with tracer.span("file_io", operation="load"):
+                return self.lists.load(list_name)
+        except (OSError, ValueError) as e:
+            log.warning('opening list "%s" failed: %s', list_name, e)
+            return None
+
+    def get_list_title(self, list_name: str) -> str:
+        """
+        Liefert den Anzeigenamen einer Einkaufsliste.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        :return: Der Anzeigename als ``str``.
+        """
+        if list_name == DEFAULT_LIST:
+            return self.get_translated("app_title")
+
+        return list_name
+
+    def add_list(self, list_name: str):
+        """
+        Nimmt eine Einkaufsliste in die Einstellungen auf, sofern sie noch nicht bekannt ist
+        (z.B. wenn sie auf einem anderen Geraet angelegt wurde).
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        """
+        if list_name in app.settings.lists:
+            return
+
+        app.settings.lists.append(list_name)
+        app.settings.to_json_file()
+
+    def switch_list(self, list_name: str):
+        """
+        Zeigt eine andere Einkaufsliste an. Vorgemerkte Aenderungen der bisherigen Liste werden
+        vorher gespeichert und gesendet, danach wird nur die neue Liste eingelesen und mit den
+        fuer sie empfangenen Staenden zusammengefuehrt (siehe ``ShoppingLists.load``). Kann sie
+        nicht gelesen werden, bleibt die bisherige Liste angezeigt.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        """
+        if list_name == self.list_name:
+            return
+
+        self.flush_pending()
+
+        try:
+            store = self.lists.get_store(list_name)
+            with tracer.span("file_io", operation="load"):
+                entries: Optional[dict] = self.lists.load(list_name)
+        except (OSError, ValueError) as e:
+            log.warning('opening list "%s" failed: %s', list_name, e)
+            entries = None
+        if entries is None:
+            toast(self.get_translated("list_load_failed"))
+            return
+
+        self.list_name = list_name
+        self.store = store
+        app.settings.active_list = list_name
+        app.settings.to_json_file()
+        self.show_loaded_entries(entries)
+
+    def open_lists_menu(self):
+        """
+        Oeffnet das Menu zur Auswahl und zum Anlegen einer Einkaufsliste.
+        """
+        from kivymd.uix.menu import MDDropdownMenu
+
+        if self.lists_menu is not None:
+            self.lists_menu.dismiss()
+
+        menu_items = [
+            {
+                "viewclass": "OneLineListItem",
+                "text": self.get_list_title(list_name),
+                "height": dp(56),
+                "on_release": lambda x=list_name: self.on_list_selected(x),
+            }
+            for list_name in app.settings.lists
+        ]
+        menu_items.append({
+            "viewclass": "OneLineListItem",
+            "text": self.get_translated("new_list"),
+            "height": dp(56),
+            "on_release": lambda: self.open_new_list_popup(),
+        })
+        for key, callback in (
+            ("import", self.open_import_manager), ("export", self.open_export_manager)
+        ):
+            menu_items.append({
+                "viewclass": "OneLineListItem",
+                "text": self.get_translated(key),
+                "height": dp(56),
+                "on_release": callback,
+            })
+
+        self.lists_menu = MDDropdownMenu(
+            caller=self.ids.toolbar,
+            items=menu_items,
+            width_mult=4,
+        )
+        self.lists_menu.open()
+
+    def on_list_selected(self, list_name: str):
+        """
+        Wird aufgerufen, wenn im Menu eine Einkaufsliste ausgewaehlt wurde.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        """
+        if self.lists_menu is not None:
+            self.lists_menu.dismiss()
+        self.switch_list(list_name)
+
+    def open_new_list_popup(self):
+        """
+        Oeffnet das Popup zum Anlegen einer Einkaufsliste.
+        """
+        if self.lists_menu is not None:
+            self.lists_menu.dismiss()
+        if self.add_dialog:
+            return
+
+        self.add_dialog = app.dialog_pool.checkout(
+            title_key="new_list",
+            on_confirm=self.create_list,
+            on_close=self.close_add_popup,
+            hint_key="list_name",
+        )
+        self.add_dialog.open()
+
+    def create_list(self, list_name: str):
+        """
+        Legt eine Einkaufsliste an und zeigt sie an.
+
+        :param list_name: Der Name der Einkaufsliste als ``str``.
+        """
+        list_name = list_name.strip()
+        if not is_valid_list_name(list_name) or list_name == DEFAULT_LIST:
+            toast(self.get_translated("invalid_list_name"))
+            return
+
+        if self.add_dialog is not None:
+            self.add_dialog.dismiss()
+        self.add_list(list_name)
+        self.switch_list(list_name)
+
+    # endregion
+
+    # region import/export
+
+    def open_file_manager(self, select_path, selector: str, extensions: List[str]):
+        """
+        Oeffnet die Dateiauswahl im Home-Verzeichnis.
+
+        :param select_path: Wird mit dem ausgewaehlten Pfad als ``str`` aufgerufen.
+        :param selector: ``"file"`` oder ``"folder"`` als ``str``.
+        :param extensions: Die angezeigten Dateiendungen als ``list``.
+        """
+        from kivymd.uix.filemanager import MDFileManager
+
+        if self.lists_menu is not None:
+            self.lists_menu.dismiss()
+
+        def on_select(path: str):
+            file_manager.close()
+            select_path(path)
+
+        file_manager = MDFileManager(
+            exit_manager=lambda *_: file_manager.close(),
+            select_path=on_select,
+            selector=selector,
+            ext=extensions,
+        )
+        file_manager.show(str(Path.home()))
+
+    def open_import_manager(self):
+        """
+        Oeffnet die Dateiauswahl fuer den Import in die angezeigte Einkaufsliste.
         """
-        Sortiert die Einkaufliste andhand der Status und dem Text.
+        self.open_file_manager(
+            self.import_file, "file", [f".{file_format}" for file_format in FORMATS]
+        )
 
-        :param entries: Die Einkauflisten-Eintraege als ``list``.
-        :param reverse: Gibt als ``bool`` an, ob umgekehrt soriert werden soll.
-        :return: Sortierte ``list`` der Eintraege.
+    def open_export_manager(self):
         """
-        return sorted(entries, key=lambda entry: (entry["is_checked"], entry["text"]), reverse=reverse)
+        Oeffnet die Ordnerauswahl fuer den Export der angezeigten Einkaufsliste.
+        """
+        self.open_file_manager(self.export_file, "folder", [])
+
+    def import_file(self, path: str):
+        """
+        Importiert Eintraege aus einer Text-, CSV- oder JSON-Datei. Die Datei wird in einem
+        eigenen Thread zeilenweise gelesen und geprueft, die Eintraege werden anschliessend
+        gemeinsam uebernommen (siehe ``commit_import``).
 
-    def set_entries(self, entries: List[Dict[str, Union[str, bool]]], from_mqtt=False):
+        :param path: Der Pfad der Datei als ``str``.
         """
-        Setzt die Werte der Liste auf die mitgegebenen Eintraege und speichert diese.
+        list_name = self.list_name
+
+        def run():
+            report = ImportReport()
+            started = time.perf_counter()
+            try:
+                with open_import_file(Path(path)) as file:
+                    entries = list(read_entries(file, get_format(Path(path)), report))
+            except (OSError, ValueError) as e:
+                log.warning("importing %s failed: %s", path, e)
+                Clock.schedule_once(lambda _: toast(self.get_translated("import_failed")))
+                return
+            log.info(
+                "read %s in %.0f ms: %s", path, (time.perf_counter() - started) * 1000, report
+            )
+            Clock.schedule_once(lambda _: self.commit_import(list_name, entries, report))
+
+        threading.Thread(target=run, daemon=True).start()
 
-        :param entries: Die neuen Eintraege als ``list``.
-        :param from_mqtt: Als ``bool``, ob der Aufruf von MQTT kommt und nicht auf MQTT
-        zurueckgeschrieben werden soll.
+    def commit_import(self, list_name: str, entries: List[dict], report: ImportReport):
         """
-        print("set_entries called", entries, self)
-        self.save_entries(entries, from_mqtt=from_mqtt)
+        Uebernimmt importierte Eintraege als ein Batch: Die Einkaufsliste wird nur einmal
+        angezeigt, gespeichert und gesendet. Bei vielen Eintraegen wird statt der einzelnen
+        Aenderungen der komplette Stand gespeichert und gesendet.
+
+        :param list_name: Die Einkaufsliste, in die importiert wurde, als ``str``.
+        :param entries: Die gelesenen Eintraege ohne ID als ``list`` von ``dict``.
+        :param report: Der Bericht des Imports als ``ImportReport``.
+        """
+        if list_name != self.list_name:
+            log.warning('list "%s" is no longer shown, discarding import', list_name)
+            toast(self.get_translated("import_failed"))
+            return
+
+        with tracer.span("import", entries=len(entries)):
+            operations = self.model.apply_local_all(
+                add_operation({"id": new_entry_id(), **entry}) for entry in entries
+            )
+            if len(operations) >= IMPORT_SNAPSHOT_THRESHOLD:
+                self.save_entries(operations=None)
+            elif operations:
+                self.save_entries(operations=operations)
+
+        for row, reason in report.errors:
+            log.info("import skipped row %d: %s", row, reason)
+        toast(self.get_translated("import_done").format(
+            imported=report.imported, skipped=report.skipped
+        ))
+
+    def export_file(self, directory: str):
+        """
+        Exportiert die angezeigte Einkaufsliste als Datei in einen Ordner. Die Datei wird in
+        einem eigenen Thread Eintrag fuer Eintrag geschrieben.
+
+        :param directory: Der Ordner als ``str``.
+        """
+        entries = self.model.sorted_dicts()
+        path = Path(directory, f"{self.list_name}.{EXPORT_FORMAT}")
+
+        def run():
+            try:
+                with tracer.span("file_io", operation="export", entries=len(entries)):
+                    with open_export_file(path) as file:
+                        write_entries(entries, file, EXPORT_FORMAT)
+            except OSError as e:
+                log.warning("exporting to %s failed: %s", path, e)
+                Clock.schedule_once(lambda _: toast(self.get_translated("export_failed")))
+                return
+            Clock.schedule_once(
+                lambda _: toast(self.get_translated("export_done").format(path=path))
+            )
+
+        threading.Thread(target=run, daemon=True).start()
 
     # endregion
 
@@ -416,9 +1317,11 @@ class ShoppingEntryScreen(Screen):
 
     def navigate_to_settings(self):
         """
-        Navigiert zur Einstellungs-Seite
+        Navigiert zur Einstellungs-Seite. Diese wird beim ersten Aufruf erstellt.
         """
-        self.save_entries()
+        self.persistence.flush()
+        if not self.manager.has_screen("settings"):
+            self.manager.add_widget(SettingsScreen(name="settings"))
         self.manager.transition.direction = "left"
         self.manager.current = "settings"
 
@@ -457,24 +1360,7 @@ class SettingsScreen(Screen):
         self.previous_mqtt_password = app.settings.mqtt_password
         self.previous_mqtt_username = app.settings.mqtt_username
 
-        menu_items = [
-            {
-                "viewclass": "OneLineListItem",
-                "text": f"{LANGUAGES.get(language_key)}",
-                "height": dp(56),
-                "on_release": lambda x=language_key: self.set_item(x),
-            }
-            for language_key in LANGUAGES.keys()
-        ]
-
-        self.menu = MDDropdownMenu(
-            caller=self.ids.language_drop_down,
-            items=menu_items,
-            position="center",
-            width_mult=4,
-        )
-
-        self.menu.bind()
+        self.menu = None
         # update the current selected from settings
         self.set_item(app.settings.language)
 
@@ -510,8 +1396,29 @@ class SettingsScreen(Screen):
 
     def show_languages_menu(self):
         """
-        Oeffnet das Dropdown-Menu der Sprachauswahl.
-        """
+        Oeffnet das Dropdown-Menu der Sprachauswahl. Es wird beim ersten Oeffnen erstellt.
+        """
+        if self.menu is None:
+            from kivymd.uix.menu import MDDropdownMenu
+
+            menu_items = [
+                {
+                    "viewclass": "OneLineListItem",
+                    "text": f"{LANGUAGES.get(language_key)}",
+                    "height": dp(56),
+                    "on_release": lambda x=language_key: self.set_item(x),
+                }
+                for language_key in LANGUAGES.keys()
+            ]
+
+            self.menu = MDDropdownMenu(
+                caller=self.ids.language_drop_down,
+                items=menu_items,
+                position="center",
+                width_mult=4,
+            )
+            self.menu.bind()
+
         self.menu.open()
 
     def set_item(self, language_key):
@@ -523,7 +1430,8 @@ class SettingsScreen(Screen):
         self.language_key = language_key
         language = LANGUAGES.get(language_key)
         self.ids.language_drop_down.set_item(language)
-        self.menu.dismiss()
+        if self.menu is not None:
+            self.menu.dismiss()
 
     def get_translated(self, key) -> str:
         """    
@@ -542,7 +1450,7 @@ class SettingsScreen(Screen):
         """
         if not self.initialized:
             return
-        print("update_language")
+        log.debug("update_language")
         self.update_settings()
         toast(self.get_translated("change_setting_restart_alert"))
 
@@ -561,13 +1469,15 @@ class SettingsScreen(Screen):
         """
         if not self.initialized:
             return
-        print("update_settings")
+        log.debug("update_settings")
         app.settings.language = self.language_key
         app.settings.dark_theme = self.ids.theme_switch.active
         app.settings.mqtt_server = self.ids.mqtt_server_text_field.text
         app.settings.mqtt_topic = self.ids.mqtt_topic_text_field.text
         app.settings.mqtt_username = self.ids.mqtt_username_text_field.text
         app.settings.mqtt_password = self.ids.mqtt_password_text_field.text
+        app.settings.delta_sync = self.ids.delta_sync_switch.active
+        app.settings.debug_overlay = self.ids.debug_overlay_switch.active
         app.settings.to_json_file()
 
 
@@ -576,6 +1486,7 @@ class ShoppingListApp(MDApp):
     Geruest der gesamten App.
     """
     settings = ObjectProperty(AppSettings(), rebind=True)
+    connection_state = StringProperty(STATE_DISCONNECTED)
 
     def __init__(self, **kwargs):
         """
@@ -585,6 +1496,15 @@ class ShoppingListApp(MDApp):
         """
         super().__init__(**kwargs)
         self.mqtt: MqttClient = None  # type: ignore
+        self.ingest: Optional[IngestQueue] = None
+        self.echo_filter: Optional[EchoFilter] = None
+        self.debug_overlay: Optional[DebugOverlay] = None
+        self.dialog_pool: WidgetPool[TextDialog] = WidgetPool(
+            "dialogs", lambda: TextDialog(self.dialog_pool), TextDialog.reset, TextDialog.clear
+        )
+        self.row_pool: WidgetPool[ShoppingEntry] = WidgetPool(
+            "rows", ShoppingEntry, max_idle=PREBUILT_ROWS
+        )
 
     def build(self):
         """
@@ -592,56 +1512,213 @@ class ShoppingListApp(MDApp):
 
         :return: Einen ``ScreenManger`` zur Navigation.
         """
+        startup.mark("app_init")
         self.title = "Shopping List App"
         self.settings = AppSettings.get_or_create()
-        print(self.settings)
-        print(self.user_data_dir)
-        print(self.directory)
+        self.apply_diagnostics()
+        startup.mark("settings")
+        AppSettings.bind(self.on_settings_changed)
+        log.debug("settings %s", self.settings)
+        log.debug("user data directory %s", self.user_data_dir)
+        log.debug("app directory %s", self.directory)
 
         if kivy.utils.platform in ["android", "ios"]:
-            print("android or ios")
+            log.debug("android or ios")
             src_path = Path(self.user_data_dir, "app")
         else:
-            print("not android or ios")
+            log.debug("not android or ios")
             src_path = Path(self.directory)
 
-        print(src_path)
+        log.debug("source path %s", src_path)
         TranslationProvider.src_dir = src_path
 
         self.update_theme()
+        startup.mark("theme")
 
         sm = ScreenManager()
         shoppingEntryScreen = ShoppingEntryScreen(name="shopping")
         sm.add_widget(shoppingEntryScreen)
-        sm.add_widget(SettingsScreen(name="settings"))
+        startup.mark("shopping_screen")
 
+        client_id = f"shoppinglist-{self.settings.device_id}"
+        self.echo_filter = EchoFilter(client_id)
+        self.ingest = IngestQueue(
+            shoppingEntryScreen.update_from_mqtt_batch, echo_filter=self.echo_filter
+        )
         self.mqtt = MqttClient(
             broker=self.settings.mqtt_server,
             port=1883,
             topic=self.settings.mqtt_topic,
-            client_id=None,
-            subscribe_callback=lambda msg_dict, _: shoppingEntryScreen.update_from_mqtt(
-                msg_dict
+            client_id=client_id,
+            subscribe_callback=lambda msg_dict, topic: shoppingEntryScreen.update_from_mqtt(
+                msg_dict, topic
             ),
             username=self.settings.mqtt_username,
             password=self.settings.mqtt_password,
+            message_queue=self.ingest,
+            state_callback=self.on_mqtt_state,
+            outbox=Outbox(snapshot_source=shoppingEntryScreen.get_stored_state),
+            echo_filter=self.echo_filter,
         )
 
-        try:
-            print("getaddrinfo google.com")
-            print(socket.getaddrinfo("google.com", 80))
-        except Exception as e:
-            print(e)
-        try:
-            print(f"getaddrinfo {self.settings.mqtt_server}")
-            print(socket.getaddrinfo(self.settings.mqtt_server, 1883))
-        except Exception as e:
-            print(e)
-
-        self.mqtt.connect()
+        startup.mark("mqtt_client")
         self.mqtt.subscribe()
+        Window.bind(on_flip=self.on_first_frame, on_keyboard=self.on_keyboard)
         return sm
 
+    def on_first_frame(self, *_):
+        """
+        Wird aufgerufen, sobald der erste Frame gezeichnet ist, und plant alles, was fuer die
+        Anzeige der Einkaufsliste nicht noetig ist, fuer den naechsten Frame ein.
+
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        """
+        Window.unbind(on_flip=self.on_first_frame)
+        startup.mark("first_frame")
+        Clock.schedule_once(self.run_deferred_startup)
+
+    def run_deferred_startup(self, *_):
+        """
+        Verbindet mit dem MQTT-Broker und startet die Netzwerk-Pruefung nach dem ersten Frame.
+
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        """
+        self.mqtt.connect()
+        threading.Thread(target=self.run_network_probes, daemon=True).start()
+        startup.mark("deferred")
+        startup.print_report()
+        Clock.schedule_once(self.prebuild_widgets)
+
+    def prebuild_widgets(self, *_):
+        """
+        Baut Dialoge und Zeilen vorab auf, damit das erste Oeffnen eines Dialogs und das
+        Scrollen nicht darauf warten muessen.
+
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        """
+        self.dialog_pool.prebuild(PREBUILT_DIALOGS)
+        self.row_pool.prebuild(PREBUILT_ROWS)
+
+    def run_network_probes(self):
+        """
+        Prueft die Namensaufloesung (nur zur Fehlersuche). Laeuft in einem eigenen Thread.
+        """
+        for host, port in (("google.com", 80), (self.settings.mqtt_server, 1883)):
+            try:
+                log.debug("getaddrinfo %s: %s", host, socket.getaddrinfo(host, port))
+            except Exception as e:
+                log.warning("getaddrinfo %s failed: %s", host, e)
+
+    @mainthread
+    def on_mqtt_state(self, state: str):
+        """
+        Wird aufgerufen, wenn sich der Verbindungszustand des MQTT-Clients aendert.
+
+        :param state: Der neue Zustand als ``str`` (siehe ``mqtt.STATE_*``).
+        """
+        self.connection_state = state
+
+    @staticmethod
+    def get_connection_icon(state: str) -> str:
+        """
+        Liefert das Icon zu einem Verbindungszustand.
+
+        :param state: Der Zustand als ``str``.
+        :return: Der Name des Icons als ``str``.
+        """
+        return CONNECTION_ICONS.get(state, CONNECTION_ICONS[STATE_DISCONNECTED])
+
+    def show_connection_state(self):
+        """
+        Zeigt den aktuellen Verbindungszustand zum MQTT-Broker an.
+        """
+        toast(TranslationProvider.get_translated(
+            f"mqtt-{self.connection_state}", self.settings.language
+        ))
+
+    def on_settings_changed(self, settings: AppSettings, changed: Set[str]):
+        """
+        Wird aufgerufen, wenn sich Einstellungen geaendert haben, und aktualisiert alle
+        Widgets, die an ``app.settings`` gebunden sind.
+
+        :param settings: Die aktuellen Einstellungen als ``AppSettings``.
+        :param changed: Die Namen der geaenderten Werte als ``set``.
+        """
+        log.debug("settings changed %s", changed)
+        self.settings = settings
+        self.property("settings").dispatch(self)
+        if changed & DIAGNOSTICS_SETTINGS:
+            self.apply_diagnostics()
+
+    def apply_diagnostics(self):
+        """
+        Uebernimmt Log-Level, Tracing und Debug-Anzeige aus den Einstellungen. Fuer die
+        Debug-Anzeige wird auch ohne Trace-Datei gemessen.
+        """
+        set_log_level(self.settings.log_level)
+        tracer.configure(
+            self.settings.tracing or self.settings.debug_overlay,
+            Path(FILES_PATH, TRACE_FILENAME) if self.settings.tracing else None,
+        )
+
+        if self.settings.debug_overlay:
+            if self.debug_overlay is None:
+                self.debug_overlay = DebugOverlay()
+            self.debug_overlay.show()
+        elif self.debug_overlay is not None:
+            self.debug_overlay.hide()
+
+    def on_keyboard(self, _window, key: int, *_) -> bool:
+        """
+        Blendet die Debug-Anzeige mit F12 ein oder aus.
+
+        :param _window: Das Fenster, nicht fuer unsere Logik relevant.
+        :param key: Der Code der gedrueckten Taste als ``int``.
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        :return: ``True``, wenn die Taste behandelt wurde.
+        """
+        if key != DEBUG_OVERLAY_KEY:
+            return False
+
+        self.settings.debug_overlay = not self.settings.debug_overlay
+        self.settings.to_json_file()
+        return True
+
+    def on_pause(self):
+        """
+        Wird aufgerufen, wenn die App pausiert wird (z.B. unter Android).
+        Speichert vorgemerkte Aenderungen sofort.
+
+        :return: ``True``, damit die App pausiert und nicht beendet wird.
+        """
+        self.flush_entries()
+        return True
+
+    def on_stop(self):
+        """
+        Wird beim Beenden der App aufgerufen und speichert vorgemerkte Aenderungen sofort.
+        """
+        self.flush_entries()
+        for pool in (self.dialog_pool, self.row_pool):
+            log.info("%s pool stats %s", pool.name, pool.get_stats())
+        if self.ingest is not None:
+            self.ingest.stop()
+        if self.root is not None:
+            self.root.get_screen("shopping").lists.close()
+        tracer.close()
+
+    def flush_entries(self):
+        """
+        Speichert und sendet alle noch vorgemerkten Aenderungen der Einkaufsliste samt eines
+        noch ausstehenden kompletten Stands.
+        """
+        if self.root is None:
+            return
+
+        screen = self.root.get_screen("shopping")
+        screen.flush_pending()
+        log.info("persistence stats %s", screen.persistence.get_stats())
+
     def update_theme(self):
         """
         Setze das jeweils gegenteilige Theme.
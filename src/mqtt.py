@@ -2,7 +2,31 @@ import random
 from typing import Callable, Optional
 from kivymd.toast import toast
 from paho.mqtt import client as mqtt_client
-import json
+
+from data.serialization import JSON
+from echo import EchoFilter
+from envelope import FormatNegotiator, decode_payload, get_capabilities, is_envelope
+from ingest import IngestQueue
+from outbox import Outbox
+from sync import (
+    get_peer_topic, get_subscription_topic, is_ops_topic, is_valid_message, parse_peer_topic,
+)
+from tracing import get_logger, tracer
+
+log = get_logger(__name__)
+
+# Verbindungszustaende des ``MqttClient``
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_CONNECTED = "connected"
+
+# Wartezeit in Sekunden vor dem ersten erneuten Verbindungsversuch, sie verdoppelt sich bis
+# zum Maximum. Damit nicht alle Geraete gleichzeitig neu verbinden, wird sie zufaellig gestreut.
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 120
+RECONNECT_JITTER = 0.5
+# QoS der gesendeten Nachrichten, 1 damit der Broker den Empfang bestaetigt
+PUBLISH_QOS = 1
 
 def _get_broker_and_port(broker: str, port: int) -> tuple[str, int]:
     """
@@ -16,7 +40,7 @@ def _get_broker_and_port(broker: str, port: int) -> tuple[str, int]:
     angegeben ist.
     :return: (broker, port) als Tuple.
     """
-    print("getting broker and port", broker, port)
+    log.debug("getting broker and port %s %s", broker, port)
 
     if ":" in broker:
         broker, port = broker.split(":")  # type: ignore
@@ -38,13 +62,39 @@ class MqttClient:
         username: Optional[str] = None,
         password: Optional[str] = None,
         client_id: Optional[str] = None,
+        message_queue: Optional[IngestQueue] = None,
+        state_callback: Optional[Callable[[str], None]] = None,
+        outbox: Optional[Outbox] = None,
+        echo_filter: Optional[EchoFilter] = None,
     ) -> None:
-        self.__connection_error = False
+        """
+        Instantiiert den MQTT-Client.
+
+        :param subscribe_callback: Wird mit der dekodierten Nachricht und der Topic aufgerufen.
+        :param message_queue: [optional] Warteschlange als ``IngestQueue``, an die empfangene
+        Nachrichten undekodiert uebergeben werden, statt sie im MQTT-Thread zu verarbeiten.
+        :param state_callback: [optional] Wird im MQTT-Thread mit dem neuen Verbindungszustand
+        (``STATE_*``) aufgerufen.
+        :param outbox: [optional] ``Outbox``, in der Nachrichten bis zur Bestaetigung durch den
+        Broker gespeichert und nach dem Verbinden gesammelt gesendet werden.
+        :param echo_filter: [optional] ``EchoFilter``, mit dem gesendete Nachrichten markiert
+        und eigene oder bereits bekannte Nachrichten verworfen werden. Standardmaessig wird
+        einer mit der Client-ID erstellt.
+        """
         self.set_target(broker, topic, port, username, password)
         if client_id is None:
-            self.__client_id = f"python-mqtt-{random.randint(0, 1000)}"
+            client_id = f"python-mqtt-{random.randint(0, 1000)}"
+        self.__client_id = client_id
+        self.echo_filter = echo_filter if echo_filter is not None else EchoFilter(client_id)
         self.__client: Optional[mqtt_client.Client] = None
         self.__subscribe_callback = subscribe_callback
+        self.__message_queue = message_queue
+        self.__state_callback = state_callback
+        self.__outbox = outbox
+        self.negotiator = FormatNegotiator()
+        self.__subscribed = False
+        self.__message_callback: Optional[Callable] = None
+        self.state = STATE_DISCONNECTED
 
     def set_target(
         self,
@@ -81,99 +131,258 @@ class MqttClient:
         """
         if callback is None:
             callback = self.__subscribe_callback
-        x = json.loads(msg.payload.decode())
-        callback(x, msg.topic)
+        x = decode_payload(msg.payload)
+        if not is_valid_message(x, is_ops_topic(msg.topic)):
+            log.warning("dropping malformed mqtt message on %s", msg.topic)
+            return
+        if self.echo_filter.accept(x, msg.topic):
+            callback(x, msg.topic)
 
-    @staticmethod
-    def on_connect(return_code: int) -> None:
+    def on_connect(self, return_code: int) -> None:
         """
-        Wird aufgerufen, wenn eine Verbindung zum MQTT-Broker hergestellt wurde.
-        Gibt lediglich eine Meldung aus.
+        Wird im MQTT-Thread aufgerufen, wenn eine Verbindung zum MQTT-Broker hergestellt
+        wurde. Die Topics werden nach jeder (erneuten) Verbindung wieder abonniert.
 
         :param return_code: Mitgabe als ``int``, wodurch entschieden wird, ob die Verbindung
         erfolgreich war.
         """
+        if return_code != 0:
+            log.warning("Failed to connect, return code %s", return_code)
+            return
+
+        log.info("Connected to MQTT Broker!")
+        self.__set_state(STATE_CONNECTED)
+        self.__announce_capabilities()
+        if self.__subscribed:
+            self.__subscribe()
+        if self.__outbox is not None:
+            self.__replay_outbox()
+
+    def on_disconnect(self, return_code: int) -> None:
+        """
+        Wird im MQTT-Thread aufgerufen, wenn die Verbindung zum MQTT-Broker getrennt wurde.
+        Bei einem unerwarteten Verbindungsabbruch verbindet der Client im Hintergrund neu.
+
+        :param return_code: ``0``, wenn die Verbindung absichtlich getrennt wurde, als ``int``.
+        """
         if return_code == 0:
-            print("Connected to MQTT Broker!")
-        else:
-            print("Failed to connect, return code", return_code)
+            self.__set_state(STATE_DISCONNECTED)
+            return
+
+        log.warning("Lost connection to MQTT broker, reconnecting (%s)", return_code)
+        self.__set_state(STATE_CONNECTING)
+
+    def __announce_capabilities(self):
+        """
+        Teilt den anderen Geraeten (retained) mit, welche Nachrichtenformate unterstuetzt
+        werden. Die Mitteilung ist immer reines JSON.
+        """
+        if self.__client is None:
+            return
+
+        self.__client.publish(
+            get_peer_topic(self.__topic, self.__client_id),
+            JSON.dumps(get_capabilities()),
+            qos=PUBLISH_QOS,
+            retain=True,
+        )
+
+    def on_peer_message(self, peer_id: str, payload: bytes):
+        """
+        Verarbeitet die Mitteilung der unterstuetzten Formate eines Geraets.
+
+        :param peer_id: ID des Geraets als ``str``.
+        :param payload: Die Mitteilung als ``bytes``, leer wenn sie geloescht wurde.
+        """
+        if not payload:
+            self.negotiator.update_peer(peer_id, None)
+            return
+
+        try:
+            self.negotiator.update_peer(peer_id, JSON.loads(payload))
+        except ValueError as e:
+            log.warning("ignoring invalid capabilities of peer %s: %s", peer_id, e)
+            return
+        log.info("peer %s, payload format now %s", peer_id, self.negotiator.format)
+
+    def __set_state(self, state: str):
+        if state == self.state:
+            return
+
+        self.state = state
+        if self.__state_callback is not None:
+            self.__state_callback(state)
 
     def publish(
         self, msg: dict, topic: Optional[str] = None, retain: bool = True
     ) -> None:
         """
-        Sendet eine Nachricht an den MQTT-Broker.
+        Sendet eine Nachricht an den MQTT-Broker. Gibt es eine ``Outbox``, wird die Nachricht
+        dort gespeichert, bis der Broker den Empfang bestaetigt, und ohne Verbindung spaeter
+        gesendet.
 
-        :param msg: Die zu sendenden Daten als ``dict`` (wird automatisch in JSON umgewandelt).
+        :param msg: Die zu sendenden Daten als ``dict`` (wird automatisch in kompaktes JSON
+        umgewandelt).
         :param topic: [optional] Die Topic als ``str`` an welche die Nachricht gesendet werden soll
         (wenn nicht angegeben wird die topic der Klasse verwendet).
         :param retain: Ob bei der Nachricht die retain-Flag gesetzt werden soll, als ``bool``.
         """
+        if topic is None:
+            topic = self.__topic
+
+        if self.__outbox is not None:
+            item = self.__outbox.add(topic, msg, retain)
+            if self.state == STATE_CONNECTED:
+                self.__send(item)
+            else:
+                log.info("not connected to MQTT broker, message kept in outbox (%s)", self.state)
+            return
+
         if self.__client is None:
-            print("publish called but mqtt-client is None", self)
+            log.warning("publish called but mqtt-client is None %s", self)
             return
 
-        if topic is None:
-            topic = self.__topic
+        if self.state != STATE_CONNECTED:
+            log.warning("publish called while not connected to MQTT broker (%s)", self.state)
+            return
 
-        msg_str = json.dumps(msg)
-        result = self.__client.publish(topic, msg_str, retain=retain)
+        payload = self.negotiator.encode(self.echo_filter.tag(msg, topic))
+        result = self.__client.publish(topic, payload, retain=retain)
         status = result[0]
         if status != 0:
-            print("Failed to send message to MQTT broker", status, self)
+            log.warning("Failed to send message to MQTT broker (%s) %s", status, self)
             toast("Failed to send message to MQTT broker")
 
+    def __send(self, item: dict):
+        client = self.__client
+        if client is None:
+            return
+
+        with tracer.span("publish", topic=item["topic"]):
+            payload = self.negotiator.encode(self.echo_filter.tag(item["msg"], item["topic"]))
+            result = client.publish(
+                item["topic"], payload, qos=PUBLISH_QOS, retain=item["retain"]
+            )
+        if result.rc != 0:
+            log.warning(
+                "Failed to send message to MQTT broker, kept in outbox (%s) %s", result.rc, self
+            )
+            return
+
+        self.__outbox.mark_sent(item["id"], result.mid)  # type: ignore
+
+    def __replay_outbox(self):
+        batch = self.__outbox.take_batch()  # type: ignore
+        if batch:
+            log.info("sending outbox (%d messages)", len(batch))
+        for item in batch:
+            self.__send(item)
+
     def subscribe(self, callback=None) -> None:
         """
-        Abonniert die Topic der Klasse und ruft die angegebene Callback-Funktion auf, wenn eine
-        Nachricht empfangen wird.
+        Abonniert die Topic der Klasse samt aller Unter-Topics (Einkaufslisten und deren
+        Aenderungen) mit einer Wildcard-Subscription und ruft die angegebene
+        Callback-Funktion auf, wenn eine Nachricht empfangen wird. Besteht noch keine
+        Verbindung, wird abonniert, sobald sie hergestellt ist.
 
         :param callback: Die Callback-Funktion als ``Callable``, die aufgerufen werden soll
         (wenn nicht angegeben, wird die Callback-Funktion der Klasse verwendet).
         """
-        if self.__connection_error:
-            return
+        self.__subscribed = True
+        self.__message_callback = callback
+        if self.state == STATE_CONNECTED:
+            self.__subscribe()
 
+    def __subscribe(self):
         if self.__client is None:
-            print("subscribe called but mqtt-client is None", self)
+            log.warning("subscribe called but mqtt-client is None %s", self)
             return
 
-        self.__client.subscribe(self.__topic)
-        self.__client.on_message = lambda _client, _userdata, msg: self.parse_callback(
+        callback = self.__message_callback
+        self.__client.on_message = lambda _client, _userdata, msg: self.on_message(
             msg, callback
         )
+        self.__client.subscribe(get_subscription_topic(self.__topic), 0)
+
+    def on_message(self, msg, callback: Optional[Callable]):
+        """
+        Wird im MQTT-Thread fuer jede empfangene Nachricht aufgerufen. Gibt es eine
+        Warteschlange und keine eigene Callback-Funktion, wird die Nachricht nur eingereiht.
+
+        :param msg: Die empfangene Nachricht.
+        :param callback: [optional] Die Callback-Funktion als ``Callable``.
+        """
+        peer_id = parse_peer_topic(self.__topic, msg.topic)
+        if peer_id is not None:
+            self.on_peer_message(peer_id, msg.payload)
+            return
+
+        # Live empfangenes reines JSON stammt von einem Geraet einer aelteren Version
+        if not msg.retain and not is_envelope(msg.payload) and self.__is_legacy(msg.payload):
+            self.negotiator.note_legacy_peer()
+
+        if callback is None and self.__message_queue is not None:
+            self.__message_queue.put(msg.payload, msg.topic)
+            return
+
+        self.parse_callback(msg, callback)
+
+    def __is_legacy(self, payload: bytes) -> bool:
+        if self.negotiator.has_legacy_peer:
+            return False
+
+        # Solange keine Faehigkeiten bekannt sind, sendet auch dieses Geraet reines JSON (z.B.
+        # die Outbox nach dem Verbinden), dessen Echo nicht als aelteres Geraet zaehlen darf
+        try:
+            return not self.echo_filter.is_own(decode_payload(payload))
+        except ValueError:
+            return False
 
     def connect(self) -> None:
         """
-        Verbindet mit dem MQTT-Broker
+        Verbindet im Hintergrund mit dem MQTT-Broker, ohne den aufrufenden Thread zu blockieren.
+        Schlaegt die Verbindung fehl oder bricht sie ab, wird mit exponentiell wachsender
+        Wartezeit erneut verbunden.
         """
         self.__client = mqtt_client.Client(self.__client_id)
         if self.__username:
-            print("setting username and password")
+            log.debug("setting username and password")
             self.__client.username_pw_set(self.__username, self.__password)
 
-        self.__client.on_connect = lambda _client, _userdata, _flags, return_code: MqttClient.on_connect(return_code)
-        print("Connecting to MQTT broker...")
-        print("broker:", self.__broker, "port:", self.__port)
+        self.__client.on_connect = lambda _client, _userdata, _flags, return_code: self.on_connect(return_code)
+        self.__client.on_disconnect = lambda _client, _userdata, return_code: self.on_disconnect(return_code)
+        if self.__outbox is not None:
+            self.__client.on_publish = lambda _client, _userdata, mid: self.__outbox.confirm(mid)  # type: ignore
+        # die Streuung der ersten Wartezeit setzt sich durch die Verdopplung fort
+        self.__client.reconnect_delay_set(
+            min_delay=RECONNECT_MIN_DELAY * (1 + random.uniform(0, RECONNECT_JITTER)),
+            max_delay=RECONNECT_MAX_DELAY,
+        )
+        log.info("Connecting to MQTT broker %s:%s...", self.__broker, self.__port)
+        self.__set_state(STATE_CONNECTING)
         try:
-            self.__client.connect(host=self.__broker, port=self.__port)
+            self.__client.connect_async(host=self.__broker, port=self.__port)
             self.__client.loop_start()
-            self.__connection_error = False
-        except Exception as e:
-            self.__connection_error = True
-            print("Failed to connect to MQTT broker", e)
+        except ValueError as e:
+            self.__set_state(STATE_DISCONNECTED)
+            log.warning("Failed to connect to MQTT broker: %s", e)
             toast("Failed to connect to MQTT broker")
 
     def disconnect(self) -> None:
         """
-        Trennt die Verbindung zum MQTT-Broker.
+        Trennt die Verbindung zum MQTT-Broker und beendet die erneuten Verbindungsversuche.
         Muss nicht explizit aufgerufen werden, da die Klasse sich selbst beim Loeschen automatisch
         trennt.
         """
-        if self.__client and self.__connection_error is False:
-            print("Disconnecting from MQTT broker...")
-            self.__client.loop_stop()
+        if self.__client is not None:
+            log.info("Disconnecting from MQTT broker...")
+            # Zustandsaenderungen des alten Clients nicht mehr melden
+            self.__client.on_connect = None
+            self.__client.on_disconnect = None
             self.__client.disconnect()
+            self.__client.loop_stop()
+            self.__client = None
+        self.__set_state(STATE_DISCONNECTED)
 
     def __del__(self) -> None:
         self.disconnect()
@@ -0,0 +1,318 @@
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from data.files import FILES_PATH, write_atomic
+from data.serialization import dumps, loads
+from sync import compact_operations, get_ops_topic, is_ops_topic
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+OUTBOX_FILENAME = "outbox.json"
+
+# Ab dieser Groesse (in Bytes) wird die Datei mit dem aktuellen Stand neu geschrieben
+COMPACTION_THRESHOLD = 64 * 1024
+
+
+class Outbox:
+    """
+    Speichert zu sendende MQTT-Nachrichten dauerhaft, bis der Broker den Empfang bestaetigt hat.
+    So gehen ohne Verbindung gemachte Aenderungen nicht verloren, sondern werden nach dem
+    (erneuten) Verbinden gesammelt gesendet.
+
+    Ueberholte Nachrichten werden zusammengefasst: Ein kompletter Stand (retained) ersetzt
+    aeltere komplette Staende und Aenderungen derselben Einkaufsliste, mehrere Aenderungen auf
+    dieselbe Topic werden zu einer Nachricht zusammengefasst.
+
+    Die Datei wird wie das Journal der Eintraege nur fortgeschrieben: Jede Aenderung der Outbox
+    haengt eine Zeile mit den hinzugekommenen und den entfernten Eintraegen an. Neu geschrieben
+    wird sie erst ab ``COMPACTION_THRESHOLD`` und beim Einlesen, geleert, sobald die Outbox leer
+    ist. Komplette Staende werden dabei nur vorgemerkt und nach einem Neustart aus dem
+    gespeicherten Stand der Einkaufsliste neu erstellt.
+    """
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        snapshot_source: Optional[Callable[[str], Optional[dict]]] = None,
+    ) -> None:
+        """
+        Instantiiert die Outbox und liest noch nicht gesendete Nachrichten ein.
+
+        :param path: [optional] Pfad der Datei als ``Path``, standardmaessig neben der
+        ``entries.json``.
+        :param snapshot_source: [optional] Liefert zu einer Topic den gespeicherten kompletten
+        Stand ihrer Einkaufsliste als ``dict`` oder ``None``, wenn er nicht gelesen werden kann.
+        Ohne sie werden vorgemerkte Staende beim Einlesen verworfen.
+        """
+        self.__path = path if path is not None else Path(FILES_PATH, OUTBOX_FILENAME)
+        self.__snapshot_source = snapshot_source
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.__items: List[dict] = []
+        self.__next_id = 0
+        # Message-ID von paho -> ID des Eintrags, fuer gesendete, unbestaetigte Nachrichten
+        self.__in_flight: Dict[int, int] = {}
+        # Bestaetigungen, die eintreffen, bevor die Message-ID zugeordnet wurde
+        self.__early_confirmed: Set[int] = set()
+
+        self.queued = 0
+        self.collapsed = 0
+        self.confirmed = 0
+
+        self.__load()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__items)
+
+    def add(self, topic: str, msg: dict, retain: bool) -> dict:
+        """
+        Nimmt eine zu sendende Nachricht auf und speichert die Outbox.
+
+        :param topic: Die Topic als ``str``.
+        :param msg: Die Nachricht als ``dict``.
+        :param retain: Ob die retain-Flag gesetzt werden soll, als ``bool``.
+        :return: Der zu sendende Eintrag als ``dict`` mit ``"id"``, ``"topic"``, ``"msg"`` und
+        ``"retain"``. Wurden noch nicht gesendete Aenderungen mit der Nachricht zusammengefasst,
+        enthaelt er auch diese.
+        """
+        with self.__lock:
+            before = self.__by_id()
+            item_id = self.__next_id
+            self.__next_id += 1
+            self.__items.append({"id": item_id, "topic": topic, "msg": msg, "retain": retain})
+            self.queued += 1
+            self.__collapse()
+            self.__save(before)
+            # zusammengefasst wird immer in den neuesten Eintrag, der seine ID behaelt
+            return next(item for item in self.__items if item["id"] == item_id)
+
+    def take_batch(self) -> List[dict]:
+        """
+        Liefert alle noch nicht gesendeten Nachrichten zusammengefasst, z.B. nach dem
+        (erneuten) Verbinden. Unbestaetigte Nachrichten einer frueheren Verbindung gelten dabei
+        als nicht gesendet.
+
+        :return: Die Eintraege als ``list``.
+        """
+        with self.__lock:
+            before = self.__by_id()
+            self.__in_flight.clear()
+            self.__early_confirmed.clear()
+            self.__collapse()
+            self.__save(before)
+            return list(self.__items)
+
+    def mark_sent(self, item_id: int, mid: int):
+        """
+        Merkt sich, unter welcher Message-ID ein Eintrag an paho uebergeben wurde.
+
+        :param item_id: ID des Eintrags als ``int``.
+        :param mid: Message-ID von paho als ``int``.
+        """
+        with self.__lock:
+            if mid in self.__early_confirmed:
+                self.__early_confirmed.discard(mid)
+                self.__remove(item_id)
+                return
+            self.__in_flight[mid] = item_id
+
+    def confirm(self, mid: int):
+        """
+        Entfernt einen Eintrag, nachdem der Broker den Empfang bestaetigt hat. Wird von paho
+        im MQTT-Thread aufgerufen (``on_publish``).
+
+        :param mid: Message-ID von paho als ``int``.
+        """
+        with self.__lock:
+            item_id = self.__in_flight.pop(mid, None)
+            if item_id is None:
+                self.__early_confirmed.add(mid)
+                return
+            self.__remove(item_id)
+
+    def get_stats(self) -> dict:
+        """
+        Liefert Zaehler zu aufgenommenen, zusammengefassten und bestaetigten Nachrichten.
+
+        :return: Die Zaehler als ``dict``.
+        """
+        with self.__lock:
+            return {
+                "pending": len(self.__items),
+                "in_flight": len(self.__in_flight),
+                "queued": self.queued,
+                "collapsed": self.collapsed,
+                "confirmed": self.confirmed,
+            }
+
+    def __remove(self, item_id: int):
+        """
+        Entfernt einen bestaetigten Eintrag. War es ein kompletter Stand, sind auch aeltere
+        Eintraege derselben Einkaufsliste ueberholt, selbst wenn sie noch unbestaetigt sind.
+        """
+        confirmed = next((item for item in self.__items if item["id"] == item_id), None)
+        self.confirmed += 1
+        if confirmed is None:
+            return
+
+        before = self.__by_id()
+        superseded = set()
+        if confirmed["retain"] and not is_ops_topic(confirmed["topic"]):
+            superseded = {confirmed["topic"], get_ops_topic(confirmed["topic"])}
+        self.__items = [
+            item for item in self.__items
+            if item["id"] != item_id
+            and not (item["id"] < item_id and item["topic"] in superseded)
+        ]
+        self.__save(before)
+
+    def __collapse(self):
+        """
+        Fasst ueberholte, noch nicht gesendete Eintraege zusammen.
+        """
+        in_flight = set(self.__in_flight.values())
+        collapsed: List[dict] = []
+        for item in self.__items:
+            if item["id"] in in_flight:
+                collapsed.append(item)
+                continue
+
+            topic = item["topic"]
+            if item["retain"] and not is_ops_topic(topic):
+                # der komplette Stand ersetzt aeltere Staende und Aenderungen
+                superseded = (topic, get_ops_topic(topic))
+                collapsed = [
+                    pending for pending in collapsed
+                    if pending["id"] in in_flight or pending["topic"] not in superseded
+                ]
+            elif is_ops_topic(topic) and "ops" in item["msg"]:
+                previous = next(
+                    (
+                        pending for pending in collapsed
+                        if pending["topic"] == topic and pending["id"] not in in_flight
+                    ),
+                    None,
+                )
+                if previous is not None:
+                    collapsed.remove(previous)
+                    item = {
+                        **item,
+                        "msg": {
+                            **item["msg"],
+                            "ops": compact_operations(previous["msg"]["ops"] + item["msg"]["ops"]),
+                        },
+                    }
+            collapsed.append(item)
+
+        self.collapsed += len(self.__items) - len(collapsed)
+        self.__items = collapsed
+
+    def __load(self):
+        try:
+            with open(self.__path, "rb") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log.warning("reading outbox failed: %s", e)
+            return
+
+        items: Dict[int, dict] = {}
+        for line in lines:
+            try:
+                record = loads(line)
+            except ValueError:
+                # unvollstaendige letzte Zeile nach einem Absturz
+                log.warning("skipping broken outbox record %r", line)
+                continue
+
+            if "items" in record:
+                items = {item["id"]: item for item in record["items"]}
+                self.__next_id = max(self.__next_id, record.get("next_id", 0))
+            for item_id in record.get("remove", []):
+                items.pop(item_id, None)
+            for item in record.get("add", []):
+                items[item["id"]] = item
+                self.__next_id = max(self.__next_id, item["id"] + 1)
+
+        for item_id in sorted(items):
+            item = items[item_id]
+            if item.get("snapshot"):
+                item = self.__restore_snapshot(item)
+            if item is not None:
+                self.__items.append(item)
+        self.__compact()
+
+    def __restore_snapshot(self, marker: dict) -> Optional[dict]:
+        msg = None
+        if self.__snapshot_source is not None:
+            msg = self.__snapshot_source(marker["topic"])
+        if msg is None:
+            log.warning("dropping pending snapshot for %s from outbox", marker["topic"])
+            return None
+
+        return {
+            "id": marker["id"], "topic": marker["topic"], "msg": msg, "retain": marker["retain"],
+        }
+
+    def __by_id(self) -> Dict[int, dict]:
+        return {item["id"]: item for item in self.__items}
+
+    @staticmethod
+    def __stored(item: dict) -> dict:
+        if "entries" not in item["msg"]:
+            return item
+
+        return {
+            "id": item["id"], "topic": item["topic"], "snapshot": True, "retain": item["retain"],
+        }
+
+    def __save(self, before: Dict[int, dict]):
+        """
+        Haengt die Aenderungen gegenueber ``before`` (ID -> Eintrag) an die Datei an.
+        Zusammengefasste Eintraege sind neue Objekte und werden deshalb erneut geschrieben.
+        """
+        current = self.__by_id()
+        record = {}
+        removed = [item_id for item_id in before if item_id not in current]
+        if removed:
+            record["remove"] = removed
+        added = [
+            self.__stored(item) for item_id, item in current.items()
+            if before.get(item_id) is not item
+        ]
+        if added:
+            record["add"] = added
+        if not record:
+            return
+
+        try:
+            if not self.__path.parent.is_dir():
+                self.__path.parent.mkdir(parents=True)
+            if not self.__items:
+                # nichts mehr zu senden, die Datei wird einfach geleert
+                with open(self.__path, "wb"):
+                    self.__size = 0
+            elif self.__size >= COMPACTION_THRESHOLD:
+                self.__compact()
+            else:
+                with open(self.__path, "ab") as file:
+                    file.write(dumps(record) + b"\n")
+                    self.__size = file.tell()
+        except OSError as e:
+            log.warning("writing outbox failed: %s", e)
+
+    def __compact(self):
+        data = dumps({
+            "next_id": self.__next_id,
+            "items": [self.__stored(item) for item in self.__items],
+        }) + b"\n"
+        try:
+            if not self.__path.parent.is_dir():
+                self.__path.parent.mkdir(parents=True)
+            write_atomic(self.__path, data)
+            self.__size = len(data)
+        except OSError as e:
+            log.warning("writing outbox failed: %s", e)
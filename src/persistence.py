@@ -0,0 +1,131 @@
+from typing import Callable, Dict, List, Optional
+
+from kivy.clock import Clock
+
+from sync import compact_operations
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+
+class WriteBehindScheduler:
+    """
+    Fasst Aenderungen an der Einkaufsliste innerhalb eines Zeitfensters zusammen, sodass pro
+    Fenster nur einmal gespeichert und einmal per MQTT gesendet wird.
+    """
+    def __init__(
+        self,
+        write: Callable[[dict, Optional[List[dict]]], None],
+        publish: Callable[[dict, Optional[List[dict]]], None],
+        delay: float,
+    ) -> None:
+        """
+        Instantiiert den Scheduler.
+
+        :param write: Funktion als ``Callable``, die den Stand und die gesammelten Aenderungen
+        speichert. Sind die Aenderungen ``None``, muss der komplette Stand gespeichert werden.
+        Schlaegt das Speichern mit einem ``OSError`` fehl, wird auch nicht gesendet.
+        :param publish: Funktion als ``Callable``, die den Stand und die gesammelten Aenderungen
+        veroeffentlicht. Sind die Aenderungen ``None``, muss der komplette Stand gesendet werden.
+        :param delay: Laenge des Zeitfensters in Sekunden als ``float``.
+        """
+        self.__write = write
+        self.__publish = publish
+        self.__trigger = Clock.create_trigger(self.flush, delay)
+        self.__entries_dict: Optional[dict] = None
+        self.__write_operations: Optional[List[dict]] = []
+        self.__operations: Optional[List[dict]] = []
+        self.__publish_pending = False
+
+        self.requested_writes = 0
+        self.requested_publishes = 0
+        self.writes = 0
+        self.publishes = 0
+
+    def schedule(
+        self,
+        entries_dict: dict,
+        operations: Optional[List[dict]] = None,
+        publish: bool = True,
+    ):
+        """
+        Merkt einen neuen Stand zum Speichern (und Senden) vor.
+
+        :param entries_dict: Der komplette Stand der Einkaufsliste als ``dict``.
+        :param operations: Die Aenderungen, die zu diesem Stand gefuehrt haben, als ``list``.
+        ``None`` bedeutet, dass der komplette Stand gespeichert und gesendet werden muss.
+        :param publish: Ob der Stand per MQTT gesendet werden soll, als ``bool``.
+        """
+        self.__entries_dict = entries_dict
+        self.requested_writes += 1
+        if operations is None or self.__write_operations is None:
+            self.__write_operations = None
+        else:
+            self.__write_operations.extend(operations)
+
+        if publish:
+            self.requested_publishes += 1
+            self.__publish_pending = True
+            if operations is None or self.__operations is None:
+                self.__operations = None
+            else:
+                self.__operations.extend(operations)
+
+        self.__trigger()
+
+    def flush(self, *_):
+        """
+        Speichert und sendet den zuletzt vorgemerkten Stand sofort.
+
+        :param _: Nur fuer Event-Uebergabe, nicht fuer unsere Logik relevant.
+        """
+        self.__trigger.cancel()
+        entries_dict = self.__entries_dict
+        if entries_dict is None:
+            return
+
+        write_operations = self.__write_operations
+        operations = self.__operations
+        publish_pending = self.__publish_pending
+        self.__entries_dict = None
+        self.__write_operations = []
+        self.__operations = []
+        self.__publish_pending = False
+
+        if write_operations is not None:
+            write_operations = compact_operations(write_operations)
+
+        try:
+            self.__write(entries_dict, write_operations)
+        except OSError as e:
+            log.warning("writing entries failed: %s", e)
+            return
+        self.writes += 1
+
+        if publish_pending:
+            if operations is not None:
+                operations = compact_operations(operations)
+            self.__publish(entries_dict, operations)
+            self.publishes += 1
+
+    @property
+    def pending(self) -> bool:
+        """
+        Gibt an, ob noch ungespeicherte Aenderungen vorgemerkt sind.
+        """
+        return self.__entries_dict is not None
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Liefert Zaehler, wie viele Schreib- und Sendevorgaenge zusammengefasst wurden.
+
+        :return: Die Zaehler als ``dict``.
+        """
+        return {
+            "requested_writes": self.requested_writes,
+            "writes": self.writes,
+            "saved_writes": self.requested_writes - self.writes,
+            "requested_publishes": self.requested_publishes,
+            "publishes": self.publishes,
+            "saved_publishes": self.requested_publishes - self.publishes,
+        }
@@ -0,0 +1,131 @@
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from tracing import get_logger, tracer
+
+log = get_logger(__name__)
+
+# Standardmaessig behaltene unbenutzte Widgets je Pool
+MAX_IDLE = 4
+
+T = TypeVar("T")
+
+
+class WidgetPool(Generic[T]):
+    """
+    Haelt vorab erstellte Widgets bereit, damit sie nicht bei jeder Verwendung neu aufgebaut
+    werden muessen. Beim Ausleihen wird ein Widget mit ``reset`` auf den gewuenschten Zustand
+    gesetzt, bei der Rueckgabe mit ``clear`` von allem geloest, was es nicht festhalten soll
+    (z.B. Callbacks und IDs von Eintraegen, die inzwischen geloescht sein koennen).
+
+    Ein Treffer ist ein Ausleihen, fuer das kein Widget erstellt werden musste.
+    """
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], T],
+        reset: Optional[Callable[..., None]] = None,
+        clear: Optional[Callable[[T], None]] = None,
+        max_idle: int = MAX_IDLE,
+    ) -> None:
+        """
+        Instantiiert einen leeren Pool.
+
+        :param name: Der Name fuer Statistiken und Tracing als ``str``.
+        :param factory: Erstellt ein neues Widget.
+        :param reset: [optional] Wird beim Ausleihen mit dem Widget und den Keyword-Parametern
+        von ``checkout`` aufgerufen.
+        :param clear: [optional] Wird bei der Rueckgabe mit dem Widget aufgerufen.
+        :param max_idle: Hoechstens so viele unbenutzte Widgets werden behalten, als ``int``.
+        """
+        self.name = name
+        self.__factory = factory
+        self.__reset = reset
+        self.__clear = clear
+        self.__max_idle = max_idle
+        self.__idle: List[T] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.discarded = 0
+
+    def __len__(self) -> int:
+        return len(self.__idle)
+
+    def prebuild(self, count: int):
+        """
+        Erstellt unbenutzte Widgets vorab, z.B. nach dem ersten Frame.
+
+        :param count: Bis zu so viele Widgets sollen bereitliegen, als ``int``.
+        """
+        count = min(count, self.__max_idle)
+        while len(self.__idle) < count:
+            self.__idle.append(self.__build())
+
+    def checkout(self, **state: Any) -> T:
+        """
+        Leiht ein Widget aus und erstellt nur eines, wenn keines bereitliegt.
+
+        :param state: Der gewuenschte Zustand, wird an ``reset`` uebergeben.
+        :return: Das Widget.
+        """
+        if self.__idle:
+            widget = self.__idle.pop()
+            self.hits += 1
+        else:
+            log.debug("pool %s is empty, building a widget", self.name)
+            widget = self.__build()
+            self.misses += 1
+
+        if self.__reset is not None:
+            self.__reset(widget, **state)
+        return widget
+
+    def count_reuse(self):
+        """
+        Zaehlt ein Widget, das ausserhalb des Pools wiederverwendet wurde (z.B. eine Zeile
+        der ``RecycleView``), als Treffer.
+        """
+        self.hits += 1
+
+    def release(self, widget: T):
+        """
+        Gibt ein ausgeliehenes Widget zurueck. Ist der Pool voll, wird es verworfen.
+
+        :param widget: Das Widget.
+        """
+        if self.__clear is not None:
+            self.__clear(widget)
+        if len(self.__idle) < self.__max_idle and widget not in self.__idle:
+            self.__idle.append(widget)
+        else:
+            self.discarded += 1
+
+    def clear(self):
+        """
+        Verwirft alle unbenutzten Widgets, z.B. wenn sie mit geaenderten Einstellungen neu
+        aufgebaut werden muessen.
+        """
+        self.__idle.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Liefert Zaehler zur Wiederverwendung.
+
+        :return: Die Zaehler als ``dict`` mit ``"hits"``, ``"misses"``, ``"hit_rate"``,
+        ``"built"``, ``"discarded"`` und ``"idle"``.
+        """
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "built": self.built,
+            "discarded": self.discarded,
+            "idle": len(self.__idle),
+        }
+
+    def __build(self) -> T:
+        self.built += 1
+        with tracer.span("pool_build", pool=self.name):
+            return self.__factory()
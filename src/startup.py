@@ -0,0 +1,57 @@
+import time
+from typing import Dict, List, Tuple
+
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+
+class StartupTimer:
+    """
+    Misst die Dauer der einzelnen Phasen beim Start der App, z.B. bis zum ersten
+    gezeichneten Frame.
+    """
+    def __init__(self) -> None:
+        """
+        Instantiiert den Timer und startet die Messung.
+        """
+        self.__start = time.perf_counter()
+        self.__last = self.__start
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """
+        Beendet eine Phase und beginnt die naechste.
+
+        :param phase: Name der beendeten Phase als ``str``.
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.__last))
+        self.__last = now
+
+    def elapsed(self) -> float:
+        """
+        Liefert die Zeit seit dem Start der Messung.
+
+        :return: Die Zeit in Sekunden als ``float``.
+        """
+        return self.__last - self.__start
+
+    def get_report(self) -> Dict[str, float]:
+        """
+        Liefert die Dauer der Phasen in Millisekunden, in der Reihenfolge, in der sie beendet
+        wurden, sowie die Gesamtdauer unter ``"total"``.
+
+        :return: Die Dauer der Phasen als ``dict``.
+        """
+        report = {phase: round(duration * 1000, 3) for phase, duration in self.phases}
+        report["total"] = round(self.elapsed() * 1000, 3)
+        return report
+
+    def print_report(self):
+        """
+        Gibt die Dauer der Phasen aus.
+        """
+        log.info("startup timings (ms):")
+        for phase, duration in self.get_report().items():
+            log.info("    %-24s%10.1f", phase, duration)
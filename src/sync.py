@@ -0,0 +1,637 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tracing import get_logger
+
+log = get_logger(__name__)
+
+
+# Unter-Topic, auf dem einzelne Aenderungen verschickt werden
+OPS_SUBTOPIC = "ops"
+# Unter-Topic, unter dem die weiteren Einkaufslisten liegen
+LISTS_SUBTOPIC = "lists"
+# Unter-Topic, auf der jedes Geraet (retained) die unterstuetzten Nachrichtenformate mitteilt
+PEERS_SUBTOPIC = "peers"
+# Name der Einkaufsliste, die direkt die eingestellte Topic verwendet
+DEFAULT_LIST = "default"
+# Sekunden nach einer Aenderung, nach denen der komplette Stand (retained) veroeffentlicht wird
+SNAPSHOT_DELAY = 10
+# Sekunden, nach denen Loeschmarken geloeschter Eintraege verworfen werden
+TOMBSTONE_TTL = 30 * 24 * 60 * 60
+# Register eines Eintrags und das Feld mit ihrem Zeitstempel
+REGISTERS = (("text", "text_ts"), ("is_checked", "checked_ts"))
+# Sekunden, die ein empfangener Zeitstempel hoechstens vor der eigenen Uhr liegen darf, um sie
+# vorzustellen; sonst wuerde ein Geraet mit falscher Uhr alle anderen mitziehen
+MAX_CLOCK_DRIFT = 24 * 60 * 60
+# Register, die eine Operation aendert; fuer diese gilt der Zeitstempel ``"ts"`` der Operation
+OPERATION_REGISTERS = {"add": ("text", "is_checked"), "check": ("is_checked",), "rename": ("text",)}
+
+
+def new_entry_id() -> str:
+    """
+    Erzeugt eine neue, eindeutige ID fuer einen Eintrag.
+
+    :return: Die ID als ``str``.
+    """
+    return uuid.uuid4().hex
+
+
+def ensure_entry_ids(entries: List[dict]) -> List[dict]:
+    """
+    Stellt sicher, dass jeder Eintrag eine ID hat (z.B. bei Listen aus aelteren Versionen).
+
+    :param entries: Die Eintraege als ``list``.
+    :return: Die Eintraege mit IDs als ``list``.
+    """
+    return [
+        entry if entry.get("id") else {**entry, "id": new_entry_id()}
+        for entry in entries
+    ]
+
+
+# region clock
+
+class HybridClock:
+    """
+    Hybride logische Uhr fuer die Zeitstempel (``"ts"``) der Aenderungen. Die Zeitstempel
+    bestehen aus Uhrzeit in Millisekunden, Zaehler und Geraete-ID und lassen sich als ``str``
+    vergleichen. Sie sind eindeutig, steigen auf jedem Geraet streng an und liegen immer nach
+    allen bereits empfangenen Zeitstempeln, auch wenn die Uhren der Geraete abweichen.
+    """
+    def __init__(self, node_id: str, time_source: Callable[[], float] = time.time) -> None:
+        """
+        Instantiiert die Uhr.
+
+        :param node_id: ID des Geraets als ``str``, entscheidet bei gleicher Zeit.
+        :param time_source: [optional] Liefert die aktuelle Zeit in Sekunden.
+        """
+        self.node_id = node_id
+        self.__time_source = time_source
+        self.__lock = threading.Lock()
+        self.__wall = 0
+        self.__counter = 0
+
+    def now(self) -> str:
+        """
+        Liefert einen neuen Zeitstempel.
+
+        :return: Der Zeitstempel als ``str``.
+        """
+        wall = int(self.__time_source() * 1000)
+        with self.__lock:
+            if wall > self.__wall:
+                self.__wall = wall
+                self.__counter = 0
+            else:
+                self.__counter += 1
+            return f"{self.__wall:013d}.{self.__counter:06d}.{self.node_id}"
+
+    def observe(self, timestamp: str):
+        """
+        Stellt die Uhr nach einem empfangenen Zeitstempel, sodass alle folgenden Zeitstempel
+        danach liegen.
+
+        :param timestamp: Der empfangene Zeitstempel als ``str``.
+        """
+        parsed = parse_timestamp(timestamp)
+        if parsed is None:
+            return
+        if parsed[0] > (self.__time_source() + MAX_CLOCK_DRIFT) * 1000:
+            log.debug("not advancing clock to distant timestamp %s", timestamp)
+            return
+
+        with self.__lock:
+            if parsed > (self.__wall, self.__counter):
+                self.__wall, self.__counter = parsed
+
+    def stamp(self, operation: dict) -> dict:
+        """
+        Versieht eine lokale Aenderung mit einem neuen Zeitstempel.
+
+        :param operation: Die Aenderung als ``dict``.
+        :return: Die Aenderung mit ``"ts"`` als neues ``dict``.
+        """
+        return {**operation, "ts": self.now()}
+
+
+def parse_timestamp(timestamp: str) -> Optional[Tuple[int, int]]:
+    """
+    Zerlegt einen Zeitstempel der ``HybridClock``.
+
+    :param timestamp: Der Zeitstempel als ``str``.
+    :return: ``(Millisekunden, Zaehler)`` als ``tuple`` oder ``None``, wenn er ungueltig ist.
+    """
+    parts = timestamp.split(".", 2)
+    if len(parts) != 3:
+        return None
+
+    try:
+        return int(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+# endregion
+
+
+def get_ops_topic(topic: str) -> str:
+    """
+    Liefert die Topic fuer einzelne Aenderungen zu einer Einkaufslisten-Topic.
+
+    :param topic: Die Topic der Einkaufsliste als ``str``.
+    :return: Die Topic der Aenderungen als ``str``.
+    """
+    return f"{topic}/{OPS_SUBTOPIC}"
+
+
+def is_ops_topic(topic: str) -> bool:
+    """
+    Prueft, ob auf einer Topic einzelne Aenderungen verschickt werden.
+
+    :param topic: Die Topic als ``str``.
+    :return: ``True``, wenn es sich um eine Aenderungs-Topic handelt.
+    """
+    return topic.endswith(f"/{OPS_SUBTOPIC}")
+
+
+# Arten von Aenderungen, die empfangen werden duerfen. ``"reset"`` wird nur intern von den
+# Speichern verwendet und wuerde ueber die Topic die ganze Liste samt Loeschmarken ersetzen.
+REMOTE_OPERATIONS = ("add", "check", "rename", "delete")
+
+# Felder von Eintraegen und Aenderungen, die, wenn vorhanden, Texte sein muessen
+STRING_FIELDS = ("id", "ts", "text_ts", "checked_ts")
+
+
+def _has_valid_fields(item: dict) -> bool:
+    return (
+        isinstance(item.get("text", ""), str)
+        and isinstance(item.get("is_checked", False), bool)
+        and all(isinstance(item.get(field, ""), str) for field in STRING_FIELDS)
+    )
+
+
+def _is_valid_entry(entry: Any) -> bool:
+    return (
+        isinstance(entry, dict) and isinstance(entry.get("text"), str) and _has_valid_fields(entry)
+    )
+
+
+def _is_valid_operation(operation: Any) -> bool:
+    return (
+        isinstance(operation, dict)
+        and operation.get("op") in REMOTE_OPERATIONS
+        and isinstance(operation.get("id"), str)
+        and _has_valid_fields(operation)
+    )
+
+
+def is_valid_message(message: Any, is_ops: bool) -> bool:
+    """
+    Prueft, ob eine empfangene Nachricht die erwartete Form hat, bevor sie angewendet wird.
+    Auf der Topic kann jeder senden, der den Broker erreicht.
+
+    :param message: Die dekodierte Nachricht.
+    :param is_ops: Ob die Nachricht auf einer Aenderungs-Topic empfangen wurde, als ``bool``.
+    :return: ``True``, wenn die Nachricht ein ``dict`` mit einer Liste gueltiger Eintraege
+    (``"entries"``) bzw. Aenderungen (``"ops"``, nur ``REMOTE_OPERATIONS``) ist.
+    """
+    if not isinstance(message, dict):
+        return False
+    if is_ops:
+        operations = message.get("ops")
+        return isinstance(operations, list) and all(
+            _is_valid_operation(operation) for operation in operations
+        )
+
+    entries = message.get("entries")
+    tombstones = message.get("tombstones", {})
+    return (
+        isinstance(entries, list)
+        and all(_is_valid_entry(entry) for entry in entries)
+        and isinstance(tombstones, dict)
+        and all(isinstance(timestamp, str) for timestamp in tombstones.values())
+    )
+
+
+def is_valid_list_name(list_name: str) -> bool:
+    """
+    Prueft, ob ein Name als Name einer Einkaufsliste (und damit als Teil einer Topic und als
+    Name ihres Ordners) verwendet werden kann.
+
+    :param list_name: Der Name als ``str``.
+    :return: ``True``, wenn der Name gueltig ist.
+    """
+    return (
+        bool(list_name.strip())
+        and list_name not in (".", "..")
+        and not any(char in list_name for char in "/\\+#")
+    )
+
+
+def get_list_topic(topic: str, list_name: str) -> str:
+    """
+    Liefert die Topic einer Einkaufsliste. Die Standardliste verwendet die eingestellte Topic
+    selbst, damit aeltere Versionen weiterhin mit ihr synchronisieren.
+
+    :param topic: Die eingestellte Topic als ``str``.
+    :param list_name: Der Name der Einkaufsliste als ``str``.
+    :return: Die Topic der Einkaufsliste als ``str``.
+    """
+    if list_name == DEFAULT_LIST:
+        return topic
+
+    return f"{topic}/{LISTS_SUBTOPIC}/{list_name}"
+
+
+def get_subscription_topic(topic: str) -> str:
+    """
+    Liefert die Wildcard-Topic, mit der alle Einkaufslisten und ihre Aenderungen abonniert
+    werden. ``#`` umfasst dabei auch die eingestellte Topic selbst.
+
+    :param topic: Die eingestellte Topic als ``str``.
+    :return: Die Wildcard-Topic als ``str``.
+    """
+    return f"{topic}/#"
+
+
+def get_peer_topic(topic: str, peer_id: str) -> str:
+    """
+    Liefert die Topic, auf der ein Geraet seine unterstuetzten Nachrichtenformate mitteilt.
+
+    :param topic: Die eingestellte Topic als ``str``.
+    :param peer_id: ID des Geraets als ``str``.
+    :return: Die Topic als ``str``.
+    """
+    return f"{topic}/{PEERS_SUBTOPIC}/{peer_id}"
+
+
+def parse_peer_topic(topic: str, received_topic: str) -> Optional[str]:
+    """
+    Ermittelt, ob eine empfangene Nachricht die Formate eines Geraets mitteilt.
+
+    :param topic: Die eingestellte Topic als ``str``.
+    :param received_topic: Die Topic der empfangenen Nachricht als ``str``.
+    :return: Die ID des Geraets als ``str`` oder ``None``.
+    """
+    prefix = f"{topic}/{PEERS_SUBTOPIC}/"
+    if not received_topic.startswith(prefix):
+        return None
+
+    peer_id = received_topic[len(prefix):]
+    return peer_id if peer_id and "/" not in peer_id else None
+
+
+def parse_list_topic(topic: str, received_topic: str) -> Optional[Tuple[str, bool]]:
+    """
+    Ermittelt, zu welcher Einkaufsliste eine empfangene Nachricht gehoert.
+
+    :param topic: Die eingestellte Topic als ``str``.
+    :param received_topic: Die Topic der empfangenen Nachricht als ``str``.
+    :return: ``(Name der Einkaufsliste, ob es sich um Aenderungen handelt)`` als ``tuple`` oder
+    ``None``, wenn die Topic zu keiner Einkaufsliste gehoert oder der Name ungueltig ist (siehe
+    ``is_valid_list_name``).
+    """
+    if received_topic == topic:
+        return DEFAULT_LIST, False
+    if received_topic == get_ops_topic(topic):
+        return DEFAULT_LIST, True
+
+    prefix = f"{topic}/{LISTS_SUBTOPIC}/"
+    if not received_topic.startswith(prefix):
+        return None
+
+    parts = received_topic[len(prefix):].split("/")
+    if not is_valid_list_name(parts[0]):
+        return None
+    if len(parts) == 1:
+        return parts[0], False
+    if len(parts) == 2 and parts[1] == OPS_SUBTOPIC:
+        return parts[0], True
+
+    return None
+
+
+# region operations
+
+def add_operation(entry: dict) -> dict:
+    """
+    Erstellt eine Operation zum Hinzufuegen eines Eintrags.
+
+    :param entry: Der neue Eintrag als ``dict``.
+    :return: Die Operation als ``dict``.
+    """
+    return {
+        "op": "add",
+        "id": entry["id"],
+        "text": entry["text"],
+        "is_checked": entry["is_checked"],
+    }
+
+
+def check_operation(entry_id: str, is_checked: bool) -> dict:
+    """
+    Erstellt eine Operation zum Ab- oder Anhaken eines Eintrags.
+
+    :param entry_id: ID des Eintrags als ``str``.
+    :param is_checked: Der neue Status als ``bool``.
+    :return: Die Operation als ``dict``.
+    """
+    return {"op": "check", "id": entry_id, "is_checked": is_checked}
+
+
+def rename_operation(entry_id: str, text: str) -> dict:
+    """
+    Erstellt eine Operation zum Aendern des Texts eines Eintrags.
+
+    :param entry_id: ID des Eintrags als ``str``.
+    :param text: Der neue Text als ``str``.
+    :return: Die Operation als ``dict``.
+    """
+    return {"op": "rename", "id": entry_id, "text": text}
+
+
+def delete_operation(entry_id: str) -> dict:
+    """
+    Erstellt eine Operation zum Loeschen eines Eintrags.
+
+    :param entry_id: ID des Eintrags als ``str``.
+    :return: Die Operation als ``dict``.
+    """
+    return {"op": "delete", "id": entry_id}
+
+
+def apply_operation(entries: List[dict], operation: dict) -> List[dict]:
+    """
+    Wendet eine Operation auf die Eintraege an (siehe ``apply_operations``). Die Eintraege
+    selbst werden nicht veraendert, geaenderte Eintraege werden ersetzt.
+
+    :param entries: Die Eintraege als ``list``.
+    :param operation: Die Operation als ``dict``.
+    :return: Die neuen Eintraege als ``list``.
+    """
+    return apply_operations(entries, [operation])
+
+
+def apply_operations(
+    entries: List[dict], operations: List[dict], tombstones: Optional[Dict[str, str]] = None
+) -> List[dict]:
+    """
+    Wendet mehrere Operationen nacheinander auf die Eintraege an. Die Eintraege werden dazu
+    einmalig nach ID indiziert, sodass jede Operation nur konstanten Aufwand hat.
+    Zusaetzlich zu den einzelnen Aenderungen wird ``{"op": "reset", "entries": [...]}``
+    unterstuetzt, das alle Eintraege ersetzt.
+
+    Die Eintraege bilden ein CRDT: Text und Status sind Register, in denen der hoechste
+    Zeitstempel (``"ts"``) gewinnt, geloeschte Eintraege bleiben als Loeschmarke bekannt und
+    werden nicht wiederhergestellt. Operationen mit Zeitstempel enthalten den kompletten Stand
+    des Eintrags und legen ihn an, falls die ``add``-Operation noch nicht eingetroffen ist.
+    Dadurch ist das Ergebnis unabhaengig von der Reihenfolge und mehrfachen Anwendung der
+    Operationen. Operationen ohne Zeitstempel (aeltere Versionen) werden immer angewendet,
+    sofern sie keine doppelte Hinzufuegung sind. Sonstige Operationen auf unbekannte IDs werden
+    ignoriert.
+
+    :param entries: Die Eintraege als ``list``.
+    :param operations: Die Operationen als ``list``.
+    :param tombstones: [optional] Die Loeschmarken (ID -> Zeitstempel) als ``dict``, wird
+    dabei aktualisiert.
+    :return: Die neuen Eintraege als ``list``.
+    """
+    if tombstones is None:
+        tombstones = {}
+    by_id = {entry.get("id"): entry for entry in ensure_entry_ids(entries)}
+    for operation in operations:
+        kind = operation.get("op")
+        entry_id = operation.get("id")
+        timestamp = operation.get("ts")
+        entry = by_id.get(entry_id)
+
+        if kind == "reset":
+            tombstones.clear()
+            tombstones.update(operation.get("tombstones", {}))
+            by_id = {entry.get("id"): entry for entry in ensure_entry_ids(operation["entries"])}
+        elif kind == "delete":
+            timestamp = max(tombstones.get(entry_id, ""), timestamp or "")  # type: ignore
+            tombstones[entry_id] = timestamp
+            by_id.pop(entry_id, None)
+        elif kind not in OPERATION_REGISTERS:
+            log.warning("ignoring unknown operation %s", operation)
+        elif entry_id in tombstones:
+            continue
+        elif entry is None:
+            if creates_entry(operation):
+                by_id[entry_id] = new_entry(operation)
+            else:
+                log.debug("ignoring operation for unknown entry %s", operation)
+        elif kind != "add" or timestamp is not None:
+            by_id[entry_id] = apply_registers(entry, operation)
+
+    return list(by_id.values())
+
+
+def creates_entry(operation: dict) -> bool:
+    """
+    Prueft, ob eine Operation einen noch unbekannten Eintrag anlegt. Das gilt fuer
+    ``add``-Operationen und fuer Operationen mit Zeitstempel, die vor der zugehoerigen
+    ``add``-Operation eintreffen.
+
+    :param operation: Die Operation als ``dict``.
+    :return: ``True``, wenn die Operation den Eintrag anlegt.
+    """
+    kind = operation.get("op")
+    if kind == "add":
+        return True
+
+    return kind in OPERATION_REGISTERS and "ts" in operation and "text" in operation
+
+
+def get_register_timestamp(operation: dict, field: str) -> Optional[str]:
+    """
+    Liefert den Zeitstempel, mit dem eine Operation ein Register setzt.
+
+    :param operation: Die Operation als ``dict``.
+    :param field: Das Register als ``str``, ``"text"`` oder ``"is_checked"``.
+    :return: Der Zeitstempel als ``str``, ``""`` fuer ein mitgesendetes Register ohne
+    Zeitstempel (nie neuer) oder ``None`` fuer Operationen aelterer Versionen.
+    """
+    timestamp_field = dict(REGISTERS)[field]
+    if operation.get(timestamp_field):
+        return operation[timestamp_field]
+    if field in OPERATION_REGISTERS.get(operation.get("op"), ()):  # type: ignore
+        return operation.get("ts")
+
+    return ""
+
+
+def new_entry(operation: dict) -> dict:
+    """
+    Erstellt einen Eintrag aus einer Operation (siehe ``creates_entry``).
+
+    :param operation: Die Operation als ``dict``.
+    :return: Der Eintrag als ``dict``.
+    """
+    entry = {
+        "id": operation["id"],
+        "text": operation["text"],
+        "is_checked": operation.get("is_checked", False),
+    }
+    for field, timestamp_field in REGISTERS:
+        timestamp = get_register_timestamp(operation, field)
+        if timestamp:
+            entry[timestamp_field] = timestamp
+
+    return entry
+
+
+def apply_registers(entry: dict, operation: dict) -> dict:
+    """
+    Uebernimmt die in einer Operation enthaltenen Register (Text, Status) in einen Eintrag,
+    sofern ihr Zeitstempel neuer ist.
+
+    :param entry: Der Eintrag als ``dict``, wird nicht veraendert.
+    :param operation: Die Operation als ``dict``.
+    :return: Der Eintrag oder ein geaenderter Eintrag als ``dict``.
+    """
+    updated = entry
+    for field, timestamp_field in REGISTERS:
+        if field not in operation:
+            continue
+        timestamp = get_register_timestamp(operation, field)
+        if timestamp is None and operation[field] == entry[field]:
+            continue
+        if timestamp is not None and timestamp <= entry.get(timestamp_field, ""):
+            continue
+        if updated is entry:
+            updated = dict(entry)
+        updated[field] = operation[field]
+        if timestamp is not None:
+            updated[timestamp_field] = timestamp
+
+    return updated
+
+
+def merge_entry(entry: dict, other: dict) -> dict:
+    """
+    Fuehrt zwei Staende desselben Eintrags zusammen. Je Register gewinnt der hoechste
+    Zeitstempel, bei gleichem Zeitstempel der groessere Wert, damit alle Geraete unabhaengig
+    von der Reihenfolge dasselbe Ergebnis erhalten.
+
+    :param entry: Der eigene Stand als ``dict``, wird nicht veraendert.
+    :param other: Der andere Stand als ``dict``.
+    :return: Der zusammengefuehrte Stand als ``dict``.
+    """
+    merged = entry
+    for field, timestamp_field in REGISTERS:
+        timestamp = other.get(timestamp_field, "")
+        current = entry.get(timestamp_field, "")
+        if timestamp < current or (timestamp == current and other[field] <= entry[field]):
+            continue
+        if merged is entry:
+            merged = dict(entry)
+        merged[field] = other[field]
+        if timestamp:
+            merged[timestamp_field] = timestamp
+
+    return merged
+
+
+def is_mergeable(state: dict) -> bool:
+    """
+    Prueft, ob ein kompletter Stand zusammengefuehrt werden kann. Staende aelterer Versionen
+    enthalten keine Loeschmarken und ersetzen den bisherigen Stand.
+
+    :param state: Der Stand als ``dict`` mit ``"entries"``.
+    :return: ``True``, wenn der Stand Loeschmarken enthaelt.
+    """
+    return "tombstones" in state
+
+
+def merge_states(state: dict, other: dict) -> dict:
+    """
+    Fuehrt zwei komplette Staende einer Einkaufsliste zusammen. Das Ergebnis haengt nicht von
+    der Reihenfolge ab, in der Staende zusammengefuehrt werden.
+
+    :param state: Der eigene Stand als ``dict`` mit ``"entries"`` und ``"tombstones"``.
+    :param other: Der andere Stand als ``dict``. Ist er nicht zusammenfuehrbar (siehe
+    ``is_mergeable``), ersetzt er den eigenen.
+    :return: Der zusammengefuehrte Stand als neues ``dict``.
+    """
+    if not is_mergeable(other):
+        return {"entries": ensure_entry_ids(other["entries"]), "tombstones": {}}
+
+    tombstones = dict(state.get("tombstones", {}))
+    for entry_id, timestamp in other["tombstones"].items():
+        if timestamp > tombstones.get(entry_id, ""):
+            tombstones[entry_id] = timestamp
+
+    by_id = {
+        entry["id"]: entry
+        for entry in ensure_entry_ids(state.get("entries", []))
+        if entry["id"] not in tombstones
+    }
+    for entry in ensure_entry_ids(other["entries"]):
+        if entry["id"] in tombstones:
+            continue
+        current = by_id.get(entry["id"])
+        by_id[entry["id"]] = entry if current is None else merge_entry(current, entry)
+
+    return {"entries": list(by_id.values()), "tombstones": tombstones}
+
+
+def prune_tombstones(tombstones: Dict[str, str], now: float) -> Dict[str, str]:
+    """
+    Verwirft Loeschmarken, die aelter als ``TOMBSTONE_TTL`` sind.
+
+    :param tombstones: Die Loeschmarken (ID -> Zeitstempel) als ``dict``.
+    :param now: Die aktuelle Zeit in Sekunden als ``float``.
+    :return: Die verbleibenden Loeschmarken als neues ``dict``.
+    """
+    oldest = int((now - TOMBSTONE_TTL) * 1000)
+    pruned = {}
+    for entry_id, timestamp in tombstones.items():
+        parsed = parse_timestamp(timestamp)
+        if parsed is not None and parsed[0] >= oldest:
+            pruned[entry_id] = timestamp
+
+    return pruned
+
+
+def compact_operations(operations: List[dict]) -> List[dict]:
+    """
+    Fasst aufeinanderfolgende Operationen auf denselben Eintrag zusammen, z.B. mehrfaches
+    An- und Abhaken oder Hinzufuegen und direktes Loeschen.
+
+    :param operations: Die Operationen in der Reihenfolge ihrer Entstehung als ``list``.
+    :return: Die zusammengefassten Operationen als ``list``.
+    """
+    compacted: Dict[str, Dict[str, dict]] = {}
+    order: List[Tuple[str, str]] = []
+    added = set()
+
+    for operation in operations:
+        entry_id = operation.get("id")
+        kind = operation.get("op")
+        entry_operations = compacted.setdefault(entry_id, {})  # type: ignore
+
+        if kind == "add":
+            added.add(entry_id)
+        elif kind == "delete":
+            entry_operations.clear()
+            if entry_id in added:
+                continue
+        elif "add" in entry_operations:
+            # Aenderungen an gerade hinzugefuegten Eintraegen direkt uebernehmen
+            entry_operations["add"] = {**entry_operations["add"], **operation, "op": "add"}
+            continue
+
+        if kind not in entry_operations:
+            order.append((entry_id, kind))  # type: ignore
+        entry_operations[kind] = operation  # type: ignore
+
+    return [
+        compacted[entry_id][kind]
+        for entry_id, kind in order
+        if kind in compacted[entry_id]
+    ]
+
+# endregion
@@ -0,0 +1,231 @@
+import json
+import logging
+import logging.handlers
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+# Alle Logger der App liegen unter diesem Namen, damit ihr Level gemeinsam eingestellt wird
+LOGGER_NAME = "shoppinglist"
+DEFAULT_LOG_LEVEL = "INFO"
+
+TRACE_FILENAME = "trace.jsonl"
+# Groesse, ab der die Trace-Datei rotiert wird, und Anzahl aufbewahrter alter Dateien
+TRACE_MAX_BYTES = 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+# Anzahl der letzten Messungen je Span, die fuer die Anzeige aufbewahrt werden
+RECENT_SPANS = 100
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Liefert den Logger eines Moduls. Meldungen werden nur formatiert, wenn ihr Level aktiv ist,
+    daher sollten Werte als Argumente und nicht per f-String uebergeben werden.
+
+    :param name: Name des Moduls als ``str``, ueblicherweise ``__name__``.
+    :return: Der Logger als ``logging.Logger``.
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def set_log_level(level: str):
+    """
+    Stellt das Level aller Logger der App ein.
+
+    :param level: Das Level als ``str``, z.B. ``"DEBUG"`` oder ``"WARNING"``.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    try:
+        logger.setLevel(level.upper())
+    except (AttributeError, ValueError):
+        logger.setLevel(DEFAULT_LOG_LEVEL)
+        logger.warning("unknown log level %r, using %s", level, DEFAULT_LOG_LEVEL)
+
+
+set_log_level(DEFAULT_LOG_LEVEL)
+log = get_logger(__name__)
+
+
+class _NullSpan:
+    """
+    Span, der nichts misst. Wird geliefert, solange das Tracing deaktiviert ist.
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *_) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Misst die Dauer eines Abschnitts, z.B. ``with tracer.span("save"):``.
+    """
+    __slots__ = ("tracer", "name", "attributes", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.tracer.record(self.name, time.perf_counter() - self.start, self.attributes)
+
+
+class _JsonLineFormatter(logging.Formatter):
+    """
+    Schreibt die Messung eines Spans als eine JSON-Zeile.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, separators=(",", ":"))
+
+
+class Tracer:
+    """
+    Misst die Dauer der Abschnitte auf den heissen Pfaden (Speichern, Sortieren, Dateizugriffe,
+    Senden, Dekodieren und Aktualisieren der Widgets).
+    Ist das Tracing deaktiviert, liefert ``span`` ein Objekt, das nichts tut. Sonst werden die
+    letzten Messungen je Abschnitt fuer die Debug-Anzeige aufbewahrt und, falls eingestellt, in
+    einem eigenen Thread in eine rotierende JSONL-Datei geschrieben.
+    """
+    def __init__(self) -> None:
+        """
+        Instantiiert den Tracer, zunaechst deaktiviert.
+        """
+        self.enabled = False
+        self.__lock = threading.Lock()
+        self.__recent: Dict[str, Deque[float]] = {}
+        self.__counts: Dict[str, int] = {}
+        self.__queue: Optional["queue.SimpleQueue[logging.LogRecord]"] = None
+        self.__listener: Optional[logging.handlers.QueueListener] = None
+
+    def span(self, name: str, **attributes):
+        """
+        Liefert einen Kontextmanager, der die Dauer des umschlossenen Abschnitts misst.
+
+        :param name: Name des Abschnitts als ``str``.
+        :param attributes: Zusaetzliche Werte fuer die Trace-Datei, z.B. die Anzahl der Eintraege.
+        :return: Der Kontextmanager.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return Span(self, name, attributes)
+
+    def record(self, name: str, duration: float, attributes: Optional[dict] = None):
+        """
+        Nimmt eine Messung auf. Kann von jedem Thread aufgerufen werden.
+
+        :param name: Name des Abschnitts als ``str``.
+        :param duration: Die Dauer in Sekunden als ``float``.
+        :param attributes: [optional] Zusaetzliche Werte fuer die Trace-Datei als ``dict``.
+        """
+        with self.__lock:
+            recent = self.__recent.get(name)
+            if recent is None:
+                recent = self.__recent[name] = deque(maxlen=RECENT_SPANS)
+            recent.append(duration)
+            self.__counts[name] = self.__counts.get(name, 0) + 1
+
+        trace_queue = self.__queue
+        if trace_queue is not None:
+            span = {
+                "name": name,
+                "time": time.time(),
+                "duration_ms": round(duration * 1000, 3),
+                "thread": threading.current_thread().name,
+            }
+            if attributes:
+                span.update(attributes)
+            trace_queue.put(logging.makeLogRecord({"msg": span}))
+
+    def configure(self, enabled: bool, trace_path: Optional[Path] = None):
+        """
+        Aktiviert oder deaktiviert das Tracing.
+
+        :param enabled: Ob gemessen werden soll, als ``bool``.
+        :param trace_path: [optional] Pfad der Trace-Datei als ``Path``. Ist er ``None``, werden
+        die Messungen nur fuer die Debug-Anzeige aufbewahrt.
+        """
+        self.enabled = enabled
+        if enabled and trace_path is not None:
+            self.__start_file(trace_path)
+        else:
+            self.__stop_file()
+
+    def get_summary(self) -> List[dict]:
+        """
+        Fasst die letzten Messungen je Abschnitt zusammen.
+
+        :return: Je Abschnitt ein ``dict`` mit ``"name"``, ``"count"``, ``"last_ms"``,
+        ``"median_ms"`` und ``"max_ms"``, nach Namen sortiert.
+        """
+        with self.__lock:
+            recent = {name: list(durations) for name, durations in self.__recent.items()}
+            counts = dict(self.__counts)
+
+        return [
+            {
+                "name": name,
+                "count": counts[name],
+                "last_ms": durations[-1] * 1000,
+                "median_ms": statistics.median(durations) * 1000,
+                "max_ms": max(durations) * 1000,
+            }
+            for name, durations in sorted(recent.items())
+        ]
+
+    def close(self):
+        """
+        Schreibt ausstehende Messungen in die Trace-Datei und schliesst sie.
+        """
+        self.__stop_file()
+
+    def __start_file(self, path: Path):
+        if self.__listener is not None:
+            return
+
+        try:
+            if not path.parent.is_dir():
+                path.parent.mkdir(parents=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUP_COUNT, encoding="utf-8"
+            )
+        except OSError as e:
+            log.warning("opening trace file failed: %s", e)
+            return
+
+        handler.setFormatter(_JsonLineFormatter())
+        self.__queue = queue.SimpleQueue()
+        self.__listener = logging.handlers.QueueListener(self.__queue, handler)
+        self.__listener.start()
+        log.info("writing trace to %s", path)
+
+    def __stop_file(self):
+        listener = self.__listener
+        if listener is None:
+            return
+
+        self.__queue = None
+        self.__listener = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+# Prozessweit geteilter Tracer
+tracer = Tracer()